@@ -20,7 +20,8 @@
 
 
 from typing import Any, Dict, List
-import copy
+from Environment.retention import KeepAll
+from Environment.state import LocalState, PList
 
 
 # -----------------------------------------------------------------------------
@@ -32,8 +33,15 @@ class BaseAgent:
     - Local state management (e.g., verified facts, backtracking history)
     - Checkpoint creation for local backtracking
     - Receiving and sending messages through a centralized message bus
+
+    local_state is a persistent LocalState, so a checkpoint is an O(1) handle. The
+    handles are kept on backtrack_stack, outside the state they snapshot.
+    'backtrack_retention' bounds the backtrack stack (see Environment.retention);
+    by default every checkpoint is kept.
     """
 
+    backtrack_retention = KeepAll()
+
     def __init__(self, name: str, message_bus=None):
         """
         :param name: Agent's unique identifier
@@ -41,27 +49,38 @@ class BaseAgent:
         """
         self.name = name
         self.message_bus = message_bus
-        self.local_state = {
+        self.local_state = LocalState({
             "verified_facts": [],
-            "history": [],
-            "backtrack_stack": []
-        }
+            "history": []
+        })
+        # Handles of local_state for local backtracking, newest last
+        self.backtrack_stack = PList()
 
     def checkpoint_state(self):
         """
-        Saves a snapshot of local_state so that it can be restored if a local backtrack is required.
+        Saves an O(1) handle of local_state so that it can be restored if a local backtrack is required.
+        Older handles are then evicted according to backtrack_retention.
         """
-        snapshot = copy.deepcopy(self.local_state)
-        self.local_state["backtrack_stack"].append(snapshot)
+        self.backtrack_stack = self.backtrack_stack.push(self.local_state.snapshot())
+        if isinstance(self.backtrack_retention, KeepAll):
+            return
+        handles = list(self.backtrack_stack)
+
+        def size_of(i):
+            return max(0, handles[i].written - (handles[i - 1].written if i else 0))
+
+        evicted = self.backtrack_retention.evict(list(range(len(handles))), size_of)
+        if evicted:
+            self.backtrack_stack = PList(h for i, h in enumerate(handles) if i not in evicted)
 
     def local_backtrack(self):
         """
-        Reverts to the most recent checkpoint in local_state. Useful if a conflict emerges
+        Reverts local_state to the most recent checkpoint in O(1). Useful if a conflict emerges
         in the agent's internal reasoning or data.
         """
-        if self.local_state["backtrack_stack"]:
-            last_snapshot = self.local_state["backtrack_stack"].pop()
-            self.local_state = last_snapshot
+        if self.backtrack_stack:
+            self.backtrack_stack, handle = self.backtrack_stack.pop()
+            self.local_state.restore(handle)
 
     def receive_message(self, msg: Dict[str, Any]):
         """
@@ -339,7 +358,7 @@ class ControllerAgent(BaseAgent):
 # 8. BlackSheep
 # -----------------------------------------------------------------------------
 from backend.api import api_call
-from Interaction.messagepool import message_pool
+from Interaction.window import render_transcript
 
 class BlackSheep(Agent):
     """
@@ -359,14 +378,7 @@ class BlackSheep(Agent):
         Checks the moderator's last statement and returns the inverse of a normal decision.
         If a normal thinker would say "yes", the BlackSheep says "no", etc.
         """
-        messages = message_pool.get_visibile_messages(visibile=self.name)
-        prior = ""
-        for m in messages[:-1]:
-            prior += f"{m.send_from}: {m.content}\n"
-
-        current_content = ""
-        if messages:
-            current_content = f"{messages[-1].send_from}: {messages[-1].content}\n"
+        prior, current_content = render_transcript(self.name, "blacksheep", question, knowledges)
 
         prompt = f"""
 You are {self.name}, engaging in a discussion about a question.
@@ -393,6 +405,7 @@ and if it's correct, you must vote 'yes'. Return 'yes' or 'no' only.
             messages=[{"role": "user", "content": prompt}],
             model=self.model,
             temperature=(self.args.temperature if self.args else 1.0),
+            caller=self.name,
         )
 
         if "yes" in response.lower():
@@ -404,6 +417,13 @@ and if it's correct, you must vote 'yes'. Return 'yes' or 'no' only.
 # -----------------------------------------------------------------------------
 # 9. Thinker
 # -----------------------------------------------------------------------------
+def _not_from_human(msg) -> bool:
+    """
+    Transcript filter: leaves the Human agent's messages out of the prior content.
+    """
+    return msg.send_from.lower() != "human"
+
+
 class Thinker(Agent):
     """
     Thinker is an agent that genuinely evaluates whether the moderator's step
@@ -422,15 +442,9 @@ class Thinker(Agent):
         Inspects the moderator's last statement to decide if it truly needs modification.
         Returns 1 if it does, otherwise 0.
         """
-        messages = message_pool.get_visibile_messages(visibile=self.name)
-        previous_content = ""
-        for m in messages[:-1]:
-            if m.send_from.lower() != "human":
-                previous_content += f"{m.send_from}: {m.content}\n"
-
-        current_content = ""
-        if messages:
-            current_content = f"{messages[-1].send_from}: {messages[-1].content}\n"
+        previous_content, current_content = render_transcript(
+            self.name, "thinker", question, knowledges, include=_not_from_human
+        )
 
         prompt = f"""
 You are {self.name}, a participant in a complexity seminar.
@@ -451,7 +465,8 @@ the current step needs revision.
         response = api_call(
             messages=[{"role": "user", "content": prompt}],
             model=self.model,
-            temperature=1.0
+            temperature=1.0,
+            caller=self.name
         ).lower()
 
         if "yes" in response:
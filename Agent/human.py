@@ -57,36 +57,54 @@ class Human(Agent):
         print("[HUMAN] No intervention.")
         return False
 
-    def request_backtrack(self, max_checkpoint: int) -> int:
+    def request_backtrack(self, max_checkpoint: int, checkpoints: list = None) -> int:
         """
         If an intervention is chosen, prompts the user to specify a checkpoint
         to revert to. The user can enter an integer between 0 and max_checkpoint,
-        or -1 to cancel backtracking.
+        or -1 to cancel backtracking. When a retention policy has evicted some
+        checkpoints, only the ones listed in 'checkpoints' are offered.
 
         :param max_checkpoint: The highest valid checkpoint index for reversion.
+        :param checkpoints: Optional indices of the checkpoints that still exist
+                            (e.g. Environment.checkpoint_times()).
         :return: The chosen checkpoint index, or -1 to skip backtracking.
         """
+        if checkpoints is not None:
+            checkpoints = sorted(c for c in checkpoints if 0 <= c <= max_checkpoint)
+            if not checkpoints:
+                max_checkpoint = -1
         if max_checkpoint < 0:
             print("[HUMAN] No valid checkpoints available.")
             return -1
 
-        print(f"[HUMAN] You may choose a checkpoint to revert to (0..{max_checkpoint}).")
+        if checkpoints is None:
+            choices = f"0..{max_checkpoint}"
+        else:
+            choices = ", ".join(str(c) for c in checkpoints)
+        allowed = set(checkpoints) if checkpoints is not None else None
+
+        def valid(cp):
+            if allowed is None:
+                return 0 <= cp <= max_checkpoint
+            return cp in allowed
+
+        print(f"[HUMAN] You may choose a checkpoint to revert to ({choices}).")
         print("Enter -1 to skip backtracking: ", end="", flush=True)
 
         while True:
             user_input = sys.stdin.readline().strip()
             try:
                 checkpoint = int(user_input)
-                if (checkpoint == -1) or (0 <= checkpoint <= max_checkpoint):
+                if (checkpoint == -1) or valid(checkpoint):
                     if checkpoint == -1:
                         print("[HUMAN] Skipping backtracking.")
                     else:
                         print(f"[HUMAN] Chosen checkpoint: {checkpoint}")
                     return checkpoint
                 else:
-                    print(f"[HUMAN] Please enter a number -1 or between 0 and {max_checkpoint}: ", end="", flush=True)
+                    print(f"[HUMAN] Please enter -1 or one of {choices}: ", end="", flush=True)
             except ValueError:
-                print(f"[HUMAN] Invalid input. Please enter an integer -1..{max_checkpoint}: ", end="", flush=True)
+                print(f"[HUMAN] Invalid input. Please enter -1 or one of {choices}: ", end="", flush=True)
 
     def override_backtracking(self, current_step: int) -> bool:
         """
@@ -118,16 +136,22 @@ class Human(Agent):
           3. The results can be returned or inserted into self.local_state for
              further consumption by the environment.
 
-        :param msg: A dictionary with possible keys like 'step_info' and 'max_checkpoint'.
+        :param msg: A dictionary with possible keys like 'step_info', 'max_checkpoint'
+                    and 'checkpoints' (the indices that still exist). Without
+                    'checkpoints', the ones kept by the environment are offered.
         """
         step_info = msg.get("step_info", "")
         max_cp = msg.get("max_checkpoint", -1)
+        available = msg.get("checkpoints")
+        if available is None and hasattr(self.message_bus, "checkpoint_times"):
+            # The environment registers itself as the message bus of its agents
+            available = self.message_bus.checkpoint_times()
         current_step = msg.get("current_step", 0)
 
         if step_info:
             user_intervene = self.decide_intervention(step_info)
             if user_intervene:
-                chosen_cp = self.request_backtrack(max_cp)
+                chosen_cp = self.request_backtrack(max_cp, available)
                 if chosen_cp != -1:
                     # The environment or a higher-level supervisory agent
                     # might use this result to actually apply a system-wide rollback.
@@ -12,8 +12,8 @@
 
 import time
 from Agent.agent import Agent
-from backend.api import api_call_completion
-from Interaction.messagepool import message_pool
+from backend.api import api_call_completion, api_call_completion_async
+from Interaction.messagepool import get_pool
 
 class Moderator(Agent):
     """
@@ -38,6 +38,30 @@ class Moderator(Agent):
         self.final_answer = None
         self.messages = []
 
+    def _step_request(self) -> dict:
+        """
+        Appends the previous step to the message history and returns the arguments
+        of the completion call for the next step.
+        """
+        if self.current_step != 1 and self.current_text:
+            self.messages.append({
+                "role": "assistant",
+                "content": self.current_text
+            })
+        return dict(
+            messages=self.messages,
+            model=self.model,
+            stop_list=[f"Step {self.current_step+1}:"],
+            caller=self.name
+        )
+
+    def _record_step(self, step_resp: str, thinking_time: float):
+        """
+        Stores a generated step and the time it took.
+        """
+        self.current_text = step_resp
+        self.steps.append((step_resp, thinking_time))
+
     def generate_step_response(self, prompt: str):
         """
         A generator function that repeatedly queries the LLM using 'api_call_completion'.
@@ -50,23 +74,25 @@ class Moderator(Agent):
         self.messages = [{"role": "user", "content": prompt}]
 
         while True:
-            if self.current_step != 1 and self.current_text:
-                self.messages.append({
-                    "role": "assistant",
-                    "content": self.current_text
-                })
+            request = self._step_request()
+            start_time = time.time()
+            step_resp = api_call_completion(**request)
+            self._record_step(step_resp, time.time() - start_time)
 
+            yield step_resp
+
+    async def generate_step_response_async(self, prompt: str):
+        """
+        Async-generator counterpart of generate_step_response(). Each step is awaited
+        through 'api_call_completion_async', so several Moderators can share one event loop.
+        """
+        self.messages = [{"role": "user", "content": prompt}]
+
+        while True:
+            request = self._step_request()
             start_time = time.time()
-            step_resp = api_call_completion(
-                messages=self.messages,
-                model=self.model,
-                stop_list=[f"Step {self.current_step+1}:"]
-            )
-            end_time = time.time()
-
-            thinking_time = end_time - start_time
-            self.current_text = step_resp
-            self.steps.append((step_resp, thinking_time))
+            step_resp = await api_call_completion_async(**request)
+            self._record_step(step_resp, time.time() - start_time)
 
             yield step_resp
 
@@ -19,12 +19,36 @@
 #      - Allows post-step discussion round if majority votes for revision.
 # =========================================================================================
 
+import asyncio
 import json
 import time
 
 from Agent.agent import Agent
-from backend.api import api_call
-from Interaction.messagepool import message_pool
+from backend.api import (api_call, api_call_async, api_call_stream, api_call_stream_async,
+                         get_hedge_policy, task_retry_budget)
+from backend.streaming import JSONFieldStream
+from backend.decoding import STEP_KEYS, decode_json
+from Interaction.messagepool import get_pool, pool_scope
+from Interaction.window import get_window_policy
+
+
+class _Question:
+    """
+    The state of one question solved by Moderator2: its arguments, the steps so far
+    and the latest discussion summary, which is sent with the next step request.
+    Every o1think call has its own, so concurrent questions never share steps.
+    """
+
+    __slots__ = ("args", "steps", "user_message")
+
+    def __init__(self, args=None):
+        self.args = args
+        self.steps = []
+        self.user_message = None
+
+    @property
+    def temperature(self) -> float:
+        return self.args.temperature if self.args else 1.0
 
 
 class Moderator2(Agent):
@@ -46,25 +70,20 @@ class Moderator2(Agent):
         :param model: Identifier of the language model to be used.
         """
         super().__init__(name=name if name is not None else self._name, model=model)
-        self.user_message = None
-        self.steps = []
         self.final_answer = None
-        self.args = None
-
-    def generate_o1_response(self, question: str):
+        # Optional callable(key, value), invoked for each step field as soon as it has
+        # been streamed completely (only used in streaming mode).
+        self.step_listener = None
+        # Hedging policy for step requests, passed to api_call (True, False or a
+        # latency percentile). None uses the 'moderator2' entry of 'callers' in the
+        # 'hedging' config section, which is off unless configured.
+        self.hedge = None
+
+    def _initial_messages(self, question: str):
         """
-        A generator function that fetches chain-of-thought steps in JSON format from the LLM.
-        1. Submits an initial prompt specifying multi-step reasoning in JSON with keys
-           { "step", "reasoning", "next_action" }.
-        2. Loops until "next_action" is 'final_answer' or step_count > 25.
-        3. Yields partial steps for any external observer or orchestrator to handle them.
-        4. Finally requests a plain-text final answer from the model.
+        Builds the opening conversation for JSON-based multi-step reasoning.
         """
-        step_count = 1
-        total_thinking_time = 0
-
-        # Construct messages
-        messages = [
+        return [
             {
                 "role": "system",
                 "content": (
@@ -80,62 +99,220 @@ class Moderator2(Agent):
             }
         ]
 
+    @staticmethod
+    def _attach_user_message(messages, question: _Question):
+        """
+        Appends the question's user_message (e.g. a discussion summary), if any.
+        """
+        if question.user_message is not None:
+            messages.append({
+                "role": "user",
+                "content": json.dumps(question.user_message, ensure_ascii=False)
+            })
+
+    @staticmethod
+    def _window(messages):
+        """
+        The conversation to send, fitted into the 'moderator2' token budget of
+        Interaction/window.py: recent turns are sent verbatim, older steps are
+        condensed and superseded repeats of a user turn dropped.
+        """
+        return get_window_policy("moderator2").window_chat(messages)
+
+    @staticmethod
+    def _is_valid_step(step_data) -> bool:
+        """
+        Checks that a decoded step carries the keys required by the JSON protocol.
+        """
+        return all(key in step_data for key in STEP_KEYS)
+
+    @staticmethod
+    def _record_step(messages, question: _Question, step_data, step_count: int, step_time: float) -> bool:
+        """
+        Appends a decoded step to the conversation and to the question's steps, then
+        asks the LLM for the next action. Returns False when reasoning should stop.
+        """
+        messages.append({
+            "role": "assistant",
+            "content": json.dumps(step_data, indent=4, ensure_ascii=False)
+        })
+        question.steps.append((f"Step {step_count}: {step_data['step']}", step_data['reasoning'], step_time))
+
+        ref = step_data.get("next_action", None)
+
+        # If there's a next action that isn't final_answer, ask the LLM to proceed
+        if ref and ref != "final_answer":
+            messages.append({
+                "role": "user",
+                "content": (
+                    f"Proceed with next action '{ref}' in JSON format. "
+                    "Do not produce an empty output."
+                )
+            })
+            return True
+        return False
+
+    def _hedge(self):
+        """
+        The hedging setting of step requests. Steps are serial, so a slow one stalls
+        the whole question; hedging trades duplicate requests for a shorter tail.
+        """
+        if self.hedge is not None:
+            return self.hedge
+        return get_hedge_policy().for_caller(self._name)
+
+    def _request_step(self, messages, question: _Question):
+        """
+        Requests one JSON step without streaming. Malformed or incomplete steps are
+        repaired or retried inside the API layer.
+        """
+        return api_call(
+            messages,
+            model=self.model,
+            temperature=question.temperature,
+            max_tokens=2048,
+            json_format=True,
+            required_keys=STEP_KEYS,
+            caller=self.name,
+            hedge=self._hedge()
+        )
+
+    async def _request_step_async(self, messages, question: _Question):
+        """
+        Asyncio counterpart of _request_step().
+        """
+        return await api_call_async(
+            messages,
+            model=self.model,
+            temperature=question.temperature,
+            max_tokens=2048,
+            json_format=True,
+            required_keys=STEP_KEYS,
+            caller=self.name,
+            hedge=self._hedge()
+        )
+
+    def _stream_step(self, messages, question: _Question):
+        """
+        Streams one JSON step and returns it as soon as "step", "reasoning" and
+        "next_action" are complete; the remainder of the completion is not awaited.
+        Each completed field is also passed to self.step_listener, if set.
+
+        :return: The decoded step. If the stream ends before all fields were parsed,
+                 the full output is decoded (and repaired if necessary) instead; if
+                 that fails too, the step is requested once more without streaming.
+        """
+        parser = JSONFieldStream()
+        deltas = api_call_stream(
+            messages,
+            model=self.model,
+            temperature=question.temperature,
+            max_tokens=2048,
+            json_format=True,
+            caller=self.name
+        )
+        try:
+            for delta in deltas:
+                for key, value in parser.feed(delta):
+                    if self.step_listener is not None:
+                        self.step_listener(key, value)
+                if self._is_valid_step(parser.fields):
+                    return parser.fields
+        finally:
+            deltas.close()
+        try:
+            return decode_json(parser.buffer, STEP_KEYS)
+        except ValueError:
+            return self._request_step(messages, question)
+
+    async def _stream_step_async(self, messages, question: _Question):
+        """
+        Asyncio counterpart of _stream_step().
+        """
+        parser = JSONFieldStream()
+        deltas = api_call_stream_async(
+            messages,
+            model=self.model,
+            temperature=question.temperature,
+            max_tokens=2048,
+            json_format=True,
+            caller=self.name
+        )
+        try:
+            async for delta in deltas:
+                for key, value in parser.feed(delta):
+                    if self.step_listener is not None:
+                        self.step_listener(key, value)
+                if self._is_valid_step(parser.fields):
+                    return parser.fields
+        finally:
+            await deltas.aclose()
+        try:
+            return decode_json(parser.buffer, STEP_KEYS)
+        except ValueError:
+            return await self._request_step_async(messages, question)
+
+    @staticmethod
+    def _final_answer_request():
+        """
+        The closing user turn that asks for a plain-text final answer.
+        """
+        return {
+            "role": "user",
+            "content": (
+                "Now provide a final, plain-text answer. "
+                "Avoid JSON. Summarize clearly without extraneous structure."
+            )
+        }
+
+    def generate_o1_response(self, question: str, stream: bool = False, state: _Question = None):
+        """
+        A generator function that fetches chain-of-thought steps in JSON format from the LLM.
+        1. Submits an initial prompt specifying multi-step reasoning in JSON with keys
+           { "step", "reasoning", "next_action" }.
+        2. Loops until "next_action" is 'final_answer' or step_count > 25.
+        3. Yields partial steps for any external observer or orchestrator to handle them.
+        4. Finally requests a plain-text final answer from the model.
+
+        :param question: The question and knowledge prompt.
+        :param stream: If True, each step is parsed incrementally (see _stream_step) and
+                       yielded as soon as its fields are complete.
+        :param state: The question's state (steps, user_message, args); a new one if None.
+        """
+        state = state if state is not None else _Question()
+        step_count = 1
+        total_thinking_time = 0
+
+        # Construct messages
+        messages = self._initial_messages(question)
+
         # Repetitive steps flow
         while True:
-            # If user_message is updated externally, attach it
-            if self.user_message is not None:
-                messages.append({
-                    "role": "user",
-                    "content": json.dumps(self.user_message, ensure_ascii=False)
-                })
+            # If a discussion produced a user_message, attach it
+            self._attach_user_message(messages, state)
 
             start_time = time.time()
-            step_data = None
-
-            # Attempt multiple times to get valid JSON
-            for attempt in range(10):
-                try:
-                    step_data = api_call(
-                        messages,
-                        model=self.model,
-                        temperature=self.args.temperature if self.args else 1.0,
-                        max_tokens=2048,
-                        json_format=True
-                    )
-                    if "step" in step_data and "reasoning" in step_data and "next_action" in step_data:
-                        break
-                except Exception:
-                    time.sleep(1)
+
+            # A single call; the API layer applies the retry policy to invalid JSON too.
+            # The history is sent within the moderator's prompt budget.
+            window = self._window(messages)
+            try:
+                step_data = self._stream_step(window, state) if stream else self._request_step(window, state)
+            except Exception:
+                step_data = None
 
             end_time = time.time()
             step_time = end_time - start_time
             total_thinking_time += step_time
 
-            # If step_data is invalid after multiple attempts, break
+            # If no valid step could be obtained, break
             if not step_data:
                 break
 
-            # Record the step
-            messages.append({
-                "role": "assistant",
-                "content": json.dumps(step_data, indent=4, ensure_ascii=False)
-            })
-            self.steps.append((f"Step {step_count}: {step_data['step']}", step_data['reasoning'], step_time))
-
-            # Prepare for next step
+            # Record the step and prepare for the next one
+            proceed = self._record_step(messages, state, step_data, step_count, step_time)
             step_count += 1
-            ref = step_data.get("next_action", None)
-
-            # If there's a next action that isn't final_answer, ask the LLM to proceed
-            if ref and ref != "final_answer":
-                messages.append({
-                    "role": "user",
-                    "content": (
-                        f"Proceed with next action '{ref}' in JSON format. "
-                        "Do not produce an empty output."
-                    )
-                })
-            else:
+            if not proceed:
                 # If 'final_answer' or no next_action, end loop
                 break
 
@@ -144,31 +321,80 @@ class Moderator2(Agent):
                 break
 
             # Yield after each step
-            yield self.steps, None
+            yield state.steps, None
 
         # Request a final plain-text answer if next_action was 'final_answer'
-        messages.append({
-            "role": "user",
-            "content": (
-                "Now provide a final, plain-text answer. "
-                "Avoid JSON. Summarize clearly without extraneous structure."
-            )
-        })
+        messages.append(self._final_answer_request())
         start_time = time.time()
         final_text = api_call(
-            messages,
+            self._window(messages),
             self.model,
-            self.args.temperature if self.args else 1.0,
+            state.temperature,
             300,
-            json_format=False
+            json_format=False,
+            caller=self.name
         )
         end_time = time.time()
         final_time = end_time - start_time
         total_thinking_time += final_time
 
         # Append to steps
-        self.steps.append(("Final Answer", final_text, final_time))
-        yield self.steps, total_thinking_time
+        state.steps.append(("Final Answer", final_text, final_time))
+        yield state.steps, total_thinking_time
+
+    async def generate_o1_response_async(self, question: str, stream: bool = False,
+                                         state: _Question = None):
+        """
+        Async-generator counterpart of generate_o1_response(). Steps are awaited through
+        'api_call_async'; the yielded values are identical to the synchronous version.
+        """
+        state = state if state is not None else _Question()
+        step_count = 1
+        total_thinking_time = 0
+        messages = self._initial_messages(question)
+
+        while True:
+            self._attach_user_message(messages, state)
+
+            start_time = time.time()
+
+            try:
+                window = self._window(messages)
+                if stream:
+                    step_data = await self._stream_step_async(window, state)
+                else:
+                    step_data = await self._request_step_async(window, state)
+            except Exception:
+                step_data = None
+
+            step_time = time.time() - start_time
+            total_thinking_time += step_time
+
+            if not step_data:
+                break
+
+            proceed = self._record_step(messages, state, step_data, step_count, step_time)
+            step_count += 1
+            if not proceed or step_count > 25:
+                break
+
+            yield state.steps, None
+
+        messages.append(self._final_answer_request())
+        start_time = time.time()
+        final_text = await api_call_async(
+            self._window(messages),
+            self.model,
+            state.temperature,
+            300,
+            json_format=False,
+            caller=self.name
+        )
+        final_time = time.time() - start_time
+        total_thinking_time += final_time
+
+        state.steps.append(("Final Answer", final_text, final_time))
+        yield state.steps, total_thinking_time
 
     def o1think(self, task, knowledges, group, args):
         """
@@ -183,20 +409,34 @@ class Moderator2(Agent):
              If majority calls for revision, trigger a short discussion round in group.start().
           4. Return the final answer and the full list of steps.
 
+        The question runs under its own retry budget (each step is a single API call,
+        retried only inside the API layer) and inside pool_scope(group.message_pool),
+        so the moderator and the voting agents read the pool of the question's own
+        environment. Steps and discussion summaries are kept per call as well, so
+        questions solved concurrently by one Moderator2 share neither.
+
         :param task: An object containing at least 'question'.
         :param knowledges: Additional textual knowledge or context.
         :param group: A container with multiple agents (including optional Human or BlackSheep).
-        :param args: Configuration including 'temperature', 'mas', etc.
+        :param args: Configuration including 'temperature', 'mas', 'stream', etc.
         :return: (final_answer, steps) The final answer text and the entire step history.
         """
-        self.args = args
+        with task_retry_budget(), pool_scope(getattr(group, "message_pool", None)):
+            return self._o1think(task, knowledges, group, args)
+
+    def _o1think(self, task, knowledges, group, args):
+        """
+        Body of o1think(), run inside the question's retry budget.
+        """
+        state = _Question(args)
         question_text = f"Question: {task.question}\nKnowledge: {knowledges}\n"
 
         final_ans = None
         all_steps = None
 
         # Start iterative reasoning
-        for all_steps, total_time in self.generate_o1_response(question_text):
+        stream = getattr(args, "stream", False)
+        for all_steps, total_time in self.generate_o1_response(question_text, stream, state):
             # The last step in all_steps is the current state
             if not all_steps:
                 continue
@@ -216,26 +456,94 @@ class Moderator2(Agent):
 
             # Otherwise, gather votes from the group
             vote_results = [agent.vote(task.question, knowledges) for agent in group.people]
-            if sum(vote_results) > (len(vote_results) / 2):
-                # Revision is needed
-                recent_msgs = message_pool.get_visibile_messages()[1:]
-                partial_content = "\n".join([f"{m.send_from}: {m.content}" for m in recent_msgs])
-                summary, history = group.start(
-                    n_round=2,
-                    task=task,
-                    current_step=f"{current_step}\n{reasoning}",
-                    preious_content=partial_content,
-                    knowledges=knowledges
-                )
-                # The environment returns a "summary" that modifies self.user_message
-                self.user_message = summary
-                all_steps[-1] = (all_steps[-1], history)
-            else:
-                # No revision needed
-                all_steps[-1] = (all_steps[-1], None)
+            all_steps[-1] = (all_steps[-1], self._resolve_votes(
+                vote_results, task, knowledges, group, current_step, reasoning, state
+            ))
+
+        return final_ans, all_steps
+
+    async def o1think_async(self, task, knowledges, group, args):
+        """
+        Asyncio counterpart of o1think(). LLM steps are awaited and the votes of all
+        agents in 'group.people' are collected concurrently with asyncio.gather.
+        Agents without a 'vote_async' method are run in a worker thread.
+
+        :return: (final_answer, steps), exactly as o1think().
+        """
+        with task_retry_budget(), pool_scope(getattr(group, "message_pool", None)):
+            return await self._o1think_async(task, knowledges, group, args)
+
+    async def _o1think_async(self, task, knowledges, group, args):
+        """
+        Body of o1think_async(), run inside the question's retry budget.
+        """
+        state = _Question(args)
+        question_text = f"Question: {task.question}\nKnowledge: {knowledges}\n"
+
+        final_ans = None
+        all_steps = None
+
+        stream = getattr(args, "stream", False)
+        async for all_steps, total_time in self.generate_o1_response_async(question_text, stream, state):
+            if not all_steps:
+                continue
+            current_step, reasoning, _ = all_steps[-1]
+
+            self.say(f"{current_step}\n{reasoning}")
+
+            if current_step == "Final Answer":
+                final_ans = reasoning
+                break
+
+            if not args.mas:
+                continue
+
+            vote_results = await asyncio.gather(*[
+                self._vote_async(agent, task.question, knowledges) for agent in group.people
+            ])
+            history = await asyncio.to_thread(
+                self._resolve_votes, vote_results, task, knowledges, group, current_step, reasoning, state
+            )
+            all_steps[-1] = (all_steps[-1], history)
 
         return final_ans, all_steps
 
+    @staticmethod
+    async def _vote_async(agent, question, knowledges):
+        """
+        Awaits agent.vote_async when available, otherwise runs agent.vote in a thread.
+        """
+        if hasattr(agent, "vote_async"):
+            return await agent.vote_async(question, knowledges)
+        return await asyncio.to_thread(agent.vote, question, knowledges)
+
+    def _resolve_votes(self, vote_results, task, knowledges, group, current_step, reasoning,
+                       state: _Question):
+        """
+        If the majority of votes calls for revision, runs a short discussion round in
+        group.start() and stores its summary in the question's user_message.
+
+        :return: The discussion history, or None when no revision is needed.
+        """
+        if sum(vote_results) <= (len(vote_results) / 2):
+            # No revision needed
+            return None
+
+        # Revision is needed
+        # Every message but the first, rendered incrementally by the pool; the
+        # transcript's lines end in newlines, so the last one is dropped
+        partial_content = get_pool().transcript(self.name, visibile="all", start=1).text[:-1]
+        summary, history = group.start(
+            n_round=2,
+            task=task,
+            current_step=f"{current_step}\n{reasoning}",
+            preious_content=partial_content,
+            knowledges=knowledges
+        )
+        # The environment returns a "summary" that is sent with the next step
+        state.user_message = summary
+        return history
+
 
 def main():
     """
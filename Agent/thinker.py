@@ -13,9 +13,10 @@
 #      including synergy with the new chain-of-thought approach.
 # =========================================================================================
 
-from Agent.agent import Agent
-from backend.api import api_call
-from Interaction.messagepool import message_pool
+from Agent.agent import Agent, _not_from_human
+from backend.api import api_call, api_call_async
+from Interaction.window import render_transcript
+
 
 class Thinker(Agent):
     """
@@ -63,24 +64,44 @@ class Thinker(Agent):
         :param knowledges: A string representing relevant knowledge or context.
         :return: Integer 1 if we vote to revise, 0 otherwise.
         """
-        # Gather visible messages for Thinker
-        messages = message_pool.get_visibile_messages(visibile=self.name)
-
-        # Compile prior content from the Moderator or other participants
-        previous_content = ""
-        if len(messages) > 1:
-            for msg in messages[:-1]:
-                if msg.send_from.lower() not in ("human"):
-                    previous_content += f"{msg.send_from}: {msg.content}\n"
-
-        # The latest message is presumably the Moderator's current step
-        current_message = ""
-        if messages:
-            last_msg = messages[-1]
-            current_message = f"{last_msg.send_from}: {last_msg.content}\n"
+        response = api_call(
+            messages=[{"role": "user", "content": self.build_vote_prompt(question, knowledges)}],
+            model=self.model,
+            temperature=self._temperature(),
+            caller=self.name
+        )
+        return self.decide_vote(response)
+
+    async def vote_async(self, question: str, knowledges: str) -> int:
+        """
+        Asyncio counterpart of vote(). The prompt is built from the message pool
+        before awaiting the LLM, so concurrent voters see the same transcript.
+
+        :param question: The question under discussion, used as context in the prompt.
+        :param knowledges: A string representing relevant knowledge or context.
+        :return: Integer 1 if we vote to revise, 0 otherwise.
+        """
+        response = await api_call_async(
+            messages=[{"role": "user", "content": self.build_vote_prompt(question, knowledges)}],
+            model=self.model,
+            temperature=self._temperature(),
+            caller=self.name
+        )
+        return self.decide_vote(response)
+
+    def build_vote_prompt(self, question: str, knowledges: str) -> str:
+        """
+        Builds the yes/no revision prompt from the messages visible to this agent.
+        """
+        # Visible messages for Thinker within its prompt budget: prior content from
+        # the Moderator or other participants, and the latest message, presumably
+        # the Moderator's current step
+        previous_content, current_message = render_transcript(
+            self.name, "thinker", question, knowledges, include=_not_from_human
+        )
 
         # Build an LLM prompt to detect errors or flaws
-        prompt = f"""You are {self.name}, analyzing the moderator's latest reasoning step.
+        return f"""You are {self.name}, analyzing the moderator's latest reasoning step.
 Information: {knowledges}
 
 Question: {question}
@@ -99,16 +120,11 @@ Instructions:
 No extra text or symbols are allowed.
 """
 
-        # Call the LLM
-        temperature_val = 1.0
-        if self.args and hasattr(self.args, 'temperature'):
-            temperature_val = self.args.temperature
-
-        response = api_call(
-            messages=[{"role": "user", "content": prompt}],
-            model=self.model,
-            temperature=temperature_val
-        ).strip().lower()
+    def decide_vote(self, response: str) -> int:
+        """
+        Turns the raw LLM answer into a numeric vote and updates the conflict counter.
+        """
+        response = response.strip().lower()
 
         # Determine final vote
         if "yes" in response:
@@ -125,6 +141,14 @@ No extra text or symbols are allowed.
         else:
             return 0
 
+    def _temperature(self) -> float:
+        """
+        Sampling temperature taken from args, defaulting to 1.0.
+        """
+        if self.args and hasattr(self.args, 'temperature'):
+            return self.args.temperature
+        return 1.0
+
     def receive_message(self, msg):
         """
         This agent does not perform specialized behavior on incoming messages
@@ -0,0 +1,73 @@
+# =========================================================================================
+# checkpoint.py
+# =========================================================================================
+# Checkpoints of agent local states for global backtracking. An agent's local_state
+# is a persistent LocalState (see state.py), so instead of a deep copy of every
+# local_state per time step a checkpoint is an O(1) handle of the state, taken
+# together with the agent's (persistent) backtrack stack; restoring one is O(1) too.
+# An agent whose local_state is still a plain dict has it replaced by an equal
+# LocalState on its first capture.
+# =========================================================================================
+
+from Environment.state import LocalState
+
+
+class AgentCheckpoint:
+    """
+    The checkpoint of an agent: a handle of its local state and the agent's
+    backtrack stack at that time.
+    """
+
+    __slots__ = ("state", "backtrack_stack")
+
+    def __init__(self, state, backtrack_stack):
+        self.state = state
+        self.backtrack_stack = backtrack_stack
+
+
+class CheckpointStore:
+    """
+    CheckpointStore takes checkpoints of agents' local states. capture() returns
+    a checkpoint of one agent and restore() brings the agent back to it.
+    """
+
+    def __init__(self):
+        self._heads = {}  # agent name -> checkpoint at its latest capture or restore
+
+    def capture(self, agent) -> AgentCheckpoint:
+        """
+        Takes an O(1) checkpoint of 'agent.local_state'.
+
+        :return: The checkpoint, to be passed to restore().
+        """
+        if not isinstance(agent.local_state, LocalState):
+            agent.local_state = LocalState(agent.local_state)
+        checkpoint = self._heads[agent.name] = AgentCheckpoint(
+            agent.local_state.snapshot(), getattr(agent, "backtrack_stack", None))
+        return checkpoint
+
+    def restore(self, agent, checkpoint: AgentCheckpoint):
+        """
+        Brings 'agent.local_state' (and its backtrack stack) back to 'checkpoint'.
+        """
+        if isinstance(agent.local_state, LocalState):
+            agent.local_state.restore(checkpoint.state)
+        else:
+            agent.local_state = LocalState.from_handle(checkpoint.state)
+        if checkpoint.backtrack_stack is not None:
+            agent.backtrack_stack = checkpoint.backtrack_stack
+        self._heads[agent.name] = checkpoint
+
+    def head(self, name: str):
+        """
+        The checkpoint of the agent 'name' at its latest capture or restore, or None.
+        """
+        return self._heads.get(name)
+
+    @staticmethod
+    def delta_size(checkpoint: AgentCheckpoint, previous: AgentCheckpoint = None) -> int:
+        """
+        Estimated bytes a checkpoint stores beyond the 'previous' one.
+        """
+        written = previous.state.written if previous is not None else 0
+        return max(0, checkpoint.state.written - written)
@@ -9,9 +9,12 @@
 # =========================================================================================
 
 import time
-import copy
-from Interaction.messagepool import MessagePool
+import bisect
+from Environment.checkpoint import CheckpointStore
+from Environment.retention import make_retention
+from Interaction.messagepool import MessagePool, pool_scope
 from Interaction.message import Message
+from Interaction.subscription import MESSAGE_TYPES
 
 class Environment:
     """
@@ -23,34 +26,78 @@ class Environment:
       - Provide a foundation for specialized sub-environments
     """
 
-    def __init__(self, people: list, args):
+    def __init__(self, people: list, args, message_pool: MessagePool = None, retention=None):
         """
         :param people: A list of agents or participants.
         :param args: Configuration parameters (e.g. model settings, temperature, 
                      or concurrency options) relevant to multi-agent reasoning.
+        :param message_pool: Optional pool to use; a new, private one by default.
+        :param retention: Optional retention policy (or spec, see make_retention) for
+                          global_history; defaults to 'args.checkpoint_retention',
+                          which keeps every checkpoint when unset. Agents' backtrack
+                          stacks follow 'args.backtrack_retention' when it is set.
         """
         self.people = people
         self.args = args
         self.n = len(self.people)
 
-        # A central message pool for storing and retrieving all conversation messages
-        self.message_pool = MessagePool()
+        # A central message pool for storing and retrieving all conversation messages.
+        # Agents running inside self.scope() resolve it through get_pool().
+        self.message_pool = message_pool if message_pool is not None else MessagePool()
 
         # Maintain a global timeline that increments each "tick" or time-step
         self.current_time = 0
 
         # For global backtracking, we maintain snapshots of environment state 
-        # at discrete time indices.
+        # at discrete time indices. Agent states are O(1) handles of their persistent
+        # LocalStates, which share everything unchanged with the previous snapshot.
         self.global_history = {}
+        self.checkpoints = CheckpointStore()
+        if retention is None:
+            retention = getattr(args, "checkpoint_retention", None)
+        self.retention = make_retention(retention)
 
         # Maintain a conflict flag that can be raised by any agent or by the environment
         self.global_conflict_raised = False
         self.conflict_details = None
 
         # Register each agent with references to the environment or message pool if needed
+        backtrack_retention = getattr(args, "backtrack_retention", None)
         for agent in self.people:
             agent.message_bus = self  # So they can call `send_message` if we treat Env as a bus
-            # Additional environment-level registration logic as needed
+            if backtrack_retention is not None:
+                agent.backtrack_retention = make_retention(backtrack_retention)
+            # Protocol messages (see send_message) are pushed to the agent they are
+            # addressed to; untyped pool entries such as say() output are not
+            self.message_pool.subscribe(agent.name, msg_types=MESSAGE_TYPES, callback=self._delivery(agent))
+
+    @staticmethod
+    def _delivery(agent):
+        """
+        Subscription callback that hands a stored message to 'agent' in the dict
+        format of receive_message.
+        """
+        def deliver(msg):
+            agent.receive_message({
+                "sender": msg.send_from,
+                "receiver": msg.send_to,
+                "msg_type": msg.msg_type,
+                "content": msg.content
+            })
+        return deliver
+
+    def scope(self):
+        """
+        Context manager that makes this environment's pool the current pool, so
+        agents driven from inside it read and write this environment's messages.
+        """
+        return pool_scope(self.message_pool)
+
+    def subscribe(self, owner, recipient=None, msg_types=None, topics=None, callback=None, loop=None):
+        """
+        Subscribes to messages sent through this environment; see MessagePool.subscribe.
+        """
+        return self.message_pool.subscribe(owner, recipient, msg_types, topics, callback, loop)
 
     def broadcast_message(self, sender, msg_type, content):
         """
@@ -66,62 +113,80 @@ class Environment:
                     "content": content
                 })
 
-    def send_message(self, sender, receiver, msg_type, content):
+    def send_message(self, sender, receiver, msg_type, content, topic=None):
         """
-        Called by agents to relay messages. If 'receiver' is 'ALL', it broadcasts
-        to everyone else. Otherwise, it finds the intended agent and passes the message.
-        The environment also stores a record in the message pool.
+        Called by agents to relay messages. The environment stores a record in the
+        message pool, which pushes it to the subscribed agents: everyone else if
+        'receiver' is 'ALL', otherwise the intended agent. Agents receive messages
+        whose 'msg_type' is one of MESSAGE_TYPES; other messages are only stored.
         """
-        msg = Message(content=content, send_from=sender, send_to=receiver)
+        msg = Message(content=content, send_from=sender, send_to=receiver, msg_type=msg_type, topic=topic)
         self.message_pool.update_message(msg)
 
-        if receiver == "ALL":
-            self.broadcast_message(sender, msg_type, content)
-        else:
-            for agent in self.people:
-                if agent.name == receiver:
-                    agent.receive_message({
-                        "sender": sender,
-                        "receiver": receiver,
-                        "msg_type": msg_type,
-                        "content": content
-                    })
-
     def checkpoint_environment(self):
         """
         Creates a snapshot of the entire environment state (and agent local states).
         This is used for potential global backtracking if a system-wide conflict arises.
+        It costs O(1) per agent and message pool, independent of their size. Older
+        snapshots are then evicted according to the retention policy.
         """
         snapshot = {
             "time": self.current_time,
-            "message_pool": copy.deepcopy(self.message_pool.messages),
-            "agents_state": {}
+            # O(1): the pool is an append-only log, so a marker replaces a full copy
+            "message_pool": self.message_pool.create_marker(),
+            "agents_state": {},
+            "size": 0
         }
         for agent in self.people:
-            snapshot["agents_state"][agent.name] = copy.deepcopy(agent.local_state)
+            previous = self.checkpoints.head(agent.name)
+            checkpoint = self.checkpoints.capture(agent)
+            snapshot["agents_state"][agent.name] = checkpoint
+            snapshot["size"] += self.checkpoints.delta_size(checkpoint, previous)
         self.global_history[self.current_time] = snapshot
 
+        times = self.checkpoint_times()
+        for t in self.retention.evict(times, lambda t: self.global_history[t]["size"]):
+            del self.global_history[t]
+
+    def checkpoint_times(self) -> list:
+        """
+        The times of the snapshots still kept in global_history, oldest first.
+        """
+        return sorted(self.global_history)
+
+    def latest_checkpoint(self, before: int):
+        """
+        The time of the latest kept snapshot earlier than 'before', or None.
+        """
+        times = self.checkpoint_times()
+        i = bisect.bisect_left(times, before)
+        return times[i - 1] if i else None
+
     def revert_environment(self, target_time):
         """
         Reverts the environment state (and all agent local states) to the snapshot 
         at 'target_time'. Any messages or states introduced after 'target_time' are discarded.
+
+        :return: False if there is no snapshot for 'target_time' (never taken, or
+                 evicted by the retention policy), True otherwise.
         """
         if target_time not in self.global_history:
-            return  # Invalid or no snapshot for that time
+            return False  # Invalid or no snapshot for that time
 
         snapshot = self.global_history[target_time]
         # Revert message pool
-        self.message_pool.messages = copy.deepcopy(snapshot["message_pool"])
-        # Revert each agent's local state
+        self.message_pool.revert_to_marker(snapshot["message_pool"])
+        # Revert each agent's local state to its handle
         for agent in self.people:
             if agent.name in snapshot["agents_state"]:
-                agent.local_state = copy.deepcopy(snapshot["agents_state"][agent.name])
+                self.checkpoints.restore(agent, snapshot["agents_state"][agent.name])
         # Adjust the current_time backward
         self.current_time = target_time
         # Discard any snapshots after target_time
-        for t in sorted(list(self.global_history.keys())):
+        for t in self.checkpoint_times():
             if t > target_time:
                 del self.global_history[t]
+        return True
 
     def raise_conflict(self, details):
         """
@@ -142,13 +207,10 @@ class Environment:
         """
         # By default, revert to the earliest or the most recent checkpoint
         # in which no conflict had been detected. For demonstration, 
-        # revert to (current_time - 1) if it exists.
-        fallback_time = self.current_time - 1
-        while fallback_time >= 0:
-            if fallback_time in self.global_history:
-                self.revert_environment(fallback_time)
-                break
-            fallback_time -= 1
+        # revert to the latest checkpoint before current_time that is still kept.
+        fallback_time = self.latest_checkpoint(self.current_time)
+        if fallback_time is not None:
+            self.revert_environment(fallback_time)
         self.global_conflict_raised = False
         self.conflict_details = None
 
@@ -161,9 +223,10 @@ class Environment:
         # Checkpoint environment state at the start or end of each step
         self.checkpoint_environment()
 
-        # Run each agent's single-step logic
-        for agent in self.people:
-            agent.run_one_step()
+        # Run each agent's single-step logic against this environment's pool
+        with self.scope():
+            for agent in self.people:
+                agent.run_one_step()
 
         # If a conflict has been raised at any point:
         if self.global_conflict_raised:
@@ -29,12 +29,14 @@ class GroupChatEnvironment(Environment):
          supports a time-step model, backtracking snapshots, and conflict signals.
     """
 
-    def __init__(self, people: list, args):
+    def __init__(self, people: list, args, message_pool: MessagePool = None, retention=None):
         """
         :param people: A list of participant/agent objects that will partake in the chat.
         :param args: Configuration dict or object for environment-level parameters.
+        :param message_pool: Optional pool to use; a new, private one by default.
+        :param retention: Optional retention policy for global_history.
         """
-        super().__init__(people=people, args=args)
+        super().__init__(people=people, args=args, message_pool=message_pool, retention=retention)
         self.trust_graph = self._initialize_trust_graph()
         # Possibly store additional group-level data (like aggregated discussions)
         self.discussion_history = []
@@ -90,9 +92,10 @@ class GroupChatEnvironment(Environment):
         self.checkpoint_environment()
 
         # Let each agent produce or consume messages
-        for agent in self.people:
-            # Each agent might generate a message or check for conflicts
-            agent.run_one_step()
+        with self.scope():
+            for agent in self.people:
+                # Each agent might generate a message or check for conflicts
+                agent.run_one_step()
 
         # Conflict check (if raised by any agent):
         if self.global_conflict_raised:
@@ -0,0 +1,176 @@
+# =========================================================================================
+# retention.py
+# =========================================================================================
+# Retention policies that bound how many checkpoints are kept, for the environment's
+# global_history and for agents' backtrack stacks. A policy is given the keys of the
+# checkpoints (oldest first) and chooses which to evict; the newest checkpoint is
+# always kept:
+#   - KeepAll: the default, nothing is evicted
+#   - KeepLastN: only the 'n' most recent checkpoints
+#   - ExponentialThinning: every recent checkpoint, then one per doubling of age
+#   - MemoryBudget: the most recent checkpoints whose estimated size fits a budget
+# Policies can be combined with Chain, and built from a config dict with
+# make_retention().
+# =========================================================================================
+
+import sys
+
+
+def approx_size(obj) -> int:
+    """
+    Estimated memory of 'obj' in bytes, following dicts, lists, tuples and sets
+    (shared objects are counted once).
+    """
+    total = 0
+    seen = set()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+class RetentionPolicy:
+    """
+    Base class of retention policies.
+    """
+
+    def evict(self, keys: list, size_of=None) -> set:
+        """
+        Chooses the checkpoints to drop.
+
+        :param keys: Checkpoint keys (times or stack positions), oldest first.
+        :param size_of: Optional callable(key) returning a checkpoint's size in bytes.
+        :return: The set of keys to evict; never includes the newest key.
+        """
+        raise NotImplementedError
+
+
+class KeepAll(RetentionPolicy):
+
+    def evict(self, keys, size_of=None):
+        return set()
+
+    def __repr__(self):
+        return "KeepAll()"
+
+
+class KeepLastN(RetentionPolicy):
+
+    def __init__(self, n: int):
+        if n < 1:
+            raise ValueError("KeepLastN needs n >= 1.")
+        self.n = n
+
+    def evict(self, keys, size_of=None):
+        return set(keys[:-self.n])
+
+    def __repr__(self):
+        return f"KeepLastN({self.n})"
+
+
+class ExponentialThinning(RetentionPolicy):
+    """
+    Keeps the 'dense' most recent checkpoints. Of the older ones it keeps the oldest
+    checkpoint whose age (distance in keys from the newest) falls in each range
+    [2^k, 2^(k+1)), so about dense + log2(age) checkpoints remain, dense near the
+    present and sparse in the past.
+    """
+
+    def __init__(self, dense: int = 8):
+        if dense < 1:
+            raise ValueError("ExponentialThinning needs dense >= 1.")
+        self.dense = dense
+
+    def evict(self, keys, size_of=None):
+        if len(keys) <= self.dense:
+            return set()
+        newest = keys[-1]
+        evicted = set()
+        buckets = set()
+        for key in keys[:-self.dense]:
+            bucket = (newest - key).bit_length()
+            if bucket in buckets:
+                evicted.add(key)
+            else:
+                buckets.add(bucket)
+        return evicted
+
+    def __repr__(self):
+        return f"ExponentialThinning(dense={self.dense})"
+
+
+class MemoryBudget(RetentionPolicy):
+    """
+    Keeps the most recent checkpoints whose sizes add up to at most 'max_bytes'
+    (at least the newest one) and evicts all older ones.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+    def evict(self, keys, size_of=None):
+        if size_of is None or not keys:
+            return set()
+        used = size_of(keys[-1])
+        for i in range(len(keys) - 2, -1, -1):
+            used += size_of(keys[i])
+            if used > self.max_bytes:
+                return set(keys[:i + 1])
+        return set()
+
+    def __repr__(self):
+        return f"MemoryBudget({self.max_bytes})"
+
+
+class Chain(RetentionPolicy):
+    """
+    Applies several policies in turn, each to the checkpoints the previous ones kept.
+    """
+
+    def __init__(self, *policies):
+        self.policies = policies
+
+    def evict(self, keys, size_of=None):
+        evicted = set()
+        for policy in self.policies:
+            evicted |= policy.evict([k for k in keys if k not in evicted], size_of)
+        return evicted
+
+    def __repr__(self):
+        return f"Chain{self.policies!r}"
+
+
+def make_retention(spec=None) -> RetentionPolicy:
+    """
+    Builds a retention policy from 'spec': None (keep everything), a policy, an
+    integer (keep the last N), or a dict such as
+
+        {keep_last: 50}
+        {thinning: 16}                        # ExponentialThinning(dense=16)
+        {thinning: 16, max_bytes: 67108864}   # both, applied in that order
+
+    :raises ValueError: On an unknown key.
+    """
+    if spec is None:
+        return KeepAll()
+    if isinstance(spec, RetentionPolicy):
+        return spec
+    if isinstance(spec, int):
+        return KeepLastN(spec)
+    builders = {"keep_last": KeepLastN, "thinning": ExponentialThinning, "max_bytes": MemoryBudget}
+    unknown = set(spec) - set(builders)
+    if unknown:
+        raise ValueError(f"Unknown retention settings: {sorted(unknown)}")
+    policies = [builders[key](spec[key]) for key in builders if spec.get(key) is not None]
+    if not policies:
+        return KeepAll()
+    return policies[0] if len(policies) == 1 else Chain(*policies)
@@ -0,0 +1,399 @@
+# =========================================================================================
+# state.py
+# =========================================================================================
+# Persistent agent local state. A LocalState is a mutable facade over an immutable
+# root: every change builds a new root that shares all unchanged parts with the
+# previous one, so a checkpoint is just a reference to the current root:
+#   - PList: a persistent list (a chain of immutable nodes) with O(1) append and
+#     pop at the end; versions share their common prefix
+#   - LocalState: the dict-like local_state of an agent; list values are stored as
+#     PLists and read through live ListViews, so 'state["history"].append(x)' works
+#   - StateHandle: an O(1) checkpoint of a LocalState, restored in O(1)
+# Checkpoints share every stored value, so values are frozen when they are written:
+# dicts, nested lists and sets become FrozenDict, FrozenList and frozenset (changing
+# them in place raises TypeError; assign a new value instead), and objects of other
+# types are deep-copied when written and again when read.
+# =========================================================================================
+
+import copy
+from collections.abc import Mapping, MutableMapping, MutableSequence
+from Environment.retention import approx_size
+
+
+class FrozenDict(dict):
+    """
+    A dict that cannot be changed in place.
+    """
+
+    __slots__ = ()
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("LocalState values are immutable; assign a new value instead.")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+class FrozenList(list):
+    """
+    A list that cannot be changed in place.
+    """
+
+    __slots__ = ()
+
+    _immutable = FrozenDict._immutable
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = extend = insert = pop = remove = clear = sort = reverse = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+
+class _Copied:
+    """
+    A value of another type, handed out as a deep copy on every read.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = copy.deepcopy(value)
+
+
+_FROZEN = (str, bytes, int, float, complex, bool, type(None), frozenset, FrozenDict, FrozenList, _Copied)
+
+
+def _freeze(value, nested: bool = False):
+    """
+    The immutable form of a value to be stored.
+    """
+    if isinstance(value, _FROZEN):
+        return value
+    if isinstance(value, tuple):
+        return tuple(_freeze(v, True) for v in value)
+    if isinstance(value, dict):
+        return FrozenDict({key: _freeze(v, True) for key, v in value.items()})
+    if isinstance(value, (list, ListView)):
+        return FrozenList(_freeze(v, True) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    # Objects nested in frozen containers are copied once; top-level ones on every read
+    return copy.deepcopy(value) if nested else _Copied(value)
+
+
+def _thaw(value):
+    return copy.deepcopy(value.value) if type(value) is _Copied else value
+
+
+class PList:
+    """
+    An immutable list. push() and pop() return new versions in O(1); iteration
+    and indexing walk the nodes from the end.
+    """
+
+    __slots__ = ("_node", "_len")
+
+    def __init__(self, items=()):
+        node, length = None, 0
+        for item in items:
+            node, length = (node, item), length + 1
+        self._node = node
+        self._len = length
+
+    @classmethod
+    def _of(cls, node, length: int):
+        plist = cls.__new__(cls)
+        plist._node = node
+        plist._len = length
+        return plist
+
+    def push(self, item):
+        return PList._of((self._node, item), self._len + 1)
+
+    def pop(self):
+        """
+        :return: (the version without the last item, the last item)
+        :raises IndexError: If the list is empty.
+        """
+        if self._node is None:
+            raise IndexError("pop from empty PList")
+        return PList._of(self._node[0], self._len - 1), self._node[1]
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        items = []
+        node = self._node
+        while node is not None:
+            items.append(node[1])
+            node = node[0]
+        return reversed(items)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("PList index out of range")
+        node = self._node
+        for _ in range(self._len - 1 - i):
+            node = node[0]
+        return node[1]
+
+    def __eq__(self, other):
+        if isinstance(other, PList):
+            return self._len == other._len and list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (PList, (list(self),))
+
+    def __repr__(self):
+        return f"PList({list(self)!r})"
+
+
+class ListView(MutableSequence):
+    """
+    A live, list-like view of one list value of a LocalState. Reading goes to the
+    state's current version of the list; changes store a new version. Appending and
+    popping at the end are O(1); other changes rebuild the list. Items are frozen
+    like all values of a LocalState.
+    """
+
+    __slots__ = ("_state", "_key")
+
+    def __init__(self, state, key):
+        self._state = state
+        self._key = key
+
+    def _get(self) -> PList:
+        return self._state._root[self._key]
+
+    def _put(self, plist: PList):
+        self._state._replace(self._key, plist)
+
+    def _rebuild(self, change):
+        items = list(self._get())
+        change(items)
+        self._state._written += approx_size(items)
+        self._put(PList(_freeze(item) for item in items))
+
+    def __len__(self):
+        return len(self._get())
+
+    def __iter__(self):
+        return map(_thaw, self._get())
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [_thaw(item) for item in self._get()[i]]
+        return _thaw(self._get()[i])
+
+    def __setitem__(self, i, value):
+        self._rebuild(lambda items: items.__setitem__(i, value))
+
+    def __delitem__(self, i):
+        self._rebuild(lambda items: items.__delitem__(i))
+
+    def insert(self, i, value):
+        self._rebuild(lambda items: items.insert(i, value))
+
+    def append(self, value):
+        self._state._written += approx_size(value)
+        self._put(self._get().push(_freeze(value)))
+
+    def extend(self, values):
+        plist = self._get()
+        for value in values:
+            self._state._written += approx_size(value)
+            plist = plist.push(_freeze(value))
+        self._put(plist)
+
+    def pop(self, i=-1):
+        plist = self._get()
+        if i in (-1, len(plist) - 1):
+            plist, value = plist.pop()
+            self._put(plist)
+            return _thaw(value)
+        value = plist[i]
+        del self[i]
+        return _thaw(value)
+
+    def clear(self):
+        self._put(PList())
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, ListView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(list(self), memo)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class StateHandle:
+    """
+    An O(1) checkpoint of a LocalState. 'written' is the estimated number of bytes
+    written to the state up to the checkpoint, so the difference between two handles
+    estimates the memory the later one adds.
+    """
+
+    __slots__ = ("root", "written")
+
+    def __init__(self, root: dict, written: int):
+        self.root = root
+        self.written = written
+
+    def __repr__(self):
+        return f"StateHandle(keys={list(self.root)!r}, written={self.written})"
+
+
+def _persist(value):
+    if isinstance(value, PList):
+        return value
+    if isinstance(value, ListView):
+        return value._get()
+    if isinstance(value, list):
+        return PList(_freeze(item) for item in value)
+    return _freeze(value)
+
+
+class LocalState(MutableMapping):
+    """
+    LocalState is the local_state of an agent: a dict-like container whose
+    snapshot() and restore() are O(1), independent of the size of the state.
+    """
+
+    __slots__ = ("_root", "_written")
+
+    def __init__(self, *args, **kwargs):
+        values = dict(*args, **kwargs)
+        self._root = {key: _persist(value) for key, value in values.items()}
+        self._written = approx_size(values)
+
+    @classmethod
+    def from_handle(cls, handle: StateHandle):
+        state = cls()
+        state.restore(handle)
+        return state
+
+    def _replace(self, key, value):
+        # Copy-on-write of the (small) root; the values themselves are shared
+        root = dict(self._root)
+        root[key] = value
+        self._root = root
+
+    def snapshot(self) -> StateHandle:
+        return StateHandle(self._root, self._written)
+
+    def restore(self, handle: StateHandle):
+        self._root = handle.root
+        self._written = handle.written
+
+    def to_dict(self) -> dict:
+        """
+        A plain dict copy of the state, with lists for list values.
+        """
+        return {key: list(map(_thaw, value)) if isinstance(value, PList) else _thaw(value)
+                for key, value in self._root.items()}
+
+    def __getitem__(self, key):
+        value = self._root[key]
+        return ListView(self, key) if isinstance(value, PList) else _thaw(value)
+
+    def __setitem__(self, key, value):
+        if not isinstance(value, (ListView, PList)):
+            self._written += approx_size(value)
+        self._replace(key, _persist(value))
+
+    def __delitem__(self, key):
+        if key not in self._root:
+            raise KeyError(key)
+        root = dict(self._root)
+        del root[key]
+        self._root = root
+
+    def pop(self, key, *default):
+        if key not in self._root:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self._root[key]
+        del self[key]
+        return list(map(_thaw, value)) if isinstance(value, PList) else _thaw(value)
+
+    def popitem(self):
+        if not self._root:
+            raise KeyError("popitem(): LocalState is empty")
+        key = next(reversed(self._root))
+        return key, self.pop(key)
+
+    def __iter__(self):
+        return iter(self._root)
+
+    def __len__(self):
+        return len(self._root)
+
+    def __contains__(self, key):
+        return key in self._root
+
+    def __eq__(self, other):
+        if isinstance(other, LocalState):
+            other = other.to_dict()
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __copy__(self):
+        return LocalState.from_handle(self.snapshot())
+
+    def __deepcopy__(self, memo):
+        # The root is never changed in place, so a copy can share it
+        return LocalState.from_handle(self.snapshot())
+
+    def __reduce__(self):
+        return (LocalState, (self.to_dict(),))
+
+    def __repr__(self):
+        return f"LocalState({self.to_dict()!r})"
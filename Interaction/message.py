@@ -5,10 +5,55 @@
 # and structured metadata to support concurrency and advanced retrieval. This
 # aligns with the Interaction Layer described in the paper, allowing each message
 # to be labeled with the appropriate state transitions for non-monotonic reasoning.
+#
+# Messages are immutable and use __slots__, with interned sender/recipient names, so
+# message pools and their checkpoints can share them instead of copying. Default ids
+# are ULID-style: 26 Crockford base32 characters encoding a millisecond timestamp and
+# a random part, monotonic within a process, so they sort in creation order.
 # =========================================================================================
 
+import copy
+import os
+import sys
+import threading
 import time
-import uuid
+
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_BITS = 80
+_id_lock = threading.Lock()
+_last_ms = 0
+_last_random = 0
+
+
+def new_msg_id() -> str:
+    """
+    Returns a new ULID-style message id. Ids created later in the same process
+    always sort after earlier ones, even within the same millisecond.
+    """
+    global _last_ms, _last_random
+    with _id_lock:
+        ms = time.time_ns() // 1_000_000
+        if ms <= _last_ms:
+            ms, random_part = _last_ms, _last_random + 1
+            if random_part >> _RANDOM_BITS:
+                ms, random_part = ms + 1, 0
+        else:
+            random_part = int.from_bytes(os.urandom(_RANDOM_BITS // 8), "big")
+        _last_ms, _last_random = ms, random_part
+    value = (ms << _RANDOM_BITS) | random_part
+    return "".join(_CROCKFORD[(value >> shift) & 31] for shift in range(125, -1, -5))
+
+
+def _intern(name):
+    """
+    Interns agent names (and each name of a recipient list, which becomes a tuple).
+    """
+    if isinstance(name, str):
+        return sys.intern(name)
+    if isinstance(name, (list, tuple)):
+        return tuple(sys.intern(n) if isinstance(n, str) else n for n in name)
+    return name
+
 
 class Message:
     """
@@ -16,32 +61,76 @@ class Message:
     containing:
       - content (the textual payload)
       - send_from (the sender's name or identifier)
-      - send_to (the receiver's name or identifier, or 'ALL' for broadcast)
+      - send_to (the receiver's name or identifier, 'ALL' for broadcast, or a tuple
+        of names)
       - timestamp (when the message was created or dispatched)
-      - msg_id (a unique UUID to distinguish messages unambiguously)
+      - msg_id (a unique, sortable id to distinguish messages unambiguously)
+      - msg_type (optional message type, e.g. 'ASSERT' or 'CONFLICT')
+      - topic (optional topic used by subscriptions)
 
+    Messages are frozen: assigning an attribute raises AttributeError. Two messages
+    are equal if all their fields are equal.
     """
 
+    __slots__ = ("content", "send_from", "send_to", "timestamp", "msg_id", "msg_type", "topic")
+
     def __init__(
         self,
         content: str,
         send_from: str = None,
         send_to: str = None,
         timestamp: float = None,
-        msg_id: str = None
+        msg_id: str = None,
+        msg_type: str = None,
+        topic: str = None
     ):
         """
         :param content: The textual or JSON-based payload of the message.
         :param send_from: The name or identifier of the sending agent.
-        :param send_to: The intended recipient (an agent name or 'ALL').
+        :param send_to: The intended recipient (an agent name, 'ALL', or a list of names).
         :param timestamp: Optional float denoting creation time. Defaults to current time.
-        :param msg_id: An optional unique message identifier. Defaults to a UUID string.
+        :param msg_id: An optional unique message identifier. Defaults to new_msg_id().
+        :param msg_type: Optional message type, e.g. one of subscription.MESSAGE_TYPES.
+        :param topic: Optional topic for subscription filters.
         """
-        self.content = content
-        self.send_from = send_from
-        self.send_to = send_to
-        self.timestamp = timestamp if timestamp is not None else time.time()
-        self.msg_id = msg_id if msg_id is not None else str(uuid.uuid4())
+        setattr_ = object.__setattr__
+        setattr_(self, "content", content)
+        setattr_(self, "send_from", _intern(send_from))
+        setattr_(self, "send_to", _intern(send_to))
+        setattr_(self, "timestamp", timestamp if timestamp is not None else time.time())
+        setattr_(self, "msg_id", msg_id if msg_id is not None else new_msg_id())
+        setattr_(self, "msg_type", _intern(msg_type))
+        setattr_(self, "topic", _intern(topic))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Message is immutable; cannot set '{name}'.")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Message is immutable; cannot delete '{name}'.")
+
+    def __reduce__(self):
+        return (Message, self.as_tuple())
+
+    def as_tuple(self) -> tuple:
+        return (self.content, self.send_from, self.send_to, self.timestamp, self.msg_id,
+                self.msg_type, self.topic)
+
+    def __eq__(self, other):
+        if not isinstance(other, Message):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple()
+
+    def __hash__(self):
+        return hash(self.msg_id)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # Only a mutable (e.g. JSON dict) payload needs its own copy
+        if isinstance(self.content, (str, bytes, int, float, type(None))):
+            return self
+        return Message(copy.deepcopy(self.content, memo), *self.as_tuple()[1:])
 
     def __repr__(self):
         """
@@ -0,0 +1,143 @@
+# =========================================================================================
+# messagelog.py
+# =========================================================================================
+# Defines SpillingMessageLog, an optional storage backend for MessagePool in long
+# evaluation runs. Only a hot window of recent messages is kept in memory; older
+# messages are spilled to an append-only segment file and read back through a
+# read-only memory map. It behaves like the plain list MessagePool uses by default
+# (append, extend, len, indexing, slicing, iteration and 'del log[n:]'), so pool
+# queries and output_history read across both tiers transparently.
+# =========================================================================================
+
+import json
+import mmap
+import os
+import tempfile
+import weakref
+from array import array
+from Interaction.message import Message
+
+
+def _encode(msg: Message) -> bytes:
+    return json.dumps(list(msg.as_tuple()), ensure_ascii=False).encode("utf-8")
+
+
+def _decode(data) -> Message:
+    return Message(*json.loads(data))
+
+
+def _cleanup(file, path):
+    file.close()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class SpillingMessageLog:
+    """
+    SpillingMessageLog is a message sequence whose older entries live on disk.
+    When the hot window grows beyond 'hot_window' messages, the oldest half of it
+    is appended to the segment file. Spilled messages are decoded on every read,
+    so readers get equal but not identical Message objects for them.
+    """
+
+    def __init__(self, directory: str = None, hot_window: int = 1000):
+        """
+        :param directory: Where to create the segment file; the system temp
+                          directory by default. The file is removed on close().
+        :param hot_window: Number of recent messages kept in memory.
+        """
+        self.hot_window = hot_window
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix="messages-", suffix=".seg", dir=directory)
+        self._file = os.fdopen(fd, "r+b")
+        self._offsets = array("Q", [0])  # start of each spilled record, then the end
+        self._hot = []
+        self._map = None
+        self._finalizer = weakref.finalize(self, _cleanup, self._file, self.path)
+
+    @property
+    def spilled(self) -> int:
+        """
+        Number of messages stored in the segment file.
+        """
+        return len(self._offsets) - 1
+
+    def _spill(self):
+        count = max(1, len(self._hot) - self.hot_window // 2)
+        self._file.seek(self._offsets[-1])
+        for msg in self._hot[:count]:
+            data = _encode(msg)
+            self._file.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+        self._file.flush()
+        del self._hot[:count]
+
+    def _read(self, i: int) -> Message:
+        end = self._offsets[i + 1]
+        if self._map is None or len(self._map) < end:
+            # The file has grown since it was mapped
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return _decode(self._map[self._offsets[i]:end])
+
+    def append(self, msg: Message):
+        self._hot.append(msg)
+        if len(self._hot) > self.hot_window:
+            self._spill()
+
+    def extend(self, messages):
+        for msg in messages:
+            self.append(msg)
+
+    def truncate(self, length: int):
+        """
+        Keeps only the first 'length' messages.
+        """
+        spilled = self.spilled
+        if length >= spilled:
+            del self._hot[length - spilled:]
+            return
+        self._hot.clear()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        del self._offsets[length + 1:]
+        self._file.truncate(self._offsets[-1])
+
+    def close(self):
+        """
+        Closes and removes the segment file; the log must not be used afterwards.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._finalizer()
+
+    def __len__(self):
+        return self.spilled + len(self._hot)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("message log index out of range")
+        spilled = self.spilled
+        return self._hot[i - spilled] if i >= spilled else self._read(i)
+
+    def __delitem__(self, i):
+        if not isinstance(i, slice) or i.stop is not None or i.step is not None:
+            raise TypeError("SpillingMessageLog only supports deleting a tail ('del log[n:]').")
+        self.truncate(min(len(self), i.indices(len(self))[0]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return f"SpillingMessageLog(path={self.path!r}, spilled={self.spilled}, hot={len(self._hot)})"
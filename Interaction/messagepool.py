@@ -5,10 +5,112 @@
 # backtracking, concurrency checks, and advanced searching. This is central to the 
 # Interaction Layer in the paper, facilitating non-monotonic multi-agent reasoning 
 # with concurrent message events, conflict detection, and potential rollbacks.
+#
+# Queries are served from secondary indexes kept alongside the message list:
+#   - By recipient (direct names and list recipients) plus a broadcast ('ALL') list
+#   - By sender
+#   - A hash index on msg_id
+#   - A timestamp-sorted index for bisect range queries
+# The indexes are updated incrementally as messages are appended or truncated.
+#
+# The message list is an append-only log. A snapshot is a LogMarker recording the
+# log length, so taking one costs O(1) regardless of discussion length, and a revert
+# truncates the log back to the marker. Messages are shared between the log and its
+# markers rather than copied, which is safe because Message is immutable.
+#
+# Readers can follow the pool incrementally: transcript() keeps a rendered
+# transcript per view that is extended with new messages only. Once the log
+# has spilled to disk (see below), transcripts are rendered on demand instead, so the
+# rendered history is not held in memory either.
+#
+# Agents can also subscribe instead of polling: subscribe() registers recipient,
+# message-type and topic filters, and update_message pushes each new message to the
+# matching subscriptions only (see Interaction/subscription.py).
+#
+# Agents resolve their pool with get_pool(): the pool of the enclosing pool_scope()
+# block (e.g. the Environment of the question being solved) or, outside any scope,
+# the global message_pool. Scopes are context-local, so concurrent questions in
+# threads or asyncio tasks each see their own pool.
+#
+# The log is a plain list by default. For very long runs it can be any list-like
+# storage backend, e.g. Interaction.messagelog.SpillingMessageLog, which keeps only
+# recent messages in memory and spills older ones to a memory-mapped file.
 # =========================================================================================
 
-import copy
+import bisect
+import contextlib
+import contextvars
+import heapq
+import weakref
+from collections import defaultdict
 from Interaction.message import Message
+from Interaction.subscription import Subscription, SubscriptionRegistry
+
+
+class LogMarker:
+    """
+    A position in a MessagePool's log. The snapshot it denotes is the first 'base'
+    messages of the log followed by 'tail'. 'tail' is only non-empty once the log has
+    been truncated below the marker, and then holds the discarded messages the
+    marker still needs, so reverting to a marker taken before a later revert works.
+    """
+
+    __slots__ = ("base", "tail", "__weakref__")
+
+    def __init__(self, base: int):
+        self.base = base
+        self.tail = []
+
+    def __len__(self):
+        return self.base + len(self.tail)
+
+
+def render_line(msg: Message) -> str:
+    """
+    The transcript line of a message, as used in the agents' prompts.
+    """
+    return f"{msg.send_from}: {msg.content}\n"
+
+
+class Transcript:
+    """
+    Transcript is the incrementally rendered view of the messages visible to one
+    reader, split the way vote prompts use it:
+      - previous: the rendered lines of every message but the latest, restricted to
+        messages accepted by 'include'
+      - current: the rendered line of the latest message ('' if there is none)
+    The first 'start' visible messages are skipped.
+    """
+
+    def __init__(self, include=None, start: int = 0):
+        self.include = include
+        self.start = start
+        self.position = 0   # log length up to which messages have been consumed
+        self.skipped = 0
+        self.previous = ""
+        self.current = ""
+        self.last = None
+
+    @property
+    def text(self) -> str:
+        return self.previous + self.current
+
+    def extend(self, messages):
+        """
+        Adds newly visible messages; only they are rendered.
+        """
+        lines = []
+        for msg in messages:
+            if self.skipped < self.start:
+                self.skipped += 1
+                continue
+            if self.last is not None and (self.include is None or self.include(self.last)):
+                lines.append(self.current)
+            self.last = msg
+            self.current = render_line(msg)
+        if lines:
+            self.previous += "".join(lines)
+
 
 class MessagePool:
     """
@@ -24,13 +126,132 @@ class MessagePool:
     traced through message history.
     """
 
-    def __init__(self):
+    def __init__(self, log=None):
         """
         Initializes an empty collection of messages and a dictionary to hold
         historical snapshots for potential rollback.
+
+        :param log: Optional storage backend for the message log (see set_storage).
         """
-        self.messages = []
-        self.history_snapshots = {}  # time_index -> list of messages
+        self._messages = log if log is not None else []
+        self._markers = weakref.WeakSet()  # live LogMarkers, updated on truncation
+        self._reindex()
+        self.history_snapshots = {}  # time_index -> LogMarker
+        self._transcripts = {}       # (reader, visibile) -> Transcript
+        self._subscriptions = SubscriptionRegistry()
+
+    # --------------------------------------------------------------------------
+    # Secondary Indexes
+    # --------------------------------------------------------------------------
+    # Every index stores positions in self.messages in ascending order, so results
+    # keep insertion order and two position lists can be merged in linear time.
+    # Messages must not be appended to or removed from 'messages' directly; use
+    # update_message, or assign a new list, which reindexes it.
+    # --------------------------------------------------------------------------
+    @property
+    def messages(self):
+        return self._messages
+
+    @messages.setter
+    def messages(self, messages):
+        messages = list(messages)
+        self._truncate(0)
+        for msg in messages:
+            self._append(msg)
+
+    def set_storage(self, log):
+        """
+        Moves the message log to another storage backend, e.g. a
+        SpillingMessageLog. Positions are unchanged, so indexes and markers stay
+        valid.
+
+        :param log: An empty list-like object supporting append, len, indexing,
+                    slicing, iteration and 'del log[n:]'.
+        """
+        if len(log):
+            raise ValueError("The new message log must be empty.")
+        log.extend(self._messages)
+        self._messages = log
+
+    def _reindex(self):
+        """
+        Rebuilds every secondary index from self.messages.
+        """
+        self._by_recipient = defaultdict(list)   # agent name -> positions
+        self._broadcast = []                     # positions of messages sent to 'ALL'
+        self._by_sender = defaultdict(list)      # sender name -> positions
+        self._by_id = defaultdict(list)          # msg_id -> positions
+        self._ts_keys = []                       # sorted timestamps
+        self._ts_positions = []                  # positions, parallel to _ts_keys
+        for position, msg in enumerate(self._messages):
+            self._index(position, msg)
+
+    def _index(self, position: int, msg: Message):
+        """
+        Adds the message at 'position' to every secondary index.
+        """
+        if msg.send_to == "ALL":
+            self._broadcast.append(position)
+        elif isinstance(msg.send_to, tuple):
+            for name in dict.fromkeys(msg.send_to):
+                self._by_recipient[name].append(position)
+        elif msg.send_to is not None:
+            self._by_recipient[msg.send_to].append(position)
+        self._by_sender[msg.send_from].append(position)
+        self._by_id[msg.msg_id].append(position)
+
+        # Timestamps normally arrive in order, making this an append
+        slot = bisect.bisect_right(self._ts_keys, msg.timestamp)
+        self._ts_keys.insert(slot, msg.timestamp)
+        self._ts_positions.insert(slot, position)
+
+    def _unindex(self, position: int, msg: Message):
+        """
+        Removes the last message of the log (at 'position') from every index.
+        """
+        lists = []
+        if msg.send_to == "ALL":
+            lists.append((None, self._broadcast, None))
+        elif isinstance(msg.send_to, tuple):
+            lists += [(self._by_recipient, self._by_recipient[name], name) for name in dict.fromkeys(msg.send_to)]
+        elif msg.send_to is not None:
+            lists.append((self._by_recipient, self._by_recipient[msg.send_to], msg.send_to))
+        lists.append((self._by_sender, self._by_sender[msg.send_from], msg.send_from))
+        lists.append((self._by_id, self._by_id[msg.msg_id], msg.msg_id))
+        for index, positions, key in lists:
+            positions.pop()
+            if index is not None and not positions:
+                del index[key]
+
+        lo = bisect.bisect_left(self._ts_keys, msg.timestamp)
+        hi = bisect.bisect_right(self._ts_keys, msg.timestamp)
+        slot = self._ts_positions.index(position, lo, hi)
+        del self._ts_keys[slot]
+        del self._ts_positions[slot]
+
+    def _truncate(self, length: int):
+        """
+        Discards every message after the first 'length'. Markers beyond the cut keep
+        the discarded messages they cover in their tail.
+        """
+        if length >= len(self._messages):
+            return
+        for marker in list(self._markers):
+            if marker.base > length:
+                marker.tail = self._messages[length:marker.base] + marker.tail
+                marker.base = length
+        for position in range(len(self._messages) - 1, length - 1, -1):
+            self._unindex(position, self._messages[position])
+        del self._messages[length:]
+        for key in [k for k, t in self._transcripts.items() if t.position > length]:
+            # Rendered text covers discarded messages; rebuild on next use
+            del self._transcripts[key]
+
+    def _merged(self, *position_lists):
+        """
+        Returns the messages at the union of disjoint, ascending position lists.
+        """
+        return [self._messages[i] for i in heapq.merge(*position_lists)]
 
     # --------------------------------------------------------------------------
     # Basic Insertion & Retrieval
@@ -39,10 +260,17 @@ class MessagePool:
         """
         Appends a new Message to the message pool. In a typical workflow,
         this method is called whenever an agent or the environment sends a message.
+        Matching subscriptions are notified; messages restored by a revert are not
+        delivered again.
 
         :param msg: The Message object to store.
         """
-        self.messages.append(msg)
+        self._append(msg)
+        self._subscriptions.publish(msg)
+
+    def _append(self, msg: Message):
+        self._messages.append(msg)
+        self._index(len(self._messages) - 1, msg)
 
     def get_visibile_messages(self, visibile: str = "all"):
         """
@@ -55,11 +283,8 @@ class MessagePool:
             return self.messages
         else:
             # Return only messages whose send_to includes the agent
-            # or is 'ALL'. 
-            return [
-                m for m in self.messages
-                if m.send_to == "ALL" or (visibile in m.send_to if isinstance(m.send_to, list) else m.send_to == visibile)
-            ]
+            # or is 'ALL'.
+            return self._merged(self._by_recipient.get(visibile, ()), self._broadcast)
 
     def get_ones_messages(self, name: str = "all"):
         """
@@ -70,10 +295,7 @@ class MessagePool:
         """
         if name == "all":
             return self.messages
-        return [
-            m for m in self.messages
-            if m.send_from == name or m.send_from == "all"
-        ]
+        return self._merged(self._by_sender.get(name, ()), self._by_sender.get("all", ()))
 
     def show_messages(self, limit: int = None):
         """
@@ -102,16 +324,108 @@ class MessagePool:
             lines.append(f"[{m.timestamp:.2f}] {m.send_from} => {m.send_to}: {m.content}")
         return "\n".join(lines)
 
+    # --------------------------------------------------------------------------
+    # Cached Transcripts
+    # --------------------------------------------------------------------------
+    def _visible_since(self, visibile: str, position: int):
+        """
+        Messages visible to 'visibile' (or all messages for 'all') whose log
+        position is at least 'position'.
+        """
+        if visibile == "all":
+            return self._messages[position:]
+        direct = self._by_recipient.get(visibile, ())
+        return self._merged(
+            direct[bisect.bisect_left(direct, position):],
+            self._broadcast[bisect.bisect_left(self._broadcast, position):],
+        )
+
+    def transcript(self, reader: str, visibile: str = None, include=None, start: int = 0) -> Transcript:
+        """
+        Returns the cached Transcript of the messages visible to 'visibile'
+        (default: the reader), brought up to date by rendering only the messages
+        added since it was last used. It is rebuilt if the pool was reverted past
+        it or if 'include'/'start' differ from the cached one. If the log has
+        spilled older messages to disk, nothing is cached and the transcript is
+        rendered from the log on every call.
+
+        :param reader: Name of the agent that owns the transcript.
+        :param visibile: Agent name whose view is rendered, or 'all'.
+        :param include: Optional predicate; messages it rejects are left out of
+                        'previous' (the latest message is always 'current').
+        :param start: Number of leading visible messages to skip.
+        """
+        key = (reader, visibile or reader)
+        if getattr(self._messages, "spilled", 0):
+            # A cached transcript would keep the spilled history in memory as text
+            self._transcripts.clear()
+            transcript = Transcript(include, start)
+            transcript.extend(self._visible_since(key[1], 0))
+            transcript.position = len(self._messages)
+            return transcript
+        transcript = self._transcripts.get(key)
+        if transcript is None or transcript.include is not include or transcript.start != start:
+            transcript = self._transcripts[key] = Transcript(include, start)
+        transcript.extend(self._visible_since(key[1], transcript.position))
+        transcript.position = len(self._messages)
+        return transcript
+
+    # --------------------------------------------------------------------------
+    # Push-Based Subscriptions
+    # --------------------------------------------------------------------------
+    def subscribe(self, owner: str, recipient: str = None, msg_types=None, topics=None,
+                  callback=None, loop=None) -> Subscription:
+        """
+        Registers a subscription for messages added from now on.
+
+        :param owner: Name of the subscribing agent; its own broadcasts are skipped.
+        :param recipient: Name whose messages are delivered (default: the owner),
+                          or 'all' for every message.
+        :param msg_types: Optional iterable of message types to accept.
+        :param topics: Optional iterable of topics to accept.
+        :param callback: Optional callable(msg) invoked on delivery instead of queuing.
+        :param loop: Optional asyncio loop; the inbox is then read with get_async().
+        :return: The Subscription, whose inbox is read with get(), get_async() or drain().
+        """
+        return self._subscriptions.add(Subscription(owner, recipient or owner, msg_types, topics, callback, loop))
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.remove(subscription)
+
     # --------------------------------------------------------------------------
     # Concurrency & Backtracking Support
     # --------------------------------------------------------------------------
+    def create_marker(self) -> LogMarker:
+        """
+        Returns a marker for the current end of the log. Creating one is O(1); the
+        marker stays valid until it is garbage collected.
+        """
+        marker = LogMarker(len(self._messages))
+        self._markers.add(marker)
+        return marker
+
+    def revert_to_marker(self, marker: LogMarker):
+        """
+        Restores the log to the state denoted by 'marker'. Only messages added since
+        the marker (or discarded from it by an earlier revert) are touched.
+
+        :param marker: A marker created by this pool's create_marker().
+        """
+        if marker not in self._markers:
+            raise ValueError("Marker does not belong to this message pool.")
+        self._truncate(marker.base)
+        tail, marker.tail = marker.tail, []
+        for msg in tail:
+            self._append(msg)
+        marker.base = len(self._messages)
+
     def snapshot_state(self, time_index: int):
         """
         Creates a snapshot of the current messages for a given time index.
 
         :param time_index: A discrete time or step index managed by the environment.
         """
-        self.history_snapshots[time_index] = copy.deepcopy(self.messages)
+        self.history_snapshots[time_index] = self.create_marker()
 
     def revert_state(self, time_index: int):
         """
@@ -121,7 +435,7 @@ class MessagePool:
         :param time_index: The time index to which we revert.
         """
         if time_index in self.history_snapshots:
-            self.messages = copy.deepcopy(self.history_snapshots[time_index])
+            self.revert_to_marker(self.history_snapshots[time_index])
 
     def prune_snapshots_after(self, time_index: int):
         """
@@ -144,7 +458,7 @@ class MessagePool:
         :param msg_id: The unique message ID to locate.
         :return: A list of matching Message objects (rarely more than one).
         """
-        return [m for m in self.messages if m.msg_id == msg_id]
+        return [self._messages[i] for i in self._by_id.get(msg_id, ())]
 
     def find_messages_in_time_range(self, start_time: float, end_time: float):
         """
@@ -154,30 +468,45 @@ class MessagePool:
         :param end_time: The upper bound of the time interval.
         :return: A list of messages in chronological order.
         """
-        return [
-            m for m in self.messages
-            if start_time <= m.timestamp <= end_time
-        ]
+        lo = bisect.bisect_left(self._ts_keys, start_time)
+        hi = bisect.bisect_right(self._ts_keys, end_time)
+        return [self._messages[i] for i in self._ts_positions[lo:hi]]
 
     def clear_pool(self):
         """
         Empties the current list of messages entirely, typically used 
         if the environment or supervisor instructs a major reset.
         """
-        self.messages.clear()
         self.history_snapshots.clear()
+        self.messages = []
 
 
 # Global-level convenience references (optional).
 message_pool = MessagePool()
 
+# The pool of the enclosing pool_scope() block, if any
+_current_pool = contextvars.ContextVar("message_pool", default=None)
+
 def get_pool():
     """
-    Retrieves the global message_pool instance. 
-    This is optional if you prefer using environment-specific or agent-specific pools.
+    Retrieves the current pool: the one of the enclosing pool_scope() block,
+    otherwise the global message_pool instance.
     """
-    global message_pool
-    return message_pool
+    return _current_pool.get() or message_pool
+
+@contextlib.contextmanager
+def pool_scope(pool: MessagePool):
+    """
+    Makes 'pool' the current pool for every get_pool() call inside the block,
+    including threads and asyncio tasks started from it with a copy of the context
+    (asyncio.to_thread, asyncio.gather, ...). A None pool leaves the current
+    pool unchanged.
+    """
+    token = _current_pool.set(pool or get_pool())
+    try:
+        yield pool
+    finally:
+        _current_pool.reset(token)
 
 def update_pool(pool: MessagePool):
     """
@@ -0,0 +1,148 @@
+# =========================================================================================
+# subscription.py
+# =========================================================================================
+# Defines the push-based delivery used by MessagePool. Instead of polling the pool,
+# an agent subscribes with filters on recipient, message type and topic, and each
+# stored message is delivered only to the subscriptions that match it:
+#   - Subscription: the filters plus a per-subscriber inbox, readable from threads
+#     (get) or from asyncio code (get_async), or an optional callback
+#   - SubscriptionRegistry: subscriptions indexed by recipient, so publishing a
+#     directed message only looks at that recipient's subscribers
+# =========================================================================================
+
+import asyncio
+import queue
+import threading
+from collections import defaultdict
+
+# Message types exchanged by the agents of the multi-agent pipeline
+MESSAGE_TYPES = ("ASSERT", "INFORM", "CONFLICT", "BACKTRACK", "CHALLENGE")
+
+
+class Subscription:
+    """
+    Subscription receives the messages addressed to 'recipient' (or every message if
+    'recipient' is 'all') whose type is in 'msg_types' and topic in 'topics' (None
+    accepts all). Broadcasts ('ALL') reach every subscription except the sender's own.
+
+    Matching messages are passed to 'callback' when one is given; otherwise they are
+    queued in the subscription's inbox. With 'loop' set, the inbox is an asyncio
+    queue on that loop and publishing from any thread is safe.
+    """
+
+    def __init__(self, owner: str, recipient: str = "all", msg_types=None, topics=None,
+                 callback=None, loop=None):
+        """
+        :param owner: Name of the subscribing agent.
+        :param recipient: Name whose messages are delivered, or 'all' for every message.
+        :param msg_types: Optional iterable of message types, e.g. ("CONFLICT", "BACKTRACK").
+        :param topics: Optional iterable of topics.
+        :param callback: Optional callable(msg) invoked synchronously on delivery.
+        :param loop: Optional asyncio event loop that owns the inbox.
+        """
+        self.owner = owner
+        self.recipient = recipient
+        self.msg_types = frozenset(msg_types) if msg_types is not None else None
+        self.topics = frozenset(topics) if topics is not None else None
+        self.callback = callback
+        self.loop = loop
+        self.active = True
+        self._inbox = asyncio.Queue() if loop is not None else queue.SimpleQueue()
+
+    def matches(self, msg) -> bool:
+        if msg.send_to == "ALL" and msg.send_from == self.owner:
+            return False
+        if self.msg_types is not None and msg.msg_type not in self.msg_types:
+            return False
+        return self.topics is None or msg.topic in self.topics
+
+    def deliver(self, msg):
+        if self.callback is not None:
+            self.callback(msg)
+        elif self.loop is not None:
+            self.loop.call_soon_threadsafe(self._inbox.put_nowait, msg)
+        else:
+            self._inbox.put(msg)
+
+    def get(self, timeout: float = None):
+        """
+        Blocks until a message arrives (thread inbox only).
+
+        :raises queue.Empty: If 'timeout' expires first.
+        """
+        return self._inbox.get(timeout=timeout)
+
+    async def get_async(self):
+        """
+        Waits for the next message (asyncio inbox only).
+        """
+        return await self._inbox.get()
+
+    def drain(self) -> list:
+        """
+        Returns every queued message without blocking.
+        """
+        messages = []
+        while not self._inbox.empty():
+            messages.append(self._inbox.get_nowait())
+        return messages
+
+
+class SubscriptionRegistry:
+    """
+    SubscriptionRegistry indexes subscriptions by recipient and delivers published
+    messages in subscription order.
+    """
+
+    def __init__(self):
+        self._seq = 0
+        self._all = {}                          # Subscription -> registration order
+        self._by_recipient = defaultdict(dict)  # recipient -> {Subscription: order}
+        self._wildcard = {}                     # subscriptions to 'all'
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._all)
+
+    def add(self, subscription: Subscription) -> Subscription:
+        with self._lock:
+            self._seq += 1
+            self._all[subscription] = self._seq
+            if subscription.recipient == "all":
+                self._wildcard[subscription] = self._seq
+            else:
+                self._by_recipient[subscription.recipient][subscription] = self._seq
+        return subscription
+
+    def remove(self, subscription: Subscription):
+        with self._lock:
+            subscription.active = False
+            self._all.pop(subscription, None)
+            self._wildcard.pop(subscription, None)
+            subscribers = self._by_recipient.get(subscription.recipient)
+            if subscribers is not None:
+                subscribers.pop(subscription, None)
+                if not subscribers:
+                    del self._by_recipient[subscription.recipient]
+
+    def _candidates(self, msg):
+        if msg.send_to == "ALL":
+            return dict(self._all)
+        candidates = dict(self._wildcard)
+        names = msg.send_to if isinstance(msg.send_to, tuple) else (msg.send_to,)
+        for name in names:
+            candidates.update(self._by_recipient.get(name, {}))
+        return candidates
+
+    def publish(self, msg):
+        """
+        Delivers 'msg' to every matching subscription. Callbacks may publish further
+        messages; subscriptions added meanwhile only see later messages.
+        """
+        if not self._all:
+            return
+        with self._lock:
+            candidates = self._candidates(msg)
+        for subscription in sorted(candidates, key=candidates.get):
+            if subscription.active and subscription.matches(msg):
+                subscription.deliver(msg)
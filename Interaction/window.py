@@ -0,0 +1,269 @@
+# =========================================================================================
+# window.py
+# =========================================================================================
+# Token-budgeted rendering of conversation history for agent prompts. Vote and
+# moderator prompts otherwise embed the entire visible history, so prompt tokens
+# (and latency and cost) grow with discussion length. A WindowPolicy caps the tokens
+# one prompt may spend on history:
+#   - The most recent messages are kept verbatim
+#   - Older messages are collapsed into condensed one-line summaries, cached per
+#     message so each is condensed once. The cache is an LRU of 'cache_size'
+#     summaries keyed by message id (chat turns by a digest of their content), so
+#     it never holds full message texts
+#   - Whatever still does not fit is replaced by a count of omitted messages
+# Transcripts are rendered from the live MessagePool, so messages discarded by a
+# backtrack never reach a prompt. Windowing is opt-in: budgets are set per agent
+# role in the 'transcript' section of 'config/env.yaml', and roles without one get
+# the full history as before.
+# =========================================================================================
+
+import collections
+import hashlib
+import threading
+
+from Interaction.messagepool import get_pool
+
+# Allowance for the fixed instructions of a vote prompt, in tokens
+PROMPT_OVERHEAD = 200
+
+# Share of the budget always left to the history when the rest of the prompt
+# (question, knowledge) is larger than the budget, unless 'min_history' is set
+MIN_HISTORY_SHARE = 0.25
+
+
+def estimate_tokens(text: str, chars_per_token: int = 4) -> int:
+    """
+    Cheap token estimate (about four characters per token), consistent with the
+    estimate used for rate limiting.
+    """
+    return (len(text) + chars_per_token - 1) // chars_per_token
+
+
+def _render_line(msg) -> str:
+    return f"{msg.send_from}: {msg.content}\n"
+
+
+def _digest(text: str) -> tuple:
+    return ("chat", hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+
+
+class WindowPolicy:
+    """
+    WindowPolicy fits conversation history into a token budget. A budget of None
+    disables windowing, and the full history is rendered as before.
+    """
+
+    def __init__(self, budget: int = None, recent: int = 4, summary_chars: int = 160,
+                 cache_size: int = 10000, min_history: int = None):
+        """
+        :param budget: Token budget of a whole prompt, or None for no limit.
+        :param recent: Number of latest messages kept verbatim whenever they fit.
+        :param summary_chars: Length of the condensed form of an older message.
+        :param cache_size: Number of condensed messages kept in the cache.
+        :param min_history: Tokens always left to the history, even when the rest of
+                            the prompt uses up the budget (a quarter of it by default).
+        """
+        self.budget = budget
+        self.min_history = min_history
+        self.recent = recent
+        self.summary_chars = summary_chars
+        self.cache_size = cache_size
+        self._condensed = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict = None, role: str = None):
+        """
+        Builds the policy of 'role' from the 'transcript' section of
+        'config/env.yaml', e.g.:
+
+            transcript:
+              budgets: {thinker: 4000, blacksheep: 4000, moderator2: 16000}
+              recent: 4
+              summary_chars: 160
+
+        A role missing from 'budgets' (or with a null budget) is not windowed.
+        """
+        config = dict(config or {})
+        budgets = config.pop("budgets", None) or {}
+        return cls(budget=budgets.get(role), **config)
+
+    def _history_budget(self, spent: int) -> int:
+        """
+        Tokens left to the history after 'spent' tokens of the rest of the prompt,
+        but never less than the history floor.
+        """
+        floor = self.min_history if self.min_history is not None else int(self.budget * MIN_HISTORY_SHARE)
+        return max(self.budget - spent, floor)
+
+    def _condense(self, key, text: str) -> str:
+        """
+        Returns the cached condensed form of 'text'.
+        """
+        with self._lock:
+            condensed = self._condensed.get(key)
+            if condensed is not None:
+                self._condensed.move_to_end(key)
+                return condensed
+        flat = " ".join(text.split())
+        if len(flat) > self.summary_chars:
+            flat = flat[:self.summary_chars].rstrip() + " ..."
+        with self._lock:
+            self._condensed[key] = flat
+            if len(self._condensed) > self.cache_size:
+                self._condensed.popitem(last=False)
+        return flat
+
+    def _fit(self, count: int, verbatim, condense, budget: int):
+        """
+        Chooses how to show 'count' items (oldest first) within 'budget' tokens.
+        Up to 'recent' newest items are kept verbatim, older ones condensed, and the
+        oldest ones that still do not fit are omitted. 'verbatim(i)' and
+        'condense(i)' return the full and the condensed text of item i.
+
+        :return: (first, start): items before 'first' are omitted, items in
+                 [first, start) condensed and items from 'start' on verbatim.
+        """
+        used = 0
+        start = count
+        while start > max(0, count - self.recent):
+            cost = estimate_tokens(verbatim(start - 1))
+            if used + cost > budget:
+                break
+            used += cost
+            start -= 1
+
+        first = start
+        while first > 0:
+            cost = estimate_tokens(condense(first - 1))
+            if used + cost > budget:
+                break
+            used += cost
+            first -= 1
+        return first, start
+
+    def render(self, messages, include=None, reserved: int = 0):
+        """
+        Renders pool messages (oldest first) in the transcript format of the vote
+        prompts, split into the prior content and the current (latest) message.
+
+        :param include: Optional predicate; rejected messages are left out of the
+                        prior content (the latest message is always current).
+        :param reserved: Tokens of the prompt already spent outside the transcript.
+        :return: (previous, current) strings.
+        """
+        messages = list(messages)
+        if not messages:
+            return "", ""
+        current = _render_line(messages[-1])
+        prior = [m for m in messages[:-1] if include is None or include(m)]
+        if self.budget is None:
+            return "".join(_render_line(m) for m in prior), current
+
+        def condense(i):
+            msg = prior[i]
+            return f"{msg.send_from}: {self._condense(msg.msg_id, str(msg.content))}\n"
+
+        budget = self._history_budget(reserved + estimate_tokens(current))
+        first, start = self._fit(len(prior), lambda i: _render_line(prior[i]), condense, budget)
+        lines = [f"[{first} earlier messages omitted]\n"] if first else []
+        lines += [condense(i) for i in range(first, start)]
+        lines += [_render_line(m) for m in prior[start:]]
+        return "".join(lines), current
+
+    def window_chat(self, messages, head: int = 3, reserved: int = 0):
+        """
+        Fits a chat history (a list of {"role", "content"} dicts) into the budget.
+        The first 'head' messages (system prompt and question) and the latest
+        message are always kept. A user turn repeated verbatim later in the history
+        (e.g. a revision summary attached again at every step) is superseded; its
+        earlier copies are dropped where that leaves no two assistant turns
+        adjacent. Older turns that do not fit are collapsed into one user message
+        with their condensed forms. The history itself is not modified.
+
+        :param reserved: Tokens of the request spent outside 'messages'.
+        :return: The list of messages to send.
+        """
+        if self.budget is None or len(messages) <= head + 1:
+            return messages
+        body = _drop_superseded(messages[head:])
+        # Repeated user turns (e.g. the same "proceed" instruction) are condensed once
+        seen, repeated = set(), set()
+        for i, turn in enumerate(body):
+            if turn["role"] == "user":
+                if turn["content"] in seen:
+                    repeated.add(i)
+                seen.add(turn["content"])
+
+        def condense(i):
+            turn = body[i]
+            if i in repeated:
+                return ""
+            return f"{turn['role']}: {self._condense(_digest(turn['content']), turn['content'])}\n"
+
+        budget = self._history_budget(reserved + sum(estimate_tokens(m["content"]) for m in messages[:head]))
+        first, start = self._fit(len(body), lambda i: body[i]["content"], condense, budget)
+        start = min(start, len(body) - 1)
+        if start == 0:
+            return messages[:head] + body
+        # The collapsed turns become a user message, so the next kept turn should
+        # be the assistant's
+        if body[start]["role"] == "user" and start > first:
+            start -= 1
+        lines = [f"[{first} earlier turns omitted]\n"] if first else []
+        lines += [condense(i) for i in range(first, start)]
+        summary = {"role": "user", "content": "Condensed record of the earlier steps:\n" + "".join(lines)}
+        return messages[:head] + [summary] + body[start:]
+
+
+def _drop_superseded(turns):
+    last_copy = {m["content"]: i for i, m in enumerate(turns) if m["role"] == "user"}
+    kept = []
+    for i, turn in enumerate(turns):
+        superseded = turn["role"] == "user" and last_copy[turn["content"]] != i
+        next_role = turns[i + 1]["role"] if i + 1 < len(turns) else None
+        if superseded and ((kept and kept[-1]["role"] == "user") or next_role == "user"):
+            continue
+        kept.append(turn)
+    return kept
+
+
+def render_transcript(reader: str, role: str, question: str = "", knowledges: str = "", include=None):
+    """
+    Renders the history visible to 'reader' for a vote prompt within the budget of
+    its role. While the full history fits, the pool's incrementally cached
+    transcript is used as is.
+
+    :param question: The question embedded in the prompt (counted against the budget).
+    :param knowledges: The knowledge embedded in the prompt (counted against the budget).
+    :param include: Optional predicate for messages of the prior content.
+    :return: (previous, current) strings.
+    """
+    policy = get_window_policy(role)
+    pool = get_pool()
+    transcript = pool.transcript(reader, include=include)
+    if policy.budget is None:
+        return transcript.previous, transcript.current
+    reserved = estimate_tokens(str(question)) + estimate_tokens(str(knowledges)) + PROMPT_OVERHEAD
+    if reserved + estimate_tokens(transcript.previous) + estimate_tokens(transcript.current) <= policy.budget:
+        return transcript.previous, transcript.current
+    return policy.render(pool.get_visibile_messages(reader), include, reserved)
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def get_window_policy(role: str) -> WindowPolicy:
+    """
+    Returns the process-wide WindowPolicy of an agent role (its lower-case class
+    name), built from the 'transcript' section of the configuration.
+    """
+    policy = _policies.get(role)
+    if policy is None:
+        from backend.api import get_config
+        with _policies_lock:
+            policy = _policies.get(role)
+            if policy is None:
+                policy = _policies[role] = WindowPolicy.from_config(get_config().get("transcript"), role)
+    return policy
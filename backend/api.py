@@ -5,17 +5,38 @@
 # including a mechanism to handle retries, streaming, JSON-formatted responses,
 # and environment-based configuration. It also offers helper functions for
 # handling text similarity checks.
+#
+# Call path: pooled clients, routing and fallbacks (routing.py), retries and circuit
+# breakers (retry.py), rate limits (ratelimit.py), response cache (cache.py),
+# request coalescing (singleflight.py), JSON repair (decoding.py), hedging
+# (hedging.py), batches (batch.py), telemetry (telemetry.py) and a fake backend
+# (fake_llm.py). Configuration is loaded lazily; see the README for its sections.
 # =========================================================================================
 
+import asyncio
+import contextlib
+import copy
+import functools
 import json
 import os
 import time
 import logging
-import yaml
+import threading
+import weakref
 
 from difflib import SequenceMatcher
-from dotenv import load_dotenv
-from openai import OpenAI, AzureOpenAI
+
+from backend.cache import ResponseCache, make_key
+from backend.singleflight import SingleFlight, AsyncSingleFlight
+from backend.ratelimit import build_rate_limiter, estimate_tokens
+from backend.decoding import MalformedOutputError, decode_json
+from backend.telemetry import CallRecord, get_telemetry
+from backend.retry import (CircuitBreaker, EmptyResponseError, RetryPolicy, call_once,
+                           call_once_async, call_with_failover, call_with_failover_async,
+                           retry_budget)
+from backend.batch import BatchJob, LocalBatchBackend, OpenAIBatchBackend
+from backend.hedging import HedgePolicy, LatencyTracker, run_hedged, run_hedged_async
+from backend.routing import Router
 
 logger = logging.getLogger(__name__)
 
@@ -42,154 +63,1258 @@ def remove_similar_prefix(text, prefix, threshold=0.8):
 # -----------------------------------------------------------------------------------------
 # Environment loading
 # -----------------------------------------------------------------------------------------
+# The configuration is read on first use and cached, so importing this module needs
+# neither a config file nor the yaml/dotenv packages. The file defaults to
+# 'config/env.yaml' and can be moved with REAGENT_CONFIG. Any value can be
+# overridden by an environment variable (or a .env file) named REAGENT__ followed by
+# its '__'-separated path, with the value parsed as YAML, e.g.:
+#
+#   REAGENT__services__deepseek__api_key=sk-...
+#   REAGENT__retry__max_attempts=3
+# -----------------------------------------------------------------------------------------
+
+CONFIG_PATH = "config/env.yaml"
+ENV_OVERRIDE_PREFIX = "REAGENT__"
+
+_config = None
+_config_lock = threading.Lock()
+
+def _apply_env_overrides(config):
+    """
+    Merges REAGENT__section__key=value environment variables into 'config'.
+    """
+    import yaml
+
+    for name, value in os.environ.items():
+        if not name.startswith(ENV_OVERRIDE_PREFIX):
+            continue
+        path = name[len(ENV_OVERRIDE_PREFIX):].split("__")
+        node = config
+        for part in path[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        node[path[-1]] = yaml.safe_load(value) if value else value
+    return config
+
+def load_config():
+    """
+    Loads the complete YAML configuration from 'config/env.yaml' (or REAGENT_CONFIG)
+    and applies environment overrides. A missing file yields an empty configuration.
+    """
+    import yaml
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    path = os.environ.get("REAGENT_CONFIG", CONFIG_PATH)
+    config = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            config = yaml.safe_load(f) or {}
+    config.setdefault('services', {})
+    return _apply_env_overrides(config)
+
+def get_config():
+    """
+    Returns the cached configuration, loading it on first use.
+    """
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = load_config()
+    return _config
+
+def reload_config():
+    """
+    Drops the cached configuration so that the next call re-reads it. Clients,
+    limiters and other objects already built from the old values are kept.
+    """
+    global _config
+    with _config_lock:
+        _config = None
 
 def load_env():
     """
     Loads YAML configuration from 'config/env.yaml' and retrieves a 'services' object
     that contains various API endpoints and credentials.
     """
-    with open("config/env.yaml", "r") as f:
-        service = yaml.safe_load(f)['services']
-    return service
+    return get_config()['services']
+
+def get_service(provider):
+    """
+    Returns the service entry of 'provider'.
+
+    :raises KeyError: If 'provider' has no entry under 'services'.
+    """
+    services = get_config()['services']
+    if provider not in services:
+        raise KeyError(f"No service '{provider}' configured in {os.environ.get('REAGENT_CONFIG', CONFIG_PATH)} "
+                       f"or via {ENV_OVERRIDE_PREFIX}services__{provider}__* variables.")
+    return services[provider]
+
+# -----------------------------------------------------------------------------------------
+# Fake backend
+# -----------------------------------------------------------------------------------------
+# For benchmarks and load tests every provider can be served by the offline fake
+# backend instead of a real API. It is enabled by 'enabled: true' in the 'fake_llm'
+# section of 'config/env.yaml' or by REAGENT_FAKE_LLM=1, which takes precedence
+# (REAGENT_FAKE_LLM=0 disables it regardless of the config).
+# -----------------------------------------------------------------------------------------
+
+_fake_llm = None
+_fake_llm_lock = threading.Lock()
+
+def fake_llm_enabled():
+    """
+    True if calls should be served by the fake backend.
+    """
+    flag = os.environ.get("REAGENT_FAKE_LLM")
+    if flag is not None:
+        return flag.strip().lower() in ("1", "true", "yes", "on")
+    return bool((get_config().get('fake_llm') or {}).get('enabled', False))
+
+def get_fake_llm():
+    """
+    Returns the process-wide FakeLLM built from the 'fake_llm' section.
+    """
+    from backend.fake_llm import FakeLLM
+
+    global _fake_llm
+    if _fake_llm is None:
+        with _fake_llm_lock:
+            if _fake_llm is None:
+                _fake_llm = FakeLLM.from_config(get_config().get('fake_llm'))
+    return _fake_llm
+
+# -----------------------------------------------------------------------------------------
+# Client registry
+# -----------------------------------------------------------------------------------------
+# Building an OpenAI client also builds a fresh HTTP connection pool, so every call
+# used to pay for TCP/TLS setup. Clients are now created once per
+# (provider, base_url, api_key) and shared by all callers; the underlying httpx
+# pool is thread-safe. Pool sizes and timeouts can be set per service entry in
+# 'config/env.yaml', e.g.:
+#
+#   services:
+#     deepseek:
+#       api_key: ...
+#       base_url: ...
+#       timeout: 120
+#       max_connections: 64
+#       keepalive_expiry: 60
+# -----------------------------------------------------------------------------------------
+
+CLIENT_DEFAULTS = {
+    "timeout": 600.0,                 # total read/write timeout in seconds
+    "connect_timeout": 10.0,          # TCP/TLS connect timeout in seconds
+    "max_connections": 100,           # upper bound on concurrent connections
+    "max_keepalive_connections": 20,  # idle connections kept open for reuse
+    "keepalive_expiry": 30.0,         # seconds an idle connection stays open
+    "max_concurrency": 64,            # in-flight async requests per provider
+}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def resolve_provider(model):
+    """
+    Maps a model identifier to the name of its primary service entry in
+    'config/env.yaml', according to the routing table (see get_router).
+
+    :param model: The model name or identifier (e.g., "deepseek-chat").
+    :return: The provider key, e.g. 'openai', 'qwen', 'deepseek' or 'claude'.
+    :raises ValueError: If no route matches 'model'.
+    """
+    return get_router().route(model).provider
+
+def client_options(provider):
+    """
+    Returns the connection-pool and timeout settings for 'provider', i.e. the
+    CLIENT_DEFAULTS overridden by any matching keys in its service entry.
+    """
+    service = get_config()['services'].get(provider, {})
+    return {key: service.get(key, default) for key, default in CLIENT_DEFAULTS.items()}
+
+def _http_settings(provider):
+    """
+    Translates client_options(provider) into httpx 'limits' and 'timeout' arguments.
+    """
+    import httpx
+
+    options = client_options(provider)
+    return {
+        "limits": httpx.Limits(
+            max_connections=options["max_connections"],
+            max_keepalive_connections=options["max_keepalive_connections"],
+            keepalive_expiry=options["keepalive_expiry"],
+        ),
+        "timeout": httpx.Timeout(options["timeout"], connect=options["connect_timeout"]),
+    }
+
+def _build_client(provider):
+    """
+    Constructs an OpenAI client for 'provider' backed by a dedicated httpx pool.
+    """
+    import httpx
+    from openai import OpenAI
+
+    service = get_service(provider)
+    http_client = httpx.Client(**_http_settings(provider))
+    return OpenAI(
+        base_url=service['base_url'],
+        api_key=service['api_key'],
+        http_client=http_client,
+    )
+
+def get_client(provider):
+    """
+    Returns the shared OpenAI client for 'provider', creating it on first use.
+    A new client is built if the provider's base_url or api_key changes.
+
+    :param provider: A service key from 'config/env.yaml' (see resolve_provider).
+    :return: An OpenAI client that is safe to share across threads.
+    """
+    if fake_llm_enabled():
+        from backend.fake_llm import FakeChatClient
+        return FakeChatClient(get_fake_llm())
+    service = get_service(provider)
+    key = (provider, service['base_url'], service['api_key'])
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _build_client(provider)
+                _clients[key] = client
+    return client
+
+def close_clients():
+    """
+    Closes every pooled client and releases its connections. Subsequent calls
+    transparently rebuild the clients they need.
+    """
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+# -----------------------------------------------------------------------------------------
+# Async client registry
+# -----------------------------------------------------------------------------------------
+# httpx.AsyncClient connections belong to the event loop that opened them, so async
+# clients and the per-provider concurrency semaphores are kept per running loop.
+# Within a loop they are shared exactly like the synchronous clients above.
+# -----------------------------------------------------------------------------------------
+
+_async_clients = weakref.WeakKeyDictionary()     # loop -> {client key: AsyncOpenAI}
+_async_semaphores = weakref.WeakKeyDictionary()  # loop -> {provider: asyncio.Semaphore}
+
+def get_async_client(provider):
+    """
+    Returns the AsyncOpenAI client for 'provider' on the running event loop,
+    creating it on first use. Must be called from within a coroutine.
+    """
+    if fake_llm_enabled():
+        from backend.fake_llm import AsyncFakeChatClient
+        return AsyncFakeChatClient(get_fake_llm())
+    service = get_service(provider)
+    key = (provider, service['base_url'], service['api_key'])
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(key)
+    if client is None:
+        import httpx
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(
+            base_url=service['base_url'],
+            api_key=service['api_key'],
+            http_client=httpx.AsyncClient(**_http_settings(provider)),
+        )
+        clients[key] = client
+    return client
+
+def provider_semaphore(provider):
+    """
+    Returns the semaphore bounding in-flight async requests to 'provider' on the
+    running event loop. Its size is the provider's 'max_concurrency' option.
+    """
+    semaphores = _async_semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(provider)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(client_options(provider)["max_concurrency"])
+        semaphores[provider] = semaphore
+    return semaphore
+
+async def aclose_clients():
+    """
+    Closes the async clients that belong to the running event loop.
+    """
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
+
+# -----------------------------------------------------------------------------------------
+# Response cache
+# -----------------------------------------------------------------------------------------
+# The cache is opt-in through the 'cache' section of 'config/env.yaml' (see
+# ResponseCache.from_config) or set_response_cache(). Every call function takes a
+# 'cache' argument: None applies the default policy (deterministic requests only),
+# True forces caching of sampled requests, and False bypasses the cache.
+# -----------------------------------------------------------------------------------------
+
+_response_cache = None
+_response_cache_loaded = False
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """
+    Returns the process-wide ResponseCache, or None if caching is not enabled.
+    """
+    global _response_cache, _response_cache_loaded
+    if not _response_cache_loaded:
+        with _response_cache_lock:
+            if not _response_cache_loaded:
+                _response_cache = ResponseCache.from_config(get_config().get('cache'))
+                _response_cache_loaded = True
+    return _response_cache
+
+def set_response_cache(cache):
+    """
+    Installs 'cache' (a ResponseCache or None) as the process-wide response cache,
+    overriding the 'cache' section of 'config/env.yaml'.
+    """
+    global _response_cache, _response_cache_loaded
+    with _response_cache_lock:
+        _response_cache = cache
+        _response_cache_loaded = True
+
+def _cache_key(use_cache, **request):
+    """
+    Returns the cache key for a request, or None if the request must bypass the cache.
+    """
+    cache = get_response_cache()
+    if cache is None or not cache.should_cache(request["temperature"], use_cache):
+        return None
+    return make_key(**request)
+
+def _cache_get(key, record=None):
+    """
+    Looks up a cached response text; returns None when 'key' is None or on a miss.
+    The lookup result is noted on 'record' (see backend/telemetry.py).
+    """
+    if key is None:
+        return None
+    value = get_response_cache().get(key)
+    if record is not None:
+        record.cache = "miss" if value is None else "hit"
+    return value
+
+def _cached_result(key, record=None, json_format=False, required_keys=None):
+    """
+    Looks up a cached response and decodes it like a fresh one. Returns None on a
+    miss; a cached JSON response that no longer decodes or lacks 'required_keys'
+    is treated as a miss, so the request is sent and the entry replaced.
+    """
+    cached = _cache_get(key, record)
+    if cached is None or not json_format:
+        return cached
+    try:
+        return decode_json(cached, required_keys)
+    except MalformedOutputError as e:
+        logger.debug(f"Ignoring cached response that fails validation: {e}")
+        if record is not None:
+            record.cache = "miss"
+        return None
+
+def _cache_put(key, value):
+    """
+    Stores a response text if the request was eligible for caching.
+    """
+    if key is not None:
+        get_response_cache().put(key, value)
+
+# -----------------------------------------------------------------------------------------
+# Rate limiting
+# -----------------------------------------------------------------------------------------
+# Providers with 'rpm' and/or 'tpm' in their service entry get a token-bucket
+# limiter, shared by all threads and, with the 'file' backend of the 'rate_limit'
+# section, by all worker processes on the host. Each attempt reserves one request
+# and an estimate of its tokens; the estimate is settled against response.usage.
+# -----------------------------------------------------------------------------------------
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider):
+    """
+    Returns the RateLimiter for 'provider', or None if it has no configured budget.
+    """
+    if provider not in _rate_limiters:
+        with _rate_limiters_lock:
+            if provider not in _rate_limiters:
+                _rate_limiters[provider] = build_rate_limiter(
+                    provider, get_config()['services'].get(provider, {}), get_config().get('rate_limit')
+                )
+    return _rate_limiters[provider]
+
+def _usage_tokens(response):
+    """
+    Total tokens reported by the provider for a response, or None if unavailable.
+    """
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+# -----------------------------------------------------------------------------------------
+# Request coalescing
+# -----------------------------------------------------------------------------------------
+# Identical requests that are in flight at the same time (e.g. several voters built
+# from the same template) share one upstream call; see backend/singleflight.py.
+# Like the response cache, this applies to deterministic (temperature == 0)
+# requests by default, since sampled requests are independent draws; every call
+# function accepts 'dedupe' to override it.
+# -----------------------------------------------------------------------------------------
+
+_in_flight = SingleFlight()
+_in_flight_async = AsyncSingleFlight()
+
+# -----------------------------------------------------------------------------------------
+# Retry policy and circuit breakers
+# -----------------------------------------------------------------------------------------
+# All call functions retry through backend/retry.py: capped, jittered back-off,
+# retryable/fatal error classification, the current task's retry budget (see
+# task_retry_budget) and one circuit breaker per provider. Settings come from the
+# 'retry' and 'circuit_breaker' sections of 'config/env.yaml'.
+# -----------------------------------------------------------------------------------------
+
+_retry_policy = None
+_circuit_breakers = {}
+_retry_lock = threading.Lock()
+
+def get_retry_policy():
+    """
+    Returns the process-wide RetryPolicy built from the 'retry' config section.
+    """
+    global _retry_policy
+    if _retry_policy is None:
+        with _retry_lock:
+            if _retry_policy is None:
+                from openai import (APIConnectionError, APITimeoutError, InternalServerError,
+                                    RateLimitError)
+
+                _retry_policy = RetryPolicy.from_config(
+                    get_config().get('retry'),
+                    retryable_errors=(APITimeoutError, APIConnectionError, RateLimitError,
+                                      InternalServerError, ConnectionError, TimeoutError,
+                                      EmptyResponseError, MalformedOutputError),
+                    outage_errors=(APIConnectionError, ConnectionError, TimeoutError),
+                )
+    return _retry_policy
+
+def get_circuit_breaker(provider):
+    """
+    Returns the CircuitBreaker guarding 'provider', creating it on first use.
+    """
+    breaker = _circuit_breakers.get(provider)
+    if breaker is None:
+        with _retry_lock:
+            breaker = _circuit_breakers.get(provider)
+            if breaker is None:
+                breaker = CircuitBreaker.from_config(provider, get_config().get('circuit_breaker'))
+                _circuit_breakers[provider] = breaker
+    return breaker
+
+def task_retry_budget(max_retries=None):
+    """
+    Context manager that scopes a retry budget to one task (e.g. one question).
+    Defaults to 'task_budget' in the 'retry' config section; without it, no budget
+    is enforced.
+    """
+    if max_retries is None:
+        max_retries = (get_config().get('retry') or {}).get('task_budget')
+    return retry_budget(max_retries)
+
+# -----------------------------------------------------------------------------------------
+# Model routing
+# -----------------------------------------------------------------------------------------
+# Model names are mapped to providers by the routing table in the 'routing' section
+# of 'config/env.yaml' (see Router.from_config); without it the historical
+# substring rules apply. Each call tries its route's targets in order, healthy
+# providers first: a provider whose circuit breaker is open or whose health score
+# (recent 429/5xx/connection failures and latency) is low is tried last. The
+# targets share one call's retry attempts: a provider is retried after transient
+# errors and left for the next target after an outage or a 429.
+# -----------------------------------------------------------------------------------------
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router():
+    """
+    Returns the process-wide Router built from the 'routing' config section.
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = Router.from_config(get_config().get('routing'))
+    return _router
+
+def _record_health(provider, error, latency=None):
+    """
+    Feeds one attempt into the provider's health score. Errors count against it
+    only if they point at the provider (outages and rate limiting), not at the
+    request itself.
+    """
+    if error is None:
+        get_router().record(provider, True, latency)
+    elif get_retry_policy().is_outage(error) or getattr(error, "status_code", None) == 429:
+        get_router().record(provider, False)
 
-global services
-services = load_env()
+def _provider_available(provider):
+    return get_circuit_breaker(provider).state != "open"
+
+def _candidates(model, kwargs):
+    """
+    Returns (provider, request kwargs) for each routing target of 'model' whose
+    provider is configured. Resolving the services here, before any attempt, makes
+    a configuration error fail the call at once instead of being retried.
+
+    :raises KeyError: If no target of 'model' has a service entry.
+    """
+    targets = get_router().resolve(model, available=_provider_available)
+    if not fake_llm_enabled():
+        services = get_config()['services']
+        configured = [t for t in targets if t.provider in services]
+        if not configured:
+            get_service(targets[0].provider)
+        targets = configured
+    return [(t.provider, dict(kwargs, model=t.model)) for t in targets]
+
+def _targets(model, kwargs, attempt, policy, hedge=False, record=None, asynchronous=False):
+    """
+    Returns the (attempt, breaker) targets of a routed call for call_with_failover,
+    with each attempt hedged if 'hedge' is set (see _hedged_attempt).
+    """
+    candidates = _candidates(model, kwargs)
+    targets = [(functools.partial(attempt, provider, target_kwargs), get_circuit_breaker(provider))
+               for provider, target_kwargs in candidates]
+    if not hedge:
+        return targets
+    step = 1 if get_hedge_policy().fallback else 0
+    hedged = []
+    for i, (fn, breaker) in enumerate(targets):
+        duplicate, duplicate_breaker = targets[(i + step) % len(targets)]
+        if duplicate_breaker is not breaker:
+            guard = call_once_async if asynchronous else call_once
+            duplicate = functools.partial(guard, duplicate, policy, duplicate_breaker)
+        model_name = candidates[i][1]["model"]
+        hedged.append((_hedged_attempt(fn, duplicate, model_name, hedge, record, asynchronous), breaker))
+    return hedged
+
+def _routed(model, kwargs, attempt, policy, hedge=False, record=None):
+    """
+    Runs 'attempt(provider, kwargs)' against the routing targets of 'model' until one
+    succeeds. The targets share the call's 'policy' attempts (see
+    call_with_failover), so a failing provider is left after its first outage or
+    429 instead of after a full round of retries.
+
+    :param hedge: Hedging setting of the call, as in 'api_call'.
+    :param record: The CallRecord that notes whether the call was hedged.
+    """
+    return call_with_failover(_targets(model, kwargs, attempt, policy, hedge, record), policy)
+
+async def _routed_async(model, kwargs, attempt, policy, hedge=False, record=None):
+    """
+    Asyncio counterpart of '_routed'; 'attempt' must return a coroutine.
+    """
+    targets = _targets(model, kwargs, attempt, policy, hedge, record, asynchronous=True)
+    return await call_with_failover_async(targets, policy)
+
+# -----------------------------------------------------------------------------------------
+# Hedged requests
+# -----------------------------------------------------------------------------------------
+# Call sites that pass 'hedge=True' (or a percentile such as hedge=0.95) hedge each
+# attempt of the call: if an attempt has not returned within the recent latency
+# percentile of its model, a duplicate attempt is sent, to the route's next provider
+# when 'fallback' is set in the 'hedging' section of 'config/env.yaml'. Hedging runs
+# inside the retry loop, so a call is never hedged while it backs off, and the
+# latencies it is based on are those of single successful requests (see _create).
+# -----------------------------------------------------------------------------------------
+
+_latency_tracker = LatencyTracker()
+_hedge_policy = None
+_hedge_lock = threading.Lock()
+
+def get_hedge_policy():
+    """
+    Returns the process-wide HedgePolicy built from the 'hedging' config section.
+    """
+    global _hedge_policy
+    if _hedge_policy is None:
+        with _hedge_lock:
+            if _hedge_policy is None:
+                _hedge_policy = HedgePolicy.from_config(get_config().get('hedging'), tracker=_latency_tracker)
+    return _hedge_policy
+
+def _hedged_attempt(primary, duplicate, model, hedge, record, asynchronous=False):
+    """
+    Wraps the attempt 'primary()' so that 'duplicate()' is also started if the
+    primary has not returned within the hedging delay of 'model'.
+    """
+    percentile = hedge if not isinstance(hedge, bool) else None
+
+    def on_hedge():
+        if record is not None:
+            record.hedged = True
+        logger.info(f"Hedging request to model '{model}'.")
+
+    def attempt():
+        policy = get_hedge_policy()
+        delay = policy.delay(model, percentile)
+        if asynchronous:
+            return run_hedged_async(primary, duplicate, delay, on_hedge)
+        return run_hedged(primary, duplicate, delay, policy.executor(), on_hedge)
+
+    return attempt
+
+# -----------------------------------------------------------------------------------------
+# Telemetry
+# -----------------------------------------------------------------------------------------
+# Every call function produces one CallRecord, aggregated by get_telemetry() per
+# (model, caller). The caller is the 'caller' argument of the call function (agents
+# pass their name) or the enclosing telemetry.caller_scope(). Tokens come from
+# response.usage and are estimated from the text for streams, which report none.
+# -----------------------------------------------------------------------------------------
+
+@contextlib.contextmanager
+def _instrument(endpoint, model, caller):
+    """
+    Measures one call function invocation and hands its CallRecord to the telemetry.
+    """
+    record = CallRecord(endpoint, model, caller)
+    start = time.perf_counter()
+    try:
+        yield record
+    except GeneratorExit:
+        # Closing a stream early is a normal way to finish consuming it
+        raise
+    except asyncio.CancelledError:
+        record.outcome = "cancelled"
+        raise
+    except BaseException as e:
+        record.outcome = "error"
+        record.error = type(e).__name__
+        raise
+    finally:
+        record.latency = time.perf_counter() - start
+        get_telemetry().record(record)
+
+def _record_usage(record, response, kwargs, content):
+    """
+    Adds the tokens of one attempt to 'record', estimating them if the provider
+    reported no usage.
+    """
+    if record is None:
+        return
+    usage = getattr(response, "usage", None)
+    if getattr(usage, "prompt_tokens", None) is not None:
+        record.add_usage(usage.prompt_tokens, usage.completion_tokens)
+    else:
+        record.add_usage(estimate_tokens(kwargs["messages"], 0), len(content or "") // 4)
 
 # -----------------------------------------------------------------------------------------
 # API call functions
 # -----------------------------------------------------------------------------------------
 
+def _request_kwargs(messages, model, temperature, max_tokens, json_format=False,
+                    stream=False, stop=None):
+    """
+    Builds the keyword arguments of a chat.completions.create request.
+    """
+    kwargs = dict(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=stream
+    )
+    if json_format:
+        kwargs["response_format"] = {"type": "json_object"}
+    if stop is not None:
+        kwargs["stop"] = stop
+    return kwargs
+
+def _response_text(response, stream):
+    """
+    Returns the text of a completion. With 'stream' the response is an iterator of
+    chunks whose deltas are joined; otherwise the first choice's content is used.
+    """
+    if not stream:
+        return response.choices[0].message.content
+    return "".join(
+        chunk.choices[0].delta.content or "" for chunk in response if chunk.choices
+    )
+
+def _record_latency(provider, kwargs, latency):
+    """
+    Feeds the latency of one successful request into the provider's health and,
+    unless it only opened a stream, into the latency tracker used for hedging.
+    """
+    _record_health(provider, None, latency)
+    if not kwargs["stream"]:
+        _latency_tracker.observe(kwargs["model"], latency)
+
+def _create(provider, client, kwargs):
+    """
+    Sends one request to 'provider' and feeds its outcome into the provider's health.
+    """
+    start = time.perf_counter()
+    try:
+        response = client.chat.completions.create(**kwargs)
+    except Exception as e:
+        _record_health(provider, e)
+        raise
+    _record_latency(provider, kwargs, time.perf_counter() - start)
+    return response
+
+def _completion_attempt(provider, kwargs, json_format=False, required_keys=None,
+                        cache_key=None, record=None):
+    """
+    Performs a single request attempt: reserves rate-limit capacity, calls the
+    provider, decodes the content and stores it in the response cache. The attempt
+    and its token usage are added to 'record'.
+
+    :raises EmptyResponseError: If the provider returned no content.
+    :raises MalformedOutputError: If a JSON response cannot be decoded or lacks required keys.
+    """
+    if record is not None:
+        record.attempts += 1
+    limiter = get_rate_limiter(provider)
+    reserved = estimate_tokens(kwargs["messages"], kwargs["max_tokens"])
+    if limiter is not None:
+        limiter.acquire(reserved)
+    response = _create(provider, get_client(provider), kwargs)
+    if limiter is not None:
+        limiter.settle(reserved, _usage_tokens(response))
+    content = _response_text(response, kwargs["stream"])
+    _record_usage(record, response, kwargs, content)
+    if not content:
+        raise EmptyResponseError("Empty response returned.")
+    result = decode_json(content, required_keys) if json_format else content
+    _cache_put(cache_key, content)
+    return result
+
 def api_call(messages, model="deepseek", temperature=1.0, max_tokens=4096,
-             max_retries=10, json_format=False, stream=False):
+             max_retries=None, json_format=False, stream=False, cache=None, dedupe=None,
+             required_keys=None, caller=None, hedge=False):
     """
     Performs a chat completion request using the specified 'model'. The function
     supports different endpoints such as 'gpt', 'qwen', 'deepseek', or 'claude'
-    based on the 'model' string. It also applies a retry mechanism up to 'max_retries'
-    times. If 'json_format' is True, the function attempts to parse JSON in the
+    based on the 'model' string and the routing table (see get_router); if the
+    primary endpoint fails, the route's fallbacks are tried in order. Failures are
+    retried according to the configured RetryPolicy and the provider's circuit
+    breaker. If 'json_format' is True, the function attempts to parse JSON in the
     response. If 'stream' is True, partial output tokens may be streamed.
 
     :param messages: A list of dict objects containing 'role' and 'content'.
     :param model: The model name or identifier (e.g., "deepseek-chat").
     :param temperature: The temperature parameter for sampling randomness.
     :param max_tokens: Maximum number of tokens allowed in the response.
-    :param max_retries: Number of retry attempts upon failure.
-    :param json_format: If True, expects the model to return JSON.
-    :param stream: If True, uses streaming output from the server.
+    :param max_retries: Total attempts for this call; None uses the policy's max_attempts.
+    :param json_format: If True, expects the model to return JSON. The output is parsed
+                        strictly first and repaired locally if it is malformed.
+    :param stream: If True, the response is received as a stream and the deltas are
+                   joined before returning. Use 'api_call_stream' to consume deltas.
+    :param cache: Response-cache policy; None applies the default, True forces caching
+                  even when temperature > 0, False bypasses the cache. Streams are never cached.
+    :param dedupe: If True, concurrent identical requests share one upstream call;
+                   None does so only when temperature == 0, False never.
+    :param required_keys: With 'json_format', keys the decoded object must contain; a
+                          response missing any of them counts as a failed attempt.
+    :param caller: Name of the agent making the call, for telemetry; None uses the
+                   enclosing caller_scope().
+    :param hedge: If True, a duplicate request is sent when this one is slower than the
+                  configured latency percentile of the model; a float overrides the
+                  percentile. Meant for latency-critical, serial call sites only.
     :return: The content of the first choice in the response, either as a string or
              a parsed JSON object if 'json_format' is True.
     """
-    if "gpt" in model or "o1" in model:
-        api_key = services['openai']['api_key']
-        base_url = services['openai']['base_url']
-    elif "qwen" in model:
-        api_key = services['qwen']['api_key']
-        base_url = services['qwen']['base_url']
-    elif "deepseek" in model:
-        api_key = services['deepseek']['api_key']
-        base_url = f"{services['deepseek']['base_url']}"
-    elif "claude" in model:
-        api_key = services['claude']['api_key']
-        base_url = services['claude']['base_url']
-    else:
-        raise ValueError(f"Unknown model identifier: {model}")
-
-    client = OpenAI(
-        base_url=base_url,
-        api_key=api_key,
+    policy = get_retry_policy()
+    if max_retries is not None:
+        policy = policy.with_max_attempts(max_retries)
+    request = dict(
+        endpoint="chat", model=model, messages=messages,
+        temperature=temperature, max_tokens=max_tokens, json_format=json_format
     )
+    if json_format and required_keys:
+        # Callers validating different keys must not share cached or coalesced results
+        request["required_keys"] = sorted(required_keys)
 
-    for attempt in range(max_retries):
-        try:
-            if not json_format:
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    stream=stream
-                )
-                if not response.choices[0].message.content:
-                    continue
-                return response.choices[0].message.content
-            else:
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    response_format={"type": "json_object"},
-                    stream=stream
-                )
-                if not response.choices[0].message.content:
-                    continue
-                json_response = eval(response.choices[0].message.content)
-                return json_response
+    with _instrument("chat", model, caller) as record:
+        cache_key = None if stream else _cache_key(cache, **request)
+        cached = _cached_result(cache_key, record, json_format, required_keys)
+        if cached is not None:
+            return cached
 
-        except Exception as e:
-            logger.error(f"Error while calling API: {str(e)}")
-            time.sleep(2 ** (attempt + 1))
-            continue
+        kwargs = _request_kwargs(messages, model, temperature, max_tokens, json_format, stream)
+
+        def upstream():
+            return _routed(model, kwargs, lambda provider, target_kwargs: _completion_attempt(
+                provider, target_kwargs, json_format, required_keys, cache_key, record
+            ), policy, hedge, record)
 
-    raise Exception("Max retries reached. API call failed.")
+        if dedupe is None:
+            dedupe = temperature == 0
+        if stream or not dedupe:
+            return upstream()
+        result = _in_flight.do(make_key(**request), upstream)
+        if record.attempts == 0:
+            record.cache = "coalesced"
+        # Callers sharing one response must not share one mutable JSON object
+        return copy.deepcopy(result) if json_format else result
 
-def api_call_completion(messages, model="deepseek-chat", stop_list=None):
+def api_call_completion(messages, model="deepseek-chat", stop_list=None, cache=None, dedupe=True,
+                        caller=None, hedge=False):
     """
     Similar to 'api_call' but specifically for a scenario requiring a 'stop' argument
-    to limit the response. Includes a simple retry mechanism.
+    to limit the response. Retries follow the configured RetryPolicy.
 
     :param messages: A list of message dicts with 'role' and 'content'.
     :param model: The model name or identifier.
     :param stop_list: A list of stop strings to control the generation halting.
+    :param cache: Response-cache policy, as in 'api_call'.
+    :param dedupe: If True, concurrent identical requests share one upstream call.
+    :param caller: Name of the agent making the call, for telemetry.
+    :param hedge: Hedging policy, as in 'api_call'.
     :return: The first chunk of response text from the model.
     """
-    if "gpt" in model or "o1" in model:
-        api_key = services['openai']['api_key']
-        base_url = services['openai']['base_url']
-    elif "qwen" in model:
-        api_key = services['qwen']['api_key']
-        base_url = services['qwen']['base_url']
-    elif "deepseek" in model:
-        api_key = services['deepseek']['api_key']
-        base_url = f"{services['deepseek']['base_url']}"
-    elif "claude" in model:
-        api_key = services['claude']['api_key']
-        base_url = services['claude']['base_url']
-    else:
-        raise ValueError(f"Unknown model identifier: {model}")
-
-    client = OpenAI(
-        base_url=base_url,
-        api_key=api_key
+    request = dict(
+        endpoint="completion", model=model, messages=messages,
+        stop=stop_list, max_tokens=4096, temperature=0.0
     )
 
-    for attempt in range(10):
+    with _instrument("completion", model, caller) as record:
+        cache_key = _cache_key(cache, **request)
+        cached = _cache_get(cache_key, record)
+        if cached is not None:
+            return cached
+
+        kwargs = _request_kwargs(messages, model, 0.0, 4096, stop=stop_list)
+
+        def upstream():
+            return _routed(model, kwargs, lambda provider, target_kwargs: _completion_attempt(
+                provider, target_kwargs, cache_key=cache_key, record=record
+            ), get_retry_policy(), hedge, record)
+
+        if not dedupe:
+            return upstream()
+        result = _in_flight.do(make_key(**request), upstream)
+        if record.attempts == 0:
+            record.cache = "coalesced"
+        return result
+
+# -----------------------------------------------------------------------------------------
+# Streaming API call functions
+# -----------------------------------------------------------------------------------------
+# Opening the stream is retried (and falls back along the route) like any other
+# call; once the first chunk has been received, errors propagate to the consumer
+# because the partial output is already visible. Closing the generator early (e.g.
+# after the needed JSON fields arrived) closes the HTTP stream. Streamed responses
+# are neither cached nor coalesced, and their token reservation is not settled
+# since no usage block is reported.
+# -----------------------------------------------------------------------------------------
+
+def _open_stream(provider, kwargs, record=None):
+    """
+    Reserves rate-limit capacity and opens a streaming completion.
+    """
+    if record is not None:
+        record.attempts += 1
+    limiter = get_rate_limiter(provider)
+    if limiter is not None:
+        limiter.acquire(estimate_tokens(kwargs["messages"], kwargs["max_tokens"]))
+    return _create(provider, get_client(provider), kwargs)
+
+def api_call_stream(messages, model="deepseek", temperature=1.0, max_tokens=4096,
+                    max_retries=None, json_format=False, caller=None):
+    """
+    Performs a streaming chat completion and yields the text deltas as they arrive.
+
+    :param messages: A list of dict objects containing 'role' and 'content'.
+    :param model: The model name or identifier (e.g., "deepseek-chat").
+    :param temperature: The temperature parameter for sampling randomness.
+    :param max_tokens: Maximum number of tokens allowed in the response.
+    :param max_retries: Attempts to open the stream; None uses the policy's max_attempts.
+    :param json_format: If True, requests a JSON object response.
+    :param caller: Name of the agent making the call, for telemetry.
+    :return: A generator of non-empty text deltas.
+    """
+    policy = get_retry_policy()
+    if max_retries is not None:
+        policy = policy.with_max_attempts(max_retries)
+    kwargs = _request_kwargs(messages, model, temperature, max_tokens, json_format, stream=True)
+
+    with _instrument("stream", model, caller) as record:
+        response = _routed(model, kwargs, lambda provider, target_kwargs: _open_stream(
+            provider, target_kwargs, record
+        ), policy)
+        text_length = 0
         try:
-            if stop_list is not None and len(stop_list) > 0:
-                prefix = stop_list[0]
-                prefix = f"Step {int(prefix[5]) - 1}:"
-            else:
-                prefix = ""
-
-            response = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                stop=stop_list,
-                stream=False,
-                max_tokens=4096,
-                temperature=0.0,
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text_length += len(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            record.add_usage(estimate_tokens(messages, 0), text_length // 4)
+            response.close()
+
+async def _create_async(provider, client, kwargs):
+    """
+    Asyncio counterpart of '_create'.
+    """
+    start = time.perf_counter()
+    try:
+        response = await client.chat.completions.create(**kwargs)
+    except Exception as e:
+        _record_health(provider, e)
+        raise
+    _record_latency(provider, kwargs, time.perf_counter() - start)
+    return response
+
+async def _open_stream_async(provider, kwargs, record=None):
+    """
+    Asyncio counterpart of '_open_stream'. On success the provider semaphore is left
+    acquired and returned with the stream; the caller releases it when the stream
+    is closed.
+    """
+    if record is not None:
+        record.attempts += 1
+    limiter = get_rate_limiter(provider)
+    if limiter is not None:
+        await limiter.acquire_async(estimate_tokens(kwargs["messages"], kwargs["max_tokens"]))
+    semaphore = provider_semaphore(provider)
+    await semaphore.acquire()
+    try:
+        return await _create_async(provider, get_async_client(provider), kwargs), semaphore
+    except BaseException:
+        semaphore.release()
+        raise
+
+async def api_call_stream_async(messages, model="deepseek", temperature=1.0, max_tokens=4096,
+                                max_retries=None, json_format=False, caller=None):
+    """
+    Asyncio counterpart of 'api_call_stream'; an async generator of text deltas.
+    The provider semaphore is held for as long as the stream is open.
+    """
+    policy = get_retry_policy()
+    if max_retries is not None:
+        policy = policy.with_max_attempts(max_retries)
+    kwargs = _request_kwargs(messages, model, temperature, max_tokens, json_format, stream=True)
+
+    with _instrument("stream", model, caller) as record:
+        response, semaphore = await _routed_async(model, kwargs, lambda provider, target_kwargs: _open_stream_async(
+            provider, target_kwargs, record
+        ), policy)
+        text_length = 0
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text_length += len(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            record.add_usage(estimate_tokens(messages, 0), text_length // 4)
+            semaphore.release()
+            await response.close()
+
+# -----------------------------------------------------------------------------------------
+# Async API call functions
+# -----------------------------------------------------------------------------------------
+
+async def _response_text_async(response, stream):
+    """
+    Asyncio counterpart of '_response_text' for AsyncStream responses.
+    """
+    if not stream:
+        return response.choices[0].message.content
+    parts = []
+    async for chunk in response:
+        if chunk.choices:
+            parts.append(chunk.choices[0].delta.content or "")
+    return "".join(parts)
+
+async def _completion_attempt_async(provider, kwargs, json_format=False, required_keys=None,
+                                    cache_key=None, record=None):
+    """
+    Asyncio counterpart of '_completion_attempt'. The provider semaphore is held only
+    while the request is outstanding, not during back-off or rate-limit waits.
+    """
+    if record is not None:
+        record.attempts += 1
+    limiter = get_rate_limiter(provider)
+    reserved = estimate_tokens(kwargs["messages"], kwargs["max_tokens"])
+    if limiter is not None:
+        await limiter.acquire_async(reserved)
+    async with provider_semaphore(provider):
+        response = await _create_async(provider, get_async_client(provider), kwargs)
+        content = await _response_text_async(response, kwargs["stream"])
+    if limiter is not None:
+        limiter.settle(reserved, _usage_tokens(response))
+    _record_usage(record, response, kwargs, content)
+    if not content:
+        raise EmptyResponseError("Empty response returned.")
+    result = decode_json(content, required_keys) if json_format else content
+    _cache_put(cache_key, content)
+    return result
+
+async def api_call_async(messages, model="deepseek", temperature=1.0, max_tokens=4096,
+                         max_retries=None, json_format=False, stream=False, cache=None, dedupe=None,
+                         required_keys=None, caller=None, hedge=False):
+    """
+    Asyncio counterpart of 'api_call' with identical parameters and return value.
+    Requests to the same provider share a semaphore (see provider_semaphore), so
+    many coroutines can await this function without overrunning the endpoint.
+    Retry back-off uses asyncio.sleep and never blocks the event loop.
+    """
+    policy = get_retry_policy()
+    if max_retries is not None:
+        policy = policy.with_max_attempts(max_retries)
+    request = dict(
+        endpoint="chat", model=model, messages=messages,
+        temperature=temperature, max_tokens=max_tokens, json_format=json_format
+    )
+    if json_format and required_keys:
+        # Callers validating different keys must not share cached or coalesced results
+        request["required_keys"] = sorted(required_keys)
+
+    with _instrument("chat", model, caller) as record:
+        cache_key = None if stream else _cache_key(cache, **request)
+        cached = _cached_result(cache_key, record, json_format, required_keys)
+        if cached is not None:
+            return cached
+
+        kwargs = _request_kwargs(messages, model, temperature, max_tokens, json_format, stream)
+
+        def upstream():
+            return _routed_async(model, kwargs, lambda provider, target_kwargs: _completion_attempt_async(
+                provider, target_kwargs, json_format, required_keys, cache_key, record
+            ), policy, hedge, record)
+
+        if dedupe is None:
+            dedupe = temperature == 0
+        if stream or not dedupe:
+            return await upstream()
+        result = await _in_flight_async.do(make_key(**request), upstream)
+        if record.attempts == 0:
+            record.cache = "coalesced"
+        return copy.deepcopy(result) if json_format else result
+
+async def api_call_completion_async(messages, model="deepseek-chat", stop_list=None,
+                                    cache=None, dedupe=True, caller=None, hedge=False):
+    """
+    Asyncio counterpart of 'api_call_completion' with identical parameters and
+    return value, bounded by the provider's concurrency semaphore.
+    """
+    request = dict(
+        endpoint="completion", model=model, messages=messages,
+        stop=stop_list, max_tokens=4096, temperature=0.0
+    )
+
+    with _instrument("completion", model, caller) as record:
+        cache_key = _cache_key(cache, **request)
+        cached = _cache_get(cache_key, record)
+        if cached is not None:
+            return cached
+
+        kwargs = _request_kwargs(messages, model, 0.0, 4096, stop=stop_list)
+
+        def upstream():
+            return _routed_async(model, kwargs, lambda provider, target_kwargs: _completion_attempt_async(
+                provider, target_kwargs, cache_key=cache_key, record=record
+            ), get_retry_policy(), hedge, record)
+
+        if not dedupe:
+            return await upstream()
+        result = await _in_flight_async.do(make_key(**request), upstream)
+        if record.attempts == 0:
+            record.cache = "coalesced"
+        return result
+
+# -----------------------------------------------------------------------------------------
+# Batch submission
+# -----------------------------------------------------------------------------------------
+# api_call_batch sends many independent requests as batch jobs, one per provider and
+# model, for throughput-oriented phases such as full dataset evaluations. Providers
+# with 'batch_api: true' in their service entry use the OpenAI-compatible Batches
+# API. The others, and every provider while the fake backend is enabled, use
+# LocalBatchBackend, which replays the batch file against the pooled client. Options
+# come from the 'batch' section of 'config/env.yaml':
+#
+#   batch:
+#     directory: .cache/batch
+#     poll_interval: 30
+#     workers: 4
+#     completion_window: 24h
+# -----------------------------------------------------------------------------------------
+
+BATCH_DEFAULTS = {
+    "directory": ".cache/batch",    # batch input files and local job directories
+    "poll_interval": 30.0,          # seconds between status checks
+    "workers": 4,                   # concurrent requests of a local batch job
+    "completion_window": "24h",     # provider batch completion window
+}
+
+_batch_backends = {}
+_batch_lock = threading.Lock()
+
+def _batch_options():
+    return dict(BATCH_DEFAULTS, **(get_config().get('batch') or {}))
+
+def _completion_body(response):
+    """
+    Converts a chat.completion response object into its JSON body.
+    """
+    if hasattr(response, "model_dump"):
+        return response.model_dump()
+    usage = getattr(response, "usage", None)
+    return {
+        "id": getattr(response, "id", None),
+        "object": "chat.completion",
+        "model": getattr(response, "model", None),
+        "choices": [
+            {
+                "index": choice.index,
+                "finish_reason": choice.finish_reason,
+                "message": {"role": choice.message.role, "content": choice.message.content},
+            }
+            for choice in response.choices
+        ],
+        "usage": vars(usage) if usage is not None else None,
+    }
+
+def _local_batch_request(provider, body):
+    """
+    Executes one line of a local batch job against the provider's pooled client.
+    """
+    limiter = get_rate_limiter(provider)
+    reserved = estimate_tokens(body["messages"], body.get("max_tokens", 0))
+    if limiter is not None:
+        limiter.acquire(reserved)
+    response = _create(provider, get_client(provider), body)
+    if limiter is not None:
+        limiter.settle(reserved, _usage_tokens(response))
+    return _completion_body(response)
+
+def get_batch_backend(provider):
+    """
+    Returns the batch backend used for 'provider', creating it on first use.
+    """
+    backend = _batch_backends.get(provider)
+    if backend is None:
+        with _batch_lock:
+            backend = _batch_backends.get(provider)
+            if backend is None:
+                options = _batch_options()
+                service = get_config()['services'].get(provider, {})
+                if service.get('batch_api') and not fake_llm_enabled():
+                    backend = OpenAIBatchBackend(get_client(provider), options["completion_window"])
+                else:
+                    backend = LocalBatchBackend(
+                        lambda body: _local_batch_request(provider, body),
+                        os.path.join(options["directory"], "local"),
+                        options["workers"],
+                    )
+                _batch_backends[provider] = backend
+    return backend
+
+def api_call_batch(requests, cache=None, fallback=True, poll_interval=None, timeout=None, caller=None):
+    """
+    Runs many independent chat completion requests as batch jobs and returns their
+    results in order. Requests are grouped into one job per routed (provider, model);
+    route fallbacks and hedging do not apply inside a batch.
+
+    :param requests: A list of dicts with 'api_call' keyword arguments: 'messages' and
+                     optionally 'model', 'temperature', 'max_tokens', 'json_format'
+                     and 'required_keys'.
+    :param cache: Response-cache policy, as in 'api_call'. Cached requests are not
+                  submitted, and batch results are stored in the cache.
+    :param fallback: If True, requests that fail inside the batch (error lines, empty or
+                     malformed output, timeout) are re-run through 'api_call'.
+    :param poll_interval: Seconds between status checks; defaults to the 'batch' section.
+    :param timeout: Overall seconds to wait for the jobs; unfinished jobs are cancelled.
+    :param caller: Name of the agent making the calls, for telemetry.
+    :return: A list aligned with 'requests' holding each response (a string, or parsed
+             JSON with 'json_format'), or the exception for requests that failed.
+    """
+    options = _batch_options()
+    if poll_interval is None:
+        poll_interval = options["poll_interval"]
+    results = [None] * len(requests)
+    jobs = {}
+    pending = []
+    start = time.perf_counter()
+
+    for index, request in enumerate(requests):
+        request = dict({"model": "deepseek", "temperature": 1.0, "max_tokens": 4096,
+                        "json_format": False, "required_keys": None}, **request)
+        record = CallRecord("batch", request["model"], caller)
+        key_fields = dict(
+            endpoint="chat", model=request["model"], messages=request["messages"],
+            temperature=request["temperature"], max_tokens=request["max_tokens"],
+            json_format=request["json_format"]
+        )
+        if request["json_format"] and request["required_keys"]:
+            key_fields["required_keys"] = sorted(request["required_keys"])
+        cache_key = _cache_key(cache, **key_fields)
+        cached = _cached_result(cache_key, record, request["json_format"], request["required_keys"])
+        if cached is not None:
+            results[index] = cached
+            get_telemetry().record(record)
+            continue
+
+        target = get_router().resolve(request["model"], available=_provider_available)[0]
+        job = jobs.get((target.provider, target.model))
+        if job is None:
+            job = jobs[(target.provider, target.model)] = BatchJob(
+                get_batch_backend(target.provider), options["directory"]
             )
-            current_text = response.choices[0].message.content
-            if current_text:
-                return current_text
-            else:
-                logger.info("Empty response returned. Retrying...")
-                continue
+        custom_id = f"request-{index}"
+        job.add(custom_id, _request_kwargs(request["messages"], target.model, request["temperature"],
+                                           request["max_tokens"], request["json_format"]))
+        pending.append((index, job, custom_id, request, cache_key, record))
 
+    for job in jobs.values():
+        job.submit()
+    deadline = None if timeout is None else time.time() + timeout
+    for job in jobs.values():
+        job.wait(poll_interval, None if deadline is None else max(0.0, deadline - time.time()))
+
+    for index, job, custom_id, request, cache_key, record in pending:
+        record.attempts = 1
+        record.latency = time.perf_counter() - start
+        try:
+            body = job.result(custom_id)
+            usage = body.get("usage") or {}
+            record.add_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+            content = body["choices"][0]["message"]["content"]
+            if not content:
+                raise EmptyResponseError("Empty response returned.")
+            results[index] = decode_json(content, request["required_keys"]) if request["json_format"] else content
+            _cache_put(cache_key, content)
         except Exception as e:
-            logger.error(f"Error on attempt {attempt+1}: {str(e)}")
-            time.sleep(2 ** (attempt + 1))
+            record.outcome = "error"
+            record.error = type(e).__name__
+            results[index] = e
+        get_telemetry().record(record)
 
-    raise RuntimeError("Max retries reached without successful completion.")
+        if fallback and isinstance(results[index], Exception):
+            logger.error(f"Batch request {custom_id} failed ({results[index]}); retrying interactively.")
+            try:
+                results[index] = api_call(cache=cache, dedupe=False, caller=caller, **request)
+            except Exception as e:
+                results[index] = e
+    return results
 
 # -----------------------------------------------------------------------------------------
 # Example usage demonstration
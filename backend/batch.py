@@ -0,0 +1,250 @@
+# =========================================================================================
+# Batch Job Module
+# =========================================================================================
+# This script submits many independent chat-completion requests as one batch job,
+# for throughput-oriented phases (e.g. a full HotpotQA evaluation) where batch
+# pricing matters more than interactive latency. It provides:
+#   - Helpers for the JSONL chat-completions batch format (one request per line with
+#     a custom_id, and the matching output/error lines)
+#   - OpenAIBatchBackend: uploads the file and drives a provider batch job through
+#     the OpenAI-compatible Files and Batches endpoints
+#   - LocalBatchBackend: a file-based stand-in that runs the same input file through
+#     a responder callable in background threads and writes output in the provider
+#     format; used for testing and for providers without a batch API
+#   - BatchJob: one input file for one backend, with submit / poll / wait and the
+#     mapping of output lines back to custom_ids
+# =========================================================================================
+
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchError(RuntimeError):
+    """
+    Raised for a request that has no successful result in a finished batch.
+    """
+
+
+def batch_line(custom_id: str, body: dict) -> str:
+    """
+    Serializes one request in the chat-completions batch input format.
+    """
+    return json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body})
+
+
+def read_jsonl(text: str):
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def parse_output(lines):
+    """
+    Maps batch output/error lines to {custom_id: (response body or None, error or None)}.
+    """
+    results = {}
+    for line in lines:
+        response = line.get("response") or {}
+        error = line.get("error")
+        if error is None and response.get("status_code", 200) >= 400:
+            error = (response.get("body") or {}).get("error") or {"message": f"HTTP {response['status_code']}"}
+        results[line["custom_id"]] = (None if error else response.get("body"), error)
+    return results
+
+
+class OpenAIBatchBackend:
+    """
+    Drives batch jobs through an OpenAI-compatible client's Files and Batches APIs.
+    """
+
+    def __init__(self, client, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, input_path: str) -> str:
+        with open(input_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, job_id: str) -> str:
+        return self.client.batches.retrieve(job_id).status
+
+    def output(self, job_id: str):
+        """
+        Returns the output and error lines available for the job (expired jobs may
+        have partial output).
+        """
+        batch = self.client.batches.retrieve(job_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                lines += read_jsonl(self.client.files.content(file_id).text)
+        return lines
+
+    def cancel(self, job_id: str):
+        self.client.batches.cancel(job_id)
+
+
+class LocalBatchBackend:
+    """
+    A file-based stand-in for a provider batch service. Each job lives in its own
+    directory (input.jsonl, status.json, output.jsonl, errors.jsonl) and is executed
+    in the background by calling 'responder(body)' for every line, which returns a
+    chat.completion response body (dict) or raises.
+    """
+
+    def __init__(self, responder, directory: str = ".cache/batch", workers: int = 4):
+        self.responder = responder
+        self.directory = directory
+        self.workers = workers
+        self._cancelled = set()
+        self._lock = threading.Lock()
+
+    def _path(self, job_id, name):
+        return os.path.join(self.directory, job_id, name)
+
+    def _set_status(self, job_id, status):
+        with open(self._path(job_id, "status.json"), "w") as f:
+            json.dump({"id": job_id, "status": status, "updated": time.time()}, f)
+
+    def submit(self, input_path: str) -> str:
+        job_id = f"batch_{uuid.uuid4().hex}"
+        os.makedirs(os.path.join(self.directory, job_id), exist_ok=True)
+        with open(input_path, "r") as src, open(self._path(job_id, "input.jsonl"), "w") as dst:
+            dst.write(src.read())
+        self._set_status(job_id, "validating")
+        threading.Thread(target=self._run, args=(job_id,), daemon=True).start()
+        return job_id
+
+    def _answer(self, job_id, line):
+        if job_id in self._cancelled:
+            return None, {"custom_id": line["custom_id"], "response": None,
+                          "error": {"code": "batch_cancelled", "message": "Batch was cancelled."}}
+        try:
+            body = self.responder(line["body"])
+        except Exception as e:
+            status = getattr(e, "status_code", None) or 500
+            return None, {"custom_id": line["custom_id"],
+                          "response": {"status_code": status, "body": {"error": {"message": str(e)}}},
+                          "error": None}
+        return {"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": line["custom_id"],
+                "response": {"status_code": 200, "body": body}, "error": None}, None
+
+    def _run(self, job_id):
+        try:
+            with open(self._path(job_id, "input.jsonl"), "r") as f:
+                lines = read_jsonl(f.read())
+            self._set_status(job_id, "in_progress")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+                answers = list(pool.map(lambda line: self._answer(job_id, line), lines))
+            with open(self._path(job_id, "output.jsonl"), "w") as out, \
+                    open(self._path(job_id, "errors.jsonl"), "w") as err:
+                for ok, failed in answers:
+                    (out if ok else err).write(json.dumps(ok or failed) + "\n")
+            self._set_status(job_id, "cancelled" if job_id in self._cancelled else "completed")
+        except Exception as e:
+            logger.error(f"Local batch job {job_id} failed: {e}")
+            self._set_status(job_id, "failed")
+
+    def status(self, job_id: str) -> str:
+        with open(self._path(job_id, "status.json"), "r") as f:
+            return json.load(f)["status"]
+
+    def output(self, job_id: str):
+        lines = []
+        for name in ("output.jsonl", "errors.jsonl"):
+            path = self._path(job_id, name)
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    lines += read_jsonl(f.read())
+        return lines
+
+    def cancel(self, job_id: str):
+        with self._lock:
+            self._cancelled.add(job_id)
+
+
+class BatchJob:
+    """
+    BatchJob collects the requests of one batch input file (one provider and
+    model), submits it to a backend and maps the output back to custom_ids.
+    """
+
+    def __init__(self, backend, directory: str = ".cache/batch"):
+        self.backend = backend
+        self.directory = directory
+        self.requests = {}
+        self.job_id = None
+        self.status = None
+        self.results = {}
+
+    def add(self, custom_id: str, body: dict):
+        if custom_id in self.requests:
+            raise ValueError(f"Duplicate custom_id in batch: {custom_id}")
+        self.requests[custom_id] = body
+
+    def write(self) -> str:
+        """
+        Writes the batch input file and returns its path.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"input_{uuid.uuid4().hex}.jsonl")
+        with open(path, "w") as f:
+            for custom_id, body in self.requests.items():
+                f.write(batch_line(custom_id, body) + "\n")
+        return path
+
+    def submit(self) -> str:
+        self.job_id = self.backend.submit(self.write())
+        self.status = "validating"
+        logger.info(f"Submitted batch job {self.job_id} with {len(self.requests)} requests.")
+        return self.job_id
+
+    def poll(self) -> bool:
+        """
+        Refreshes the job status; on a terminal status collects the results.
+        Returns True once the job is finished.
+        """
+        self.status = self.backend.status(self.job_id)
+        if self.status not in TERMINAL_STATUSES:
+            return False
+        self.results = parse_output(self.backend.output(self.job_id))
+        return True
+
+    def wait(self, poll_interval: float = 30.0, timeout: float = None):
+        """
+        Polls until the job is finished. On timeout the job is cancelled and the
+        results gathered so far are kept.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.poll():
+            if deadline is not None and time.time() >= deadline:
+                logger.error(f"Batch job {self.job_id} timed out; cancelling.")
+                self.backend.cancel(self.job_id)
+                self.results = parse_output(self.backend.output(self.job_id))
+                return
+            time.sleep(poll_interval)
+
+    def result(self, custom_id: str) -> dict:
+        """
+        Returns the chat.completion response body of a request.
+
+        :raises BatchError: If the request failed or has no output line.
+        """
+        body, error = self.results.get(custom_id, (None, {"message": f"No output for {custom_id} ({self.status})."}))
+        if error is not None:
+            raise BatchError(error.get("message", str(error)))
+        return body
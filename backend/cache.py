@@ -0,0 +1,202 @@
+# =========================================================================================
+# Response Cache Module
+# =========================================================================================
+# This script provides a persistent, content-addressed cache for LLM responses. Each
+# request (model, messages, sampling parameters, output format) is hashed into a stable
+# key, and the raw response text is stored in a local SQLite database. The cache is
+# opt-in and supports:
+#   - Size-based LRU eviction (least recently read entries are dropped first)
+#   - A time-to-live after which entries are treated as misses
+#   - A "temperature > 0 bypass unless forced" policy, since sampled outputs are
+#     not meant to be reproducible
+#   - Hit/miss counters for monitoring
+# =========================================================================================
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(**request):
+    """
+    Computes a stable SHA-256 key for a request. The keyword arguments are
+    serialized as canonical JSON, so the key does not depend on argument order.
+
+    :param request: Every field that influences the response (model, messages, ...).
+    :return: A hex digest identifying the request.
+    """
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    ResponseCache stores LLM responses in SQLite, keyed by make_key(). The database
+    runs in WAL mode so several worker processes may share one cache file, and a
+    lock makes a single instance safe to use from multiple threads.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024,
+                 ttl: float = None, cache_sampled: bool = False):
+        """
+        :param path: Location of the SQLite database file.
+        :param max_bytes: Upper bound on the total size of stored responses.
+        :param ttl: Seconds after which an entry expires; None keeps entries forever.
+        :param cache_sampled: If True, responses sampled with temperature > 0 are cached too.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.cache_sampled = cache_sampled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        Builds a cache from the 'cache' section of 'config/env.yaml', e.g.:
+
+            cache:
+              enabled: true
+              path: .cache/llm_responses.sqlite
+              max_bytes: 536870912
+              ttl: 604800
+              cache_sampled: false
+
+        :return: A ResponseCache, or None if the section is absent or disabled.
+        """
+        if not config or not config.get("enabled", False):
+            return None
+        return cls(
+            path=config.get("path", ".cache/llm_responses.sqlite"),
+            max_bytes=config.get("max_bytes", 512 * 1024 * 1024),
+            ttl=config.get("ttl"),
+            cache_sampled=config.get("cache_sampled", False),
+        )
+
+    def should_cache(self, temperature: float, force: bool = None) -> bool:
+        """
+        Applies the caching policy to a single request.
+
+        :param temperature: The sampling temperature of the request.
+        :param force: True caches regardless of temperature, False never caches,
+                      None caches deterministic requests (and sampled ones if
+                      'cache_sampled' is set).
+        """
+        if force is not None:
+            return force
+        return temperature == 0 or self.cache_sampled
+
+    def get(self, key: str):
+        """
+        Looks up a response and refreshes its LRU position.
+
+        :param key: A key produced by make_key().
+        :return: The cached response text, or None on a miss or expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str):
+        """
+        Stores a response and evicts least recently used entries if the cache
+        grows beyond 'max_bytes'.
+
+        :param key: A key produced by make_key().
+        :param value: The raw response text.
+        """
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        """
+        Deletes entries in least-recently-accessed order until the total stored
+        size fits within 'max_bytes'. Expired entries are removed first.
+        """
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+        logger.info(f"Evicted {len(stale)} cached responses to respect max_bytes={self.max_bytes}.")
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters of this process together with the size of the store.
+        """
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def clear(self):
+        """
+        Removes every stored response and resets the counters.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        """
+        Closes the underlying database connection.
+        """
+        with self._lock:
+            self._conn.close()
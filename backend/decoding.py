@@ -0,0 +1,158 @@
+# =========================================================================================
+# JSON Decoding Module
+# =========================================================================================
+# This script decodes JSON returned by language models. A strict json.loads is tried
+# first; if it fails, a local repair pass fixes the defects models commonly produce
+# and the result is parsed again, so a recoverable answer never costs another
+# round-trip. The repair pass handles:
+#   - Markdown code fences and chatter around the JSON value
+#   - Single-quoted strings and Python literals (True / False / None)
+#   - Trailing commas before a closing bracket
+#   - Raw newlines inside strings
+#   - Truncated output (unterminated strings, missing closing braces/brackets)
+# Decoded objects can optionally be validated against a set of required keys.
+# =========================================================================================
+
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Keys every Moderator2 reasoning step must carry
+STEP_KEYS = ("step", "reasoning", "next_action")
+
+
+class MalformedOutputError(ValueError):
+    """
+    Raised when model output cannot be decoded as the expected JSON; retryable.
+    """
+
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*(.*?)(?:```|$)", re.S)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _strip_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def _last_tokens(out, count):
+    tokens = [t for t in out if not t.isspace()]
+    return tokens[-count:]
+
+
+def repair_json(text: str) -> str:
+    """
+    Rewrites a malformed JSON document into one that json.loads can parse, as far
+    as the defects listed in the module header allow. Text after the first
+    complete top-level value is discarded.
+
+    :param text: The raw model output.
+    :return: The repaired JSON text (not guaranteed to be valid).
+    """
+    s = text.strip()
+    fenced = _FENCE.search(s)
+    if fenced:
+        s = fenced.group(1).strip()
+    starts = [i for i in (s.find("{"), s.find("[")) if i >= 0]
+    if starts:
+        s = s[min(starts):]
+
+    out = []
+    stack = []
+    i, n = 0, len(s)
+    while i < n:
+        ch = s[i]
+        if ch in "\"'":
+            # Re-emit every string double-quoted, escaping as JSON requires
+            quote, j, buf = ch, i + 1, []
+            while j < n and s[j] != quote:
+                c = s[j]
+                if c == "\\" and j + 1 < n:
+                    buf.append("'" if s[j + 1] == "'" else s[j:j + 2])
+                    j += 2
+                    continue
+                if c == '"':
+                    buf.append('\\"')
+                elif c == "\n":
+                    buf.append("\\n")
+                elif c == "\t":
+                    buf.append("\\t")
+                else:
+                    buf.append(c)
+                j += 1
+            out.append('"' + "".join(buf) + '"')
+            i = j + 1
+            continue
+        if ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            _strip_trailing_comma(out)
+            if stack:
+                out.append(stack.pop())
+            if not stack:
+                break
+        elif ch.isalpha() or ch == "_":
+            j = i
+            while j < n and (s[j].isalnum() or s[j] == "_"):
+                j += 1
+            word = s[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    # Close whatever a truncated output left open
+    _strip_trailing_comma(out)
+    tail = _last_tokens(out, 2)
+    if tail and tail[-1] == ":":
+        out.append("null")
+    elif (len(tail) == 2 and stack and stack[-1] == "}"
+          and tail[-1].startswith('"') and tail[0] in ("{", ",")):
+        out.append(": null")
+    while stack:
+        out.append(stack.pop())
+    return "".join(out)
+
+
+def validate_keys(obj, required_keys):
+    """
+    Ensures that 'obj' is a JSON object containing every key in 'required_keys'.
+
+    :raises MalformedOutputError: If 'obj' is not a dict or a key is missing.
+    """
+    if not isinstance(obj, dict):
+        raise MalformedOutputError(f"Expected a JSON object, got {type(obj).__name__}.")
+    missing = [key for key in required_keys if key not in obj]
+    if missing:
+        raise MalformedOutputError(f"JSON object is missing required keys: {missing}")
+
+
+def decode_json(text: str, required_keys=None):
+    """
+    Parses a model response as JSON, repairing it locally if the strict parse fails.
+
+    :param text: The raw model output.
+    :param required_keys: Optional iterable of keys the decoded object must contain.
+    :return: The decoded JSON value.
+    :raises MalformedOutputError: If the text cannot be repaired or fails validation.
+    """
+    try:
+        obj = json.loads(text)
+    except ValueError:
+        repaired = repair_json(text)
+        try:
+            obj = json.loads(repaired)
+        except ValueError as e:
+            raise MalformedOutputError(f"Unrecoverable JSON in model output: {e}") from None
+        logger.info("Repaired malformed JSON in model output.")
+    if required_keys:
+        validate_keys(obj, required_keys)
+    return obj
@@ -0,0 +1,410 @@
+# =========================================================================================
+# Fake LLM Backend
+# =========================================================================================
+# This script provides an offline stand-in for the chat-completions API so that the
+# orchestration layer (Moderator2, Environment, MessagePool, voting) can be
+# benchmarked and load-tested without paying for real calls. It produces:
+#   - Schema-valid {step, reasoning, next_action} JSON for JSON-format requests,
+#     finishing with next_action = "final_answer" after a configurable number of steps
+#   - "yes" / "no" answers for voting prompts
+#   - "Step k: ... [End]" text for stop-based completions
+#   - Plain text otherwise
+# Latency follows configurable percentiles, and 429s, empty and malformed outputs are
+# injected at configurable rates.
+#
+# It can be used in two ways:
+#   1. In-process: enable the 'fake_llm' section of 'config/env.yaml' or set the
+#      REAGENT_FAKE_LLM=1 environment variable; backend.api then returns fake clients
+#      instead of OpenAI clients.
+#   2. Over HTTP: run `python -m backend.fake_llm --port 8000` and point a service's
+#      base_url at http://127.0.0.1:8000/v1 to exercise the real client stack.
+# =========================================================================================
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import httpx
+import yaml
+from openai import RateLimitError
+
+_YES = re.compile(r"\byes\b", re.I)
+_NO = re.compile(r"\bno\b", re.I)
+
+
+class FakeRateLimit(Exception):
+    """
+    Internal signal that the fake backend decided to answer with HTTP 429.
+    """
+
+
+class FakeLLM:
+    """
+    FakeLLM decides the content, latency and injected faults of each fake response.
+    It is thread-safe and shared by the sync, async and HTTP front-ends.
+    """
+
+    def __init__(self, latency=None, rate_limit_rate: float = 0.0, malformed_rate: float = 0.0,
+                 empty_rate: float = 0.0, yes_rate: float = 0.3, steps: int = 3,
+                 tokens_per_second: float = 0.0, seed: int = None):
+        """
+        :param latency: Percentiles of the per-call latency in seconds, e.g.
+                        {"p50": 0.8, "p90": 2.0, "p99": 5.0}. Defaults to no delay.
+        :param rate_limit_rate: Probability that a call fails with HTTP 429.
+        :param malformed_rate: Probability that a JSON response is malformed (half of
+                               them repairable locally, half not).
+        :param empty_rate: Probability that a response has empty content.
+        :param yes_rate: Probability that a voting prompt is answered "yes".
+        :param steps: Number of reasoning steps before "final_answer" is returned.
+        :param tokens_per_second: If > 0, streamed chunks are paced at this rate.
+        :param seed: Optional seed for reproducible runs.
+        """
+        self.latency = latency or {}
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.empty_rate = empty_rate
+        self.yes_rate = yes_rate
+        self.steps = steps
+        self.tokens_per_second = tokens_per_second
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict = None):
+        """
+        Builds a FakeLLM from the 'fake_llm' section of 'config/env.yaml', e.g.:
+
+            fake_llm:
+              enabled: true
+              latency: {p50: 0.8, p90: 2.0, p99: 5.0}
+              rate_limit_rate: 0.02
+              malformed_rate: 0.05
+              steps: 4
+        """
+        config = dict(config or {})
+        config.pop("enabled", None)
+        return cls(**config)
+
+    def _uniform(self):
+        with self._lock:
+            return self._random.random()
+
+    def sample_latency(self) -> float:
+        """
+        Draws a latency by interpolating linearly between the configured percentiles.
+        The tail above the highest percentile extends to 1.5x its value.
+        """
+        points = sorted(
+            (float(key[1:]) / 100.0, float(value)) for key, value in self.latency.items()
+        )
+        if not points:
+            return 0.0
+        points = [(0.0, 0.0)] + points + [(1.0, points[-1][1] * 1.5)]
+        u = self._uniform()
+        for (q0, v0), (q1, v1) in zip(points, points[1:]):
+            if u <= q1:
+                return v0 + (v1 - v0) * (u - q0) / (q1 - q0 or 1.0)
+        return points[-1][1]
+
+    def respond(self, request: dict) -> str:
+        """
+        Produces the content for a chat.completions.create request.
+
+        :param request: The request keyword arguments (model, messages, stop, ...).
+        :raises FakeRateLimit: When a 429 is injected.
+        """
+        if self._uniform() < self.rate_limit_rate:
+            raise FakeRateLimit("Simulated rate limit")
+        if self._uniform() < self.empty_rate:
+            return ""
+
+        messages = request.get("messages", [])
+        last_user = next(
+            (m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), ""
+        )
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            return self._step_json(messages)
+        if request.get("stop"):
+            return self._step_text(request["stop"])
+        if _YES.search(last_user) and _NO.search(last_user):
+            return "yes" if self._uniform() < self.yes_rate else "no"
+        return "This is a simulated final answer."
+
+    def _step_json(self, messages):
+        step = 1 + sum(1 for m in messages if m.get("role") == "assistant" and "next_action" in m.get("content", ""))
+        data = {
+            "step": f"Simulated step {step}",
+            "reasoning": f"Simulated reasoning for step {step}. " * 8,
+            "next_action": "final_answer" if step >= self.steps else "continue",
+        }
+        text = json.dumps(data)
+        if self._uniform() < self.malformed_rate:
+            if self._uniform() < 0.5:
+                # Locally repairable: single quotes, trailing comma and a code fence
+                return "```json\n" + text.replace('"', "'")[:-1] + ",}\n```"
+            return "Sorry, I cannot produce JSON for this request."
+        return text
+
+    def _step_text(self, stop):
+        match = re.match(r"Step (\d+):", stop[0]) if stop else None
+        step = int(match.group(1)) - 1 if match else 1
+        if step >= self.steps:
+            return "Final Answer: This is a simulated final answer. [End]"
+        return f"Step {step}: Simulated reasoning for step {step}. [End]"
+
+    def chunks(self, content: str, size: int = 4):
+        """
+        Splits content into streaming deltas of roughly 'size' characters.
+        """
+        return [content[i:i + size] for i in range(0, len(content), size)]
+
+    def chunk_delay(self) -> float:
+        """
+        Pause between streamed chunks (assuming ~1 token per chunk).
+        """
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+
+# -----------------------------------------------------------------------------------------
+# Response objects (attribute access mirrors the openai client)
+# -----------------------------------------------------------------------------------------
+
+def _usage(request, content):
+    prompt_tokens = len(json.dumps(request.get("messages", []))) // 4
+    completion_tokens = len(content) // 4
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+    )
+
+
+def _completion(request, content):
+    return SimpleNamespace(
+        id=f"fake-{uuid.uuid4().hex}",
+        model=request.get("model"),
+        choices=[SimpleNamespace(
+            index=0,
+            finish_reason="stop",
+            message=SimpleNamespace(role="assistant", content=content),
+        )],
+        usage=_usage(request, content),
+    )
+
+
+def _chunk(request, delta):
+    return SimpleNamespace(
+        model=request.get("model"),
+        choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=delta))],
+    )
+
+
+def _rate_limit_error(request):
+    response = httpx.Response(429, request=httpx.Request("POST", "http://fake-llm/v1/chat/completions"))
+    return RateLimitError("Simulated rate limit (429)", response=response, body=None)
+
+
+class _FakeStream:
+    def __init__(self, llm, request, content):
+        self._chunks = llm.chunks(content)
+        self._delay = llm.chunk_delay()
+        self._request = request
+        self.closed = False
+
+    def __iter__(self):
+        for delta in self._chunks:
+            if self.closed:
+                return
+            if self._delay:
+                time.sleep(self._delay)
+            yield _chunk(self._request, delta)
+
+    def close(self):
+        self.closed = True
+
+
+class _AsyncFakeStream(_FakeStream):
+    async def __aiter__(self):
+        for delta in self._chunks:
+            if self.closed:
+                return
+            if self._delay:
+                await asyncio.sleep(self._delay)
+            yield _chunk(self._request, delta)
+
+    async def close(self):
+        self.closed = True
+
+
+# -----------------------------------------------------------------------------------------
+# In-process clients
+# -----------------------------------------------------------------------------------------
+
+class FakeChatClient:
+    """
+    Drop-in replacement for OpenAI(...) exposing chat.completions.create.
+    """
+
+    def __init__(self, llm: FakeLLM):
+        self.llm = llm
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **request):
+        time.sleep(self.llm.sample_latency())
+        try:
+            content = self.llm.respond(request)
+        except FakeRateLimit:
+            raise _rate_limit_error(request)
+        if request.get("stream"):
+            return _FakeStream(self.llm, request, content)
+        return _completion(request, content)
+
+    def close(self):
+        pass
+
+
+class AsyncFakeChatClient:
+    """
+    Drop-in replacement for AsyncOpenAI(...) exposing chat.completions.create.
+    """
+
+    def __init__(self, llm: FakeLLM):
+        self.llm = llm
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **request):
+        await asyncio.sleep(self.llm.sample_latency())
+        try:
+            content = self.llm.respond(request)
+        except FakeRateLimit:
+            raise _rate_limit_error(request)
+        if request.get("stream"):
+            return _AsyncFakeStream(self.llm, request, content)
+        return _completion(request, content)
+
+    async def close(self):
+        pass
+
+
+# -----------------------------------------------------------------------------------------
+# HTTP server speaking the chat-completions protocol
+# -----------------------------------------------------------------------------------------
+
+def make_handler(llm: FakeLLM):
+    """
+    Builds a request handler class serving POST /v1/chat/completions from 'llm'.
+    """
+
+    class FakeLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def handle(self):
+            # Clients hang up mid-response when a hedged or streamed request is cancelled
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found"}})
+                return
+
+            time.sleep(llm.sample_latency())
+            try:
+                content = llm.respond(request)
+            except FakeRateLimit:
+                self._send_json(429, {"error": {"message": "Simulated rate limit", "type": "rate_limit"}})
+                return
+
+            completion_id = f"fake-{uuid.uuid4().hex}"
+            created = int(time.time())
+            if not request.get("stream"):
+                usage = _usage(request, content)
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": request.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }],
+                    "usage": vars(usage),
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for delta in llm.chunks(content) + [None]:
+                if llm.chunk_delay():
+                    time.sleep(llm.chunk_delay())
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": request.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"content": delta} if delta is not None else {},
+                        "finish_reason": None if delta is not None else "stop",
+                    }],
+                }
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return FakeLLMHandler
+
+
+def serve(llm: FakeLLM, host: str = "127.0.0.1", port: int = 8000):
+    """
+    Runs the fake chat-completions server until interrupted.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(llm))
+    print(f"[INFO] Fake LLM listening on http://{host}:{port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake OpenAI-compatible chat-completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--config", default=None,
+                        help="YAML file whose 'fake_llm' section configures latency and faults.")
+    cli_args = parser.parse_args()
+
+    fake_config = {}
+    if cli_args.config:
+        with open(cli_args.config, "r") as f:
+            fake_config = (yaml.safe_load(f) or {}).get("fake_llm", {})
+    serve(FakeLLM.from_config(fake_config), cli_args.host, cli_args.port)
@@ -0,0 +1,213 @@
+# =========================================================================================
+# Request Hedging Module
+# =========================================================================================
+# This script implements hedged requests for latency-critical call sites (e.g. the
+# serial steps of Moderator2). Hedging applies to single attempts: an attempt starts
+# normally; if it has not returned after a delay derived from the recently observed
+# latency of its model (e.g. the p90), a duplicate attempt is started, and the first
+# successful response wins. It provides:
+#   - LatencyTracker: a sliding window of recent attempt latencies per model
+#   - HedgePolicy: the hedging delay (percentile, bounds, warm-up) and settings
+#   - run_hedged / run_hedged_async: race a primary and a delayed secondary branch
+# The losing asyncio branch is cancelled outright. A losing thread cannot interrupt
+# a request already in flight; its result is discarded, and the thread stays busy
+# until the request returns. Synchronous hedged calls share 'max_workers' threads:
+# once they are all busy, new hedged attempts run unhedged on the caller's thread
+# and no duplicates are started, so saturation never queues a request.
+# =========================================================================================
+
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import threading
+
+
+class LatencyTracker:
+    """
+    Keeps the latencies of the last 'window' successful attempts per model. Only
+    single requests are observed, never whole calls, whose latency includes retries
+    and back-off.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model: str, latency: float):
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = collections.deque(maxlen=self.window)
+            samples.append(latency)
+
+    def quantile(self, model: str, q: float, min_samples: int = 1):
+        """
+        Returns the q-quantile of the recent latencies of 'model', or None if fewer
+        than 'min_samples' have been observed.
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class HedgePolicy:
+    """
+    HedgePolicy decides when a hedged attempt fires its duplicate request.
+    """
+
+    def __init__(self, percentile: float = 0.9, initial_delay: float = 10.0, min_delay: float = 0.5,
+                 max_delay: float = 60.0, min_samples: int = 20, fallback: bool = True,
+                 max_workers: int = 32, callers: dict = None, tracker: LatencyTracker = None):
+        """
+        :param percentile: Default latency percentile after which the duplicate is sent.
+        :param initial_delay: Delay in seconds used until 'min_samples' latencies are known.
+        :param min_delay: Lower bound of the hedging delay in seconds.
+        :param max_delay: Upper bound of the hedging delay in seconds.
+        :param min_samples: Observations needed before the percentile is trusted.
+        :param fallback: If True, the duplicate goes to the route's next provider when
+                         one exists; otherwise to the same provider.
+        :param max_workers: Threads available to synchronous hedged calls.
+        :param callers: Hedging setting per caller (True, False or a percentile), read
+                        by call sites through for_caller(); unlisted callers do not hedge.
+        :param tracker: The LatencyTracker to read; a new one by default.
+        """
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.fallback = fallback
+        self.max_workers = max_workers
+        self.callers = dict(callers or {})
+        self.tracker = tracker or LatencyTracker()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict = None, **kwargs):
+        """
+        Builds a policy from the 'hedging' section of 'config/env.yaml', e.g.:
+
+            hedging:
+              percentile: 0.9
+              initial_delay: 10
+              min_delay: 0.5
+              max_delay: 60
+              fallback: true
+              callers:
+                moderator2: true
+        """
+        config = dict(config or {})
+        config.update(kwargs)
+        return cls(**config)
+
+    def for_caller(self, caller: str):
+        """
+        The configured hedging setting of 'caller', False if it has none.
+        """
+        return self.callers.get(caller, False)
+
+    def delay(self, model: str, percentile: float = None) -> float:
+        """
+        Seconds to wait for an attempt against 'model' before hedging it.
+
+        :param percentile: Overrides the policy's percentile for this call.
+        """
+        observed = self.tracker.quantile(model, percentile or self.percentile, self.min_samples)
+        delay = self.initial_delay if observed is None else observed
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = BoundedExecutor(self.max_workers)
+        return self._executor
+
+
+class BoundedExecutor:
+    """
+    A thread pool whose submit() returns None instead of queueing the call once
+    all 'max_workers' threads are busy.
+    """
+
+    def __init__(self, max_workers: int):
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+def run_hedged(primary, secondary, delay: float, executor, on_hedge=None):
+    """
+    Runs 'primary()' and, if it has not finished after 'delay' seconds, also
+    'secondary()'. Returns the first successful result; if both fail, the error of
+    the primary is raised. Both branches run on 'executor' in a copy of the caller's
+    context (retry budget, telemetry caller, ...). If the executor has no free thread
+    (its submit() returns None, see BoundedExecutor), the primary runs unhedged on
+    the caller's thread, or no secondary is started.
+
+    :param on_hedge: Optional callable invoked when the secondary branch is started.
+    """
+    first = executor.submit(contextvars.copy_context().run, primary)
+    if first is None:
+        return primary()
+    done, _ = concurrent.futures.wait([first], timeout=delay)
+    if done:
+        return first.result()
+
+    second = executor.submit(contextvars.copy_context().run, secondary)
+    if second is None:
+        return first.result()
+    if on_hedge is not None:
+        on_hedge()
+    pending = {first, second}
+    while pending:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    loser.cancel()
+                return future.result()
+    return first.result()
+
+
+async def run_hedged_async(primary, secondary, delay: float, on_hedge=None):
+    """
+    Asyncio counterpart of run_hedged; 'primary' and 'secondary' return coroutines.
+    The losing branch is cancelled, and so are both if the caller is cancelled.
+    """
+    first = asyncio.ensure_future(primary())
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return first.result()
+
+        if on_hedge is not None:
+            on_hedge()
+        tasks.append(asyncio.ensure_future(secondary()))
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        return first.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
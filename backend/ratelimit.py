@@ -0,0 +1,235 @@
+# =========================================================================================
+# Rate Limiter Module
+# =========================================================================================
+# This script provides proactive, per-provider rate limiting for LLM calls. Each
+# provider gets two token buckets: one for requests per minute (RPM) and one for
+# tokens per minute (TPM). A call reserves one request plus an estimate of its
+# tokens before it is sent, and the estimate is settled against the real usage
+# reported by the provider afterwards.
+#
+# Bucket state can live in two places:
+#   - "local": in process memory, shared by all threads of one worker
+#   - "file":  in a small state file guarded by an advisory lock (fcntl), shared by
+#              every worker process on the same host
+# =========================================================================================
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------------------------------------------------------------------
+# Bucket state backends
+# -----------------------------------------------------------------------------------------
+
+class LocalBucketState:
+    """
+    Keeps bucket levels in memory. A lock serializes updates between threads.
+    The state is a list [request_level, token_level, last_refill_time].
+    """
+
+    def __init__(self, initial):
+        self._state = list(initial)
+        self._lock = threading.Lock()
+
+    def update(self, fn):
+        """
+        Applies 'fn' to the current state under the lock. 'fn' mutates the state
+        list in place and returns a value that is passed back to the caller.
+        """
+        with self._lock:
+            return fn(self._state)
+
+
+class FileBucketState:
+    """
+    Keeps bucket levels in a 24-byte file so that several processes share one
+    budget. Every update takes an exclusive fcntl lock on the file, and a thread
+    lock protects the shared file descriptor within a process. Needs fcntl, so it
+    is only available on POSIX systems.
+    """
+
+    _FORMAT = "ddd"
+
+    def __init__(self, path: str, initial):
+        # Imported here so that the in-process bucket works where fcntl is missing
+        try:
+            import fcntl
+        except ImportError as e:
+            raise RuntimeError("The 'file' rate limit backend needs fcntl (POSIX only).") from e
+        self._fcntl = fcntl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._fd).st_size < struct.calcsize(self._FORMAT):
+                    self._write(list(initial))
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    def _read(self):
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        return list(struct.unpack(self._FORMAT, os.read(self._fd, struct.calcsize(self._FORMAT))))
+
+    def _write(self, state):
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, struct.pack(self._FORMAT, *state))
+
+    def update(self, fn):
+        """
+        Reads the shared state, applies 'fn' and writes it back, all while
+        holding the file lock.
+        """
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                state = self._read()
+                result = fn(state)
+                self._write(state)
+                return result
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+
+# -----------------------------------------------------------------------------------------
+# Rate limiter
+# -----------------------------------------------------------------------------------------
+
+class RateLimiter:
+    """
+    RateLimiter enforces a requests-per-minute and a tokens-per-minute budget for
+    one provider using two token buckets that refill continuously. Either budget
+    may be None, in which case it is not enforced.
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None, state=None):
+        """
+        :param rpm: Requests allowed per minute, or None for no request limit.
+        :param tpm: Tokens (prompt + completion) allowed per minute, or None.
+        :param state: A bucket state backend; defaults to LocalBucketState.
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        initial = [float(rpm or 0), float(tpm or 0), time.time()]
+        self.state = state if state is not None else LocalBucketState(initial)
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state[2])
+        if self.rpm:
+            state[0] = min(float(self.rpm), state[0] + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            state[1] = min(float(self.tpm), state[1] + elapsed * self.tpm / 60.0)
+        state[2] = now
+
+    def try_acquire(self, tokens: int = 0) -> float:
+        """
+        Attempts to reserve one request and 'tokens' tokens.
+
+        :param tokens: Estimated tokens for the request; clamped to the TPM budget.
+        :return: 0.0 if the reservation succeeded, otherwise the number of seconds
+                 to wait before trying again.
+        """
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+
+        def take(state):
+            self._refill(state, time.time())
+            wait = 0.0
+            if self.rpm and state[0] < 1:
+                wait = max(wait, (1 - state[0]) * 60.0 / self.rpm)
+            if self.tpm and state[1] < tokens:
+                wait = max(wait, (tokens - state[1]) * 60.0 / self.tpm)
+            if wait == 0.0:
+                if self.rpm:
+                    state[0] -= 1
+                if self.tpm:
+                    state[1] -= tokens
+            return wait
+
+        return self.state.update(take)
+
+    def acquire(self, tokens: int = 0):
+        """
+        Blocks the calling thread until one request and 'tokens' tokens are reserved.
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """
+        Asyncio counterpart of acquire(); waits with asyncio.sleep.
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return
+            await asyncio.sleep(wait)
+
+    def settle(self, reserved: int, used: int):
+        """
+        Corrects the token bucket once the real usage of a request is known:
+        over-estimates are refunded and under-estimates are charged.
+
+        :param reserved: Tokens reserved by acquire().
+        :param used: Tokens actually consumed, e.g. response.usage.total_tokens.
+        """
+        if not self.tpm or used is None:
+            return
+        reserved = min(reserved, self.tpm)
+
+        def adjust(state):
+            self._refill(state, time.time())
+            state[1] = min(float(self.tpm), state[1] + reserved - used)
+
+        self.state.update(adjust)
+
+
+def estimate_tokens(messages, max_tokens: int = 0) -> int:
+    """
+    Cheap upper-bound estimate of the tokens a chat request will consume: roughly
+    four characters per prompt token, plus the completion budget 'max_tokens'
+    (providers count the requested maximum against TPM limits).
+    """
+    prompt_chars = len(json.dumps(messages, ensure_ascii=False))
+    return prompt_chars // 4 + (max_tokens or 0)
+
+
+def build_rate_limiter(provider: str, service: dict, config: dict = None):
+    """
+    Builds the limiter for one provider from its service entry and the global
+    'rate_limit' section of 'config/env.yaml', e.g.:
+
+        services:
+          deepseek:
+            rpm: 500
+            tpm: 200000
+        rate_limit:
+          backend: file          # "local" (default) or "file"
+          path: .cache/ratelimit
+
+    :return: A RateLimiter, or None if the provider has neither 'rpm' nor 'tpm'.
+    """
+    rpm = service.get("rpm")
+    tpm = service.get("tpm")
+    if not rpm and not tpm:
+        return None
+    config = config or {}
+    state = None
+    if config.get("backend", "local") == "file":
+        path = os.path.join(config.get("path", ".cache/ratelimit"), f"{provider}.bucket")
+        state = FileBucketState(path, [float(rpm or 0), float(tpm or 0), time.time()])
+    return RateLimiter(rpm=rpm, tpm=tpm, state=state)
@@ -0,0 +1,458 @@
+# =========================================================================================
+# Retry Policy Module
+# =========================================================================================
+# This script centralizes how LLM calls are retried. It provides:
+#   - RetryPolicy: capped exponential back-off with full jitter, plus classification
+#     of errors into retryable ones (429, 5xx, timeouts, malformed output, from an
+#     explicit allow-list) and fatal ones (everything else)
+#   - RetryBudget: a cap on the total number of retries spent by one task (e.g. one
+#     question), shared by every call made inside a retry_budget() block
+#   - CircuitBreaker: a per-provider breaker that fails fast while a backend is down
+#     and lets a single probe request through after a cool-down
+#   - call_with_retry / call_with_retry_async: the loops that tie the three together
+#   - call_with_failover / call_with_failover_async: the same loops over several
+#     providers, which share one call's attempts
+#   - call_once / call_once_async: a single attempt guarded by a breaker
+# =========================================================================================
+
+import asyncio
+import contextlib
+import contextvars
+import copy
+import logging
+import random
+import threading
+import time
+
+from backend.decoding import MalformedOutputError
+
+logger = logging.getLogger(__name__)
+
+
+class RetriesExhaustedError(RuntimeError):
+    """
+    Raised when a call still fails after the policy's last attempt.
+    """
+
+
+class RetryBudgetExhaustedError(RuntimeError):
+    """
+    Raised when the current task has used up its retry budget.
+    """
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised without contacting the provider while its circuit breaker is open.
+    """
+
+
+class EmptyResponseError(Exception):
+    """
+    Raised by call sites when a provider returns an empty completion; retryable.
+    """
+
+
+# -----------------------------------------------------------------------------------------
+# Retry policy
+# -----------------------------------------------------------------------------------------
+
+class RetryPolicy:
+    """
+    RetryPolicy decides whether and when a failed call is attempted again.
+    Delays follow "full jitter": a uniform draw from [0, min(max_delay,
+    base_delay * 2 ** attempt)], which spreads out retries from concurrent callers.
+    """
+
+    # HTTP statuses that are worth retrying; other 4xx errors are fatal
+    RETRYABLE_STATUS = (408, 409, 429)
+
+    def __init__(self, max_attempts: int = 10, base_delay: float = 1.0, max_delay: float = 30.0,
+                 retryable_errors=(ConnectionError, TimeoutError, EmptyResponseError, MalformedOutputError),
+                 outage_errors=(ConnectionError, TimeoutError)):
+        """
+        :param max_attempts: Total attempts per call, including the first one.
+        :param base_delay: Back-off scale in seconds for the first retry.
+        :param max_delay: Upper bound in seconds for any single back-off.
+        :param retryable_errors: Exception types without an HTTP status that are retried;
+                                 every other error is fatal.
+        :param outage_errors: Exception types (besides 5xx responses) that indicate the
+                              provider is unreachable and count against its breaker.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable_errors = tuple(retryable_errors)
+        self.outage_errors = tuple(outage_errors)
+
+    @classmethod
+    def from_config(cls, config: dict = None, **kwargs):
+        """
+        Builds a policy from the 'retry' section of 'config/env.yaml', e.g.:
+
+            retry:
+              max_attempts: 6
+              base_delay: 1.0
+              max_delay: 20.0
+              task_budget: 30
+
+        Extra keyword arguments are passed to the constructor unchanged.
+        """
+        config = config or {}
+        return cls(
+            max_attempts=config.get("max_attempts", 10),
+            base_delay=config.get("base_delay", 1.0),
+            max_delay=config.get("max_delay", 30.0),
+            **kwargs
+        )
+
+    def with_max_attempts(self, max_attempts: int):
+        """
+        Returns a copy of this policy with a different number of attempts.
+        """
+        policy = copy.copy(self)
+        policy.max_attempts = max_attempts
+        return policy
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Seconds to wait after the failed attempt number 'attempt' (0-based).
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def is_retryable(self, error: Exception) -> bool:
+        """
+        Classifies an error. Errors carrying an HTTP status are retried on 408, 409,
+        429 and 5xx only; errors without one are retried only if they are instances
+        of 'retryable_errors' (timeouts, malformed output, empty responses, ...).
+        Anything else, e.g. a KeyError from a missing configuration entry, is fatal.
+        """
+        if isinstance(error, (CircuitOpenError, RetryBudgetExhaustedError)):
+            return False
+        status = getattr(error, "status_code", None)
+        if status is not None:
+            return status in self.RETRYABLE_STATUS or status >= 500
+        return isinstance(error, self.retryable_errors)
+
+    def is_outage(self, error: Exception) -> bool:
+        """
+        True if the error suggests the provider itself is failing (5xx or unreachable),
+        as opposed to a problem with this particular request or response.
+        """
+        status = getattr(error, "status_code", None)
+        if status is not None:
+            return status >= 500
+        return isinstance(error, self.outage_errors)
+
+
+# -----------------------------------------------------------------------------------------
+# Per-task retry budget
+# -----------------------------------------------------------------------------------------
+
+class RetryBudget:
+    """
+    A thread-safe counter of the retries a task may still spend.
+    """
+
+    def __init__(self, max_retries: int):
+        self.max_retries = max_retries
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def consume(self) -> bool:
+        """
+        Takes one retry from the budget. Returns False if none is left.
+        """
+        with self._lock:
+            if self.used >= self.max_retries:
+                return False
+            self.used += 1
+            return True
+
+
+_current_budget = contextvars.ContextVar("retry_budget", default=None)
+
+
+@contextlib.contextmanager
+def retry_budget(max_retries: int = None):
+    """
+    Scopes a RetryBudget to the enclosed block. Every call_with_retry inside the block
+    (including in asyncio tasks spawned from it) draws its retries from this budget.
+    With max_retries=None no budget is enforced.
+    """
+    budget = RetryBudget(max_retries) if max_retries is not None else None
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def current_retry_budget():
+    """
+    Returns the RetryBudget of the enclosing retry_budget() block, or None.
+    """
+    return _current_budget.get()
+
+
+# -----------------------------------------------------------------------------------------
+# Circuit breaker
+# -----------------------------------------------------------------------------------------
+
+class CircuitBreaker:
+    """
+    CircuitBreaker tracks consecutive outage errors for one provider. After
+    'failure_threshold' of them the circuit opens and calls fail immediately with
+    CircuitOpenError. Once 'reset_timeout' seconds have passed, a single probe call
+    is allowed (half-open); its success closes the circuit, its failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, name: str, config: dict = None):
+        """
+        Builds a breaker from the 'circuit_breaker' section of 'config/env.yaml', e.g.:
+
+            circuit_breaker:
+              failure_threshold: 5
+              reset_timeout: 30
+        """
+        config = config or {}
+        return cls(
+            name,
+            failure_threshold=config.get("failure_threshold", 5),
+            reset_timeout=config.get("reset_timeout", 30.0),
+        )
+
+    @property
+    def state(self) -> str:
+        """
+        'closed', 'open' or 'half-open'.
+        """
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def check(self):
+        """
+        Admits a call or raises CircuitOpenError. In the half-open state only one
+        probe call is admitted at a time.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpenError(f"Circuit for provider '{self.name}' is open; failing fast.")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._probing:
+                    logger.error(f"Opening circuit for provider '{self.name}' after {self.failures} failures.")
+                self.opened_at = time.time()
+                self._probing = False
+
+    def release(self):
+        """
+        Ends a half-open probe that finished with a non-outage error, so that
+        another probe may be admitted.
+        """
+        with self._lock:
+            self._probing = False
+
+
+# -----------------------------------------------------------------------------------------
+# Retry loops
+# -----------------------------------------------------------------------------------------
+
+def _is_failover(error, policy) -> bool:
+    """
+    True if a retryable 'error' is better retried on another provider: an outage
+    or rate limiting.
+    """
+    return policy.is_outage(error) or getattr(error, "status_code", None) == 429
+
+
+def _record_failure(error, policy, breaker):
+    if breaker is not None:
+        if policy.is_outage(error):
+            breaker.record_failure()
+        else:
+            breaker.release()
+
+
+def _after_failure(error, attempt, policy, breaker, budget, has_next=False):
+    """
+    Shared bookkeeping after a failed attempt. Re-raises fatal errors and returns
+    the back-off delay for retryable ones. With 'has_next', returns None instead
+    when the call should fail over to its next target.
+    """
+    _record_failure(error, policy, breaker)
+    if isinstance(error, RetryBudgetExhaustedError):
+        raise error
+    if not policy.is_retryable(error):
+        # A provider rejecting the request (e.g. a bad key) is worth a fallback;
+        # a local error would fail on every target alike
+        if has_next and getattr(error, "status_code", None) is not None:
+            return None
+        raise error
+    logger.error(f"Error while calling API (attempt {attempt + 1}/{policy.max_attempts}): {str(error)}")
+    if attempt + 1 >= policy.max_attempts:
+        raise RetriesExhaustedError("Max retries reached. API call failed.") from error
+    if budget is not None and not budget.consume():
+        raise RetryBudgetExhaustedError("Retry budget of the current task is exhausted.") from error
+    if has_next and _is_failover(error, policy):
+        return None
+    return policy.backoff(attempt)
+
+
+def _failed_over(breaker, error):
+    name = breaker.name if breaker is not None else "unknown"
+    logger.error(f"Provider '{name}' failed ({error}); trying fallback.")
+
+
+def call_with_failover(targets, policy: RetryPolicy):
+    """
+    Calls the targets in order until one succeeds. All targets share the policy's
+    attempts: a target is retried with back-off after transient errors, and the call
+    moves on to the next target (without back-off) after an outage, a 429 or an HTTP
+    error that is not retried, or while the target's circuit is open; other fatal
+    errors are raised at once. The last target is retried until the attempts run out.
+
+    :param targets: A list of (fn, breaker) pairs; 'fn()' performs one attempt and
+                    'breaker' (or None) is the CircuitBreaker of its provider.
+    :return: The first successful result.
+    :raises RetriesExhaustedError: If every attempt failed with a retryable error.
+    """
+    budget = current_retry_budget()
+    index, attempt = 0, 0
+    while attempt < policy.max_attempts:
+        fn, breaker = targets[index]
+        has_next = index + 1 < len(targets)
+        if breaker is not None:
+            try:
+                breaker.check()
+            except CircuitOpenError as e:
+                if not has_next:
+                    raise
+                _failed_over(breaker, e)
+                index += 1
+                continue
+        try:
+            result = fn()
+        except Exception as e:
+            delay = _after_failure(e, attempt, policy, breaker, budget, has_next)
+            attempt += 1
+            if delay is None:
+                _failed_over(breaker, e)
+                index += 1
+            else:
+                time.sleep(delay)
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
+    raise RetriesExhaustedError("Max retries reached. API call failed.")
+
+
+async def call_with_failover_async(targets, policy: RetryPolicy):
+    """
+    Asyncio counterpart of call_with_failover; each 'fn()' must return a coroutine.
+    """
+    budget = current_retry_budget()
+    index, attempt = 0, 0
+    while attempt < policy.max_attempts:
+        fn, breaker = targets[index]
+        has_next = index + 1 < len(targets)
+        if breaker is not None:
+            try:
+                breaker.check()
+            except CircuitOpenError as e:
+                if not has_next:
+                    raise
+                _failed_over(breaker, e)
+                index += 1
+                continue
+        try:
+            result = await fn()
+        except Exception as e:
+            delay = _after_failure(e, attempt, policy, breaker, budget, has_next)
+            attempt += 1
+            if delay is None:
+                _failed_over(breaker, e)
+                index += 1
+            else:
+                await asyncio.sleep(delay)
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
+    raise RetriesExhaustedError("Max retries reached. API call failed.")
+
+
+def call_once(fn, policy: RetryPolicy, breaker: CircuitBreaker):
+    """
+    Makes a single attempt 'fn()' through the provider's 'breaker', without retrying
+    (e.g. the duplicate of a hedged attempt, which runs beside the retry loop).
+    """
+    breaker.check()
+    try:
+        result = fn()
+    except Exception as e:
+        _record_failure(e, policy, breaker)
+        raise
+    breaker.record_success()
+    return result
+
+
+async def call_once_async(coro_fn, policy: RetryPolicy, breaker: CircuitBreaker):
+    """
+    Asyncio counterpart of call_once.
+    """
+    breaker.check()
+    try:
+        result = await coro_fn()
+    except Exception as e:
+        _record_failure(e, policy, breaker)
+        raise
+    breaker.record_success()
+    return result
+
+
+def call_with_retry(fn, policy: RetryPolicy, breaker: CircuitBreaker = None):
+    """
+    Calls 'fn()' until it succeeds, applying 'policy', the provider's 'breaker' and
+    the current task's retry budget.
+
+    :param fn: A zero-argument callable performing one attempt.
+    :return: The first successful result.
+    :raises RetriesExhaustedError: If every attempt failed with a retryable error.
+    """
+    return call_with_failover([(fn, breaker)], policy)
+
+
+async def call_with_retry_async(coro_fn, policy: RetryPolicy, breaker: CircuitBreaker = None):
+    """
+    Asyncio counterpart of call_with_retry; 'coro_fn()' must return a coroutine.
+    """
+    return await call_with_failover_async([(coro_fn, breaker)], policy)
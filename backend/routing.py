@@ -0,0 +1,220 @@
+# =========================================================================================
+# Model Routing Module
+# =========================================================================================
+# This script maps the model names used by agents (e.g. "deepseek-chat", "gpt-4o") to
+# the provider endpoints that serve them. It provides:
+#   - Route: a model name or glob pattern, its provider, and an ordered list of
+#     fallback targets (other providers, possibly under another model name)
+#   - ProviderHealth: a per-provider health score built from recent successes,
+#     failures and latency, which recovers gradually while a provider is idle
+#   - Router: resolves a model to its candidate targets, moving unhealthy providers
+#     behind healthy ones so traffic shifts away from degraded endpoints
+# Routes are declared in the 'routing' section of 'config/env.yaml'.
+# =========================================================================================
+
+import fnmatch
+import threading
+import time
+
+# The substring rules used before routing was configurable; they stay as the
+# lowest-priority routes so existing model names keep working without any config.
+DEFAULT_ROUTES = (
+    {"match": "*gpt*", "provider": "openai"},
+    {"match": "*o1*", "provider": "openai"},
+    {"match": "*qwen*", "provider": "qwen"},
+    {"match": "*deepseek*", "provider": "deepseek"},
+    {"match": "*claude*", "provider": "claude"},
+)
+
+
+class Target:
+    """
+    A concrete (provider, model) pair that a request can be sent to.
+    """
+
+    __slots__ = ("provider", "model")
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+
+    def __eq__(self, other):
+        return isinstance(other, Target) and (self.provider, self.model) == (other.provider, other.model)
+
+    def __hash__(self):
+        return hash((self.provider, self.model))
+
+    def __repr__(self):
+        return f"Target({self.provider!r}, {self.model!r})"
+
+
+class Route:
+    """
+    Route sends models matching 'match' (an exact name or a glob pattern) to
+    'provider', trying 'fallbacks' in order when the primary target fails.
+    """
+
+    def __init__(self, match: str, provider: str, model: str = None, fallbacks=()):
+        """
+        :param match: Model name or glob pattern, e.g. "deepseek-chat" or "*qwen*".
+        :param provider: Service key in 'config/env.yaml' of the primary endpoint.
+        :param model: Model name to send upstream; None forwards the requested name.
+        :param fallbacks: Iterable of {"provider": ..., "model": ...} dicts.
+        """
+        self.match = match
+        self.provider = provider
+        self.model = model
+        self.fallbacks = [dict(f) for f in fallbacks]
+
+    @classmethod
+    def from_dict(cls, entry: dict):
+        return cls(entry["match"], entry["provider"], entry.get("model"), entry.get("fallbacks", ()))
+
+    def matches(self, model: str) -> bool:
+        return model == self.match or fnmatch.fnmatchcase(model, self.match)
+
+    def targets(self, model: str):
+        """
+        The primary target followed by the fallbacks, for the requested 'model'.
+        """
+        targets = [Target(self.provider, self.model or model)]
+        for fallback in self.fallbacks:
+            target = Target(fallback["provider"], fallback.get("model") or model)
+            if target not in targets:
+                targets.append(target)
+        return targets
+
+
+class ProviderHealth:
+    """
+    ProviderHealth keeps exponentially weighted averages of the success rate and
+    latency of one provider's attempts. Its score in [0, 1] is the success rate,
+    scaled down when latency exceeds 'latency_target'. While no new outcomes arrive
+    the failure part decays with 'recovery_half_life', so a demoted provider is
+    eventually tried again.
+    """
+
+    def __init__(self, alpha: float = 0.2, latency_target: float = 30.0,
+                 recovery_half_life: float = 60.0):
+        self.alpha = alpha
+        self.latency_target = latency_target
+        self.recovery_half_life = recovery_half_life
+        self.success_rate = 1.0
+        self.latency = None
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+    def _recovered(self, now):
+        # Failures fade toward a healthy state while the provider is idle
+        decay = 0.5 ** ((now - self.updated) / self.recovery_half_life)
+        return 1.0 - (1.0 - self.success_rate) * decay
+
+    def record(self, ok: bool, latency: float = None):
+        """
+        Adds the outcome of one attempt; 'latency' is only used for successes.
+        """
+        with self._lock:
+            now = time.time()
+            self.success_rate = (1 - self.alpha) * self._recovered(now) + self.alpha * (1.0 if ok else 0.0)
+            if ok and latency is not None:
+                self.latency = latency if self.latency is None else (
+                    (1 - self.alpha) * self.latency + self.alpha * latency
+                )
+            self.updated = now
+
+    @property
+    def score(self) -> float:
+        with self._lock:
+            score = self._recovered(time.time())
+            if self.latency is not None and self.latency > self.latency_target:
+                score *= self.latency_target / self.latency
+            return score
+
+
+class Router:
+    """
+    Router resolves model names to ordered candidate targets. Routes are checked in
+    declaration order and the first match wins; configured routes precede
+    DEFAULT_ROUTES. Candidates whose provider is unhealthy (score below
+    'min_score', or reported unavailable by the caller, e.g. an open circuit
+    breaker) are moved behind the healthy ones but never dropped.
+    """
+
+    def __init__(self, routes=(), min_score: float = 0.5, health_options: dict = None):
+        self.routes = [r if isinstance(r, Route) else Route.from_dict(r) for r in routes]
+        self.routes += [Route.from_dict(r) for r in DEFAULT_ROUTES]
+        self.min_score = min_score
+        self.health_options = dict(health_options or {})
+        self._health = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict = None):
+        """
+        Builds a router from the 'routing' section of 'config/env.yaml', e.g.:
+
+            routing:
+              min_score: 0.5
+              health: {alpha: 0.2, latency_target: 30, recovery_half_life: 60}
+              routes:
+                - match: deepseek-chat
+                  provider: deepseek
+                  fallbacks:
+                    - {provider: qwen, model: qwen-max}
+                - match: "gpt-*"
+                  provider: openai
+        """
+        config = config or {}
+        return cls(
+            routes=config.get("routes", ()),
+            min_score=config.get("min_score", 0.5),
+            health_options=config.get("health"),
+        )
+
+    def route(self, model: str) -> Route:
+        """
+        Returns the first route matching 'model'.
+
+        :raises ValueError: If no route matches.
+        """
+        for route in self.routes:
+            if route.matches(model):
+                return route
+        raise ValueError(f"Unknown model identifier: {model}")
+
+    def health(self, provider: str) -> ProviderHealth:
+        health = self._health.get(provider)
+        if health is None:
+            with self._lock:
+                health = self._health.setdefault(provider, ProviderHealth(**self.health_options))
+        return health
+
+    def record(self, provider: str, ok: bool, latency: float = None):
+        """
+        Feeds the outcome of one attempt against 'provider' into its health score.
+        """
+        self.health(provider).record(ok, latency)
+
+    def resolve(self, model: str, available=None):
+        """
+        Returns the candidate targets for 'model', healthy providers first and each
+        group in declaration order.
+
+        :param available: Optional callable(provider) -> bool; False demotes the provider.
+        """
+        targets = self.route(model).targets(model)
+
+        def healthy(target):
+            if available is not None and not available(target.provider):
+                return False
+            return self.health(target.provider).score >= self.min_score
+
+        return sorted(targets, key=lambda t: not healthy(t))
+
+    def scores(self) -> dict:
+        """
+        Current health score of every provider that has been used.
+        """
+        with self._lock:
+            providers = list(self._health)
+        return {provider: self._health[provider].score for provider in providers}
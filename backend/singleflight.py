@@ -0,0 +1,113 @@
+# =========================================================================================
+# Single-Flight Module
+# =========================================================================================
+# This script provides request coalescing for identical in-flight LLM calls. When
+# several threads (or coroutines) issue a request with the same key while a first
+# one is still running, they wait for that call and all receive its result instead
+# of each going to the provider. Once the call finishes, the key is released so
+# later requests are issued normally (the response cache covers repeats over time).
+# =========================================================================================
+
+import asyncio
+import threading
+import weakref
+
+
+class _Call:
+    """
+    Bookkeeping for one in-flight call shared between a leader and its followers.
+    """
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Thread-based single-flight group. The first caller for a key executes the
+    function; concurrent callers with the same key block until it completes and
+    receive the same result (or the same exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0  # number of calls answered by another caller's request
+
+    def do(self, key, fn):
+        """
+        Runs 'fn' unless a call with 'key' is already in flight, in which case
+        waits for that call instead.
+
+        :param key: A hashable identifier of the request.
+        :param fn: A zero-argument callable performing the request.
+        :return: The result of the (possibly shared) call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.followers += 1
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        """
+        Returns the number of distinct calls currently running.
+        """
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    Asyncio single-flight group. The shared request runs as its own task, so
+    cancelling one waiting caller does not cancel the request for the others.
+    In-flight tasks are tracked per event loop.
+    """
+
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary()  # loop -> {key: asyncio.Task}
+        self.shared = 0
+
+    async def do(self, key, coro_fn):
+        """
+        Awaits 'coro_fn()' unless a call with 'key' is already in flight on the
+        running loop, in which case awaits that call instead.
+
+        :param key: A hashable identifier of the request.
+        :param coro_fn: A zero-argument callable returning a coroutine.
+        :return: The result of the (possibly shared) call.
+        """
+        calls = self._calls.setdefault(asyncio.get_running_loop(), {})
+        task = calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn())
+            calls[key] = task
+            task.add_done_callback(lambda _: calls.pop(key, None))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
@@ -0,0 +1,104 @@
+# =========================================================================================
+# Streaming JSON Module
+# =========================================================================================
+# This script provides an incremental scanner for JSON objects that arrive as a
+# token stream. It reports every top-level member of the object as soon as its value
+# is complete, so that callers (e.g. Moderator2 reading a {step, reasoning,
+# next_action} step) can act on a field before the rest of the completion arrives.
+# =========================================================================================
+
+import json
+
+
+class JSONFieldStream:
+    """
+    JSONFieldStream consumes text deltas of a single JSON object. Any text before
+    the opening brace (such as a code fence) is ignored. Completed top-level
+    members are collected in 'fields' and returned by feed() in arrival order.
+    Nested objects and arrays are reported whole once their closing bracket arrives.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.closed = False     # True once the top-level object's closing brace was read
+        self._pos = 0           # next buffer index to scan
+        self._depth = 0         # bracket nesting depth; 1 means inside the top-level object
+        self._in_string = False
+        self._escape = False
+        self._key = None        # key whose value is being read, None while expecting a key
+        self._start = None      # buffer index where the current key or value begins
+        self._scalar = False    # True while reading an unquoted value (number, true, null...)
+
+    def feed(self, text: str):
+        """
+        Appends a delta and scans it.
+
+        :param text: The next chunk of streamed output.
+        :return: A list of (key, value) pairs completed by this chunk.
+        """
+        self.buffer += text
+        completed = []
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf) and not self.closed:
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._key is None:
+                            self._key = self._decode(buf[self._start:i + 1])
+                        else:
+                            self._complete(buf[self._start:i + 1], completed)
+            elif self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._start = i
+                    self._scalar = False
+            elif ch in "{[":
+                if self._depth == 1:
+                    self._start = i
+                    self._scalar = False
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1:
+                    self._complete(buf[self._start:i + 1], completed)
+                elif self._depth == 0:
+                    self._flush_scalar(buf, i, completed)
+                    self.closed = True
+            elif self._depth == 1:
+                if ch == ":":
+                    self._start = i + 1
+                    self._scalar = True
+                elif ch == ",":
+                    self._flush_scalar(buf, i, completed)
+            i += 1
+        self._pos = i
+        return completed
+
+    @staticmethod
+    def _decode(raw):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return raw
+
+    def _flush_scalar(self, buf, end, completed):
+        if self._scalar and self._key is not None:
+            self._complete(buf[self._start:end].strip(), completed)
+
+    def _complete(self, raw, completed):
+        value = self._decode(raw)
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+        self._key = None
+        self._scalar = False
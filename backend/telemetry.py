@@ -0,0 +1,312 @@
+# =========================================================================================
+# Telemetry Module
+# =========================================================================================
+# This script records one CallRecord per LLM call made through backend/api.py:
+# model, caller (the agent that issued it), prompt/completion tokens, wall latency,
+# retries, cache status and outcome. Records are:
+#   - Passed to any registered hooks (e.g. to forward them to a tracing system)
+#   - Aggregated per (model, caller) into in-process counters and histograms that
+#     can be exported as JSON or in the Prometheus text exposition format
+# The caller is taken from the 'caller' argument of the call functions or, failing
+# that, from the enclosing caller_scope() block.
+# =========================================================================================
+
+import bisect
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds; an implicit +Inf bucket follows the last one
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+_current_caller = contextvars.ContextVar("telemetry_caller", default=None)
+
+
+@contextlib.contextmanager
+def caller_scope(caller: str):
+    """
+    Attributes every call made inside the block (including asyncio tasks spawned
+    from it) to 'caller', unless a call passes its own 'caller' argument.
+    """
+    token = _current_caller.set(caller)
+    try:
+        yield
+    finally:
+        _current_caller.reset(token)
+
+
+def current_caller() -> str:
+    """
+    Returns the caller of the enclosing caller_scope() block, or 'unknown'.
+    """
+    return _current_caller.get() or "unknown"
+
+
+class CallRecord:
+    """
+    The measurements of a single call, filled in by backend/api.py.
+
+    'cache' is one of 'hit' (served from the response cache), 'miss' (cacheable but
+    not cached yet), 'bypass' (not eligible for caching) or 'coalesced' (shared the
+    upstream call of an identical in-flight request). 'outcome' is 'ok', 'error' or
+    'cancelled'. 'hedged' is True if a duplicate request was sent (see
+    backend/hedging.py).
+    """
+
+    __slots__ = ("endpoint", "model", "caller", "prompt_tokens", "completion_tokens",
+                 "latency", "attempts", "cache", "outcome", "error", "hedged")
+
+    def __init__(self, endpoint: str, model: str, caller: str = None):
+        self.endpoint = endpoint
+        self.model = model
+        self.caller = caller or current_caller()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency = 0.0
+        self.attempts = 0
+        self.cache = "bypass"
+        self.outcome = "ok"
+        self.error = None
+        self.hedged = False
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    def add_usage(self, prompt_tokens, completion_tokens):
+        """
+        Adds the tokens of one attempt; failed attempts still burn tokens.
+        """
+        self.prompt_tokens += prompt_tokens or 0
+        self.completion_tokens += completion_tokens or 0
+
+    def to_dict(self) -> dict:
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["retries"] = self.retries
+        return data
+
+
+class Histogram:
+    """
+    A cumulative-style histogram with fixed bucket bounds, as used by Prometheus.
+    Not thread-safe on its own; Telemetry serializes access.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        """
+        Estimates the q-quantile (0 < q < 1) by linear interpolation inside the
+        bucket that contains it. Returns None for an empty histogram.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                if i == len(self.bounds):
+                    return lower
+                return lower + (self.bounds[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {str(b): c for b, c in zip(list(self.bounds) + ["+Inf"], self.counts)},
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+class _Series:
+    """
+    Aggregates for one (model, caller) pair.
+    """
+
+    def __init__(self):
+        self.calls = {}  # (cache, outcome) -> count
+        self.retries = 0
+        self.hedges = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.completion_tokens = Histogram(TOKEN_BUCKETS)
+
+    def add(self, record: CallRecord):
+        key = (record.cache, record.outcome)
+        self.calls[key] = self.calls.get(key, 0) + 1
+        self.retries += record.retries
+        self.hedges += int(record.hedged)
+        self.latency.observe(record.latency)
+        self.prompt_tokens.observe(record.prompt_tokens)
+        self.completion_tokens.observe(record.completion_tokens)
+
+
+class Telemetry:
+    """
+    Telemetry collects CallRecords from every call function, forwards them to the
+    registered hooks and keeps per-(model, caller) aggregates.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """
+        Registers 'hook(record)' to be called after every call. Exceptions raised by
+        a hook are logged and never reach the caller of the API function.
+        """
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        with self._lock:
+            if hook in self._hooks:
+                self._hooks.remove(hook)
+
+    def record(self, record: CallRecord):
+        with self._lock:
+            series = self._series.get((record.model, record.caller))
+            if series is None:
+                series = self._series[(record.model, record.caller)] = _Series()
+            series.add(record)
+            hooks = list(self._hooks)
+        for hook in hooks:
+            try:
+                hook(record)
+            except Exception as e:
+                logger.error(f"Telemetry hook failed: {e}")
+
+    def latency_quantile(self, q: float, model: str = None, caller: str = None):
+        """
+        Estimates the q-quantile of call latency over the series matching 'model'
+        and/or 'caller' (all series if both are None). Returns None without data.
+        """
+        merged = Histogram(LATENCY_BUCKETS)
+        with self._lock:
+            for (m, c), series in self._series.items():
+                if (model is None or m == model) and (caller is None or c == caller):
+                    merged.counts = [a + b for a, b in zip(merged.counts, series.latency.counts)]
+                    merged.count += series.latency.count
+                    merged.sum += series.latency.sum
+        return merged.quantile(q)
+
+    def reset(self):
+        """
+        Drops all aggregates; hooks stay registered.
+        """
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> list:
+        """
+        Returns the aggregates as a list of plain dicts, one per (model, caller).
+        """
+        with self._lock:
+            rows = []
+            for (model, caller), series in sorted(self._series.items()):
+                rows.append({
+                    "model": model,
+                    "caller": caller,
+                    "calls": sum(series.calls.values()),
+                    "errors": sum(n for (_, outcome), n in series.calls.items() if outcome == "error"),
+                    "cache": {
+                        status: sum(n for (s, _), n in series.calls.items() if s == status)
+                        for status in sorted({s for s, _ in series.calls})
+                    },
+                    "retries": series.retries,
+                    "hedges": series.hedges,
+                    "prompt_tokens": int(series.prompt_tokens.sum),
+                    "completion_tokens": int(series.completion_tokens.sum),
+                    "latency": series.latency.to_dict(),
+                    "prompt_tokens_histogram": series.prompt_tokens.to_dict(),
+                    "completion_tokens_histogram": series.completion_tokens.to_dict(),
+                })
+            return rows
+
+    def to_json(self, indent: int = None) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "reagent_llm") -> str:
+        """
+        Renders the aggregates in the Prometheus text exposition format.
+        """
+        lines = [
+            f"# HELP {prefix}_calls_total LLM calls by model, caller, cache status and outcome.",
+            f"# TYPE {prefix}_calls_total counter",
+        ]
+        with self._lock:
+            items = sorted(self._series.items())
+            for (model, caller), series in items:
+                for (cache, outcome), n in sorted(series.calls.items()):
+                    labels = _labels(model=model, caller=caller, cache=cache, outcome=outcome)
+                    lines.append(f"{prefix}_calls_total{{{labels}}} {n}")
+            lines += [
+                f"# HELP {prefix}_retries_total Retried attempts by model and caller.",
+                f"# TYPE {prefix}_retries_total counter",
+            ]
+            for (model, caller), series in items:
+                lines.append(f"{prefix}_retries_total{{{_labels(model=model, caller=caller)}}} {series.retries}")
+            lines += [
+                f"# HELP {prefix}_hedges_total Hedged duplicate requests by model and caller.",
+                f"# TYPE {prefix}_hedges_total counter",
+            ]
+            for (model, caller), series in items:
+                lines.append(f"{prefix}_hedges_total{{{_labels(model=model, caller=caller)}}} {series.hedges}")
+            for name, attr, help_text in (
+                ("latency_seconds", "latency", "Wall latency of LLM calls in seconds."),
+                ("prompt_tokens", "prompt_tokens", "Prompt tokens per LLM call."),
+                ("completion_tokens", "completion_tokens", "Completion tokens per LLM call."),
+            ):
+                lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} histogram"]
+                for (model, caller), series in items:
+                    lines += _histogram_lines(f"{prefix}_{name}", getattr(series, attr),
+                                              model=model, caller=caller)
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels) -> str:
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+def _histogram_lines(name, histogram, **labels):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(histogram.bounds) + ["+Inf"], histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{{{_labels(**labels, le=bound)}}} {cumulative}")
+    lines.append(f"{name}_sum{{{_labels(**labels)}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{_labels(**labels)}}} {histogram.count}")
+    return lines
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    """
+    Returns the process-wide Telemetry instance used by backend/api.py.
+    """
+    return _telemetry
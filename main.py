@@ -31,7 +31,8 @@ from Environment.environment import Environment
 from Environment.groupchat import GroupChatEnvironment
 
 # Interaction
-from Interaction.messagepool import MessagePool, message_pool
+from Interaction.messagepool import MessagePool
+from Interaction.messagelog import SpillingMessageLog
 
 # DataProcess
 from DataProcess.Hotpotqa import HotpotQA
@@ -47,6 +48,11 @@ class Args:
         self.truth = False                # whether to enable trust-based disclaimers
         self.dataset_path = "Your Path"  # default dataset path for demonstration
         self.debug = False                # debug flag for extra logging
+        self.stream = False               # stream Moderator2 steps and vote as soon as they parse
+        self.spill_dir = None             # spill older pool messages to a memory-mapped file here
+        self.hot_window = 1000            # messages kept in memory when spilling
+        self.checkpoint_retention = None  # e.g. {"thinning": 16, "max_bytes": 64 << 20}; None keeps all
+        self.backtrack_retention = None   # e.g. {"keep_last": 20} for agents' backtrack stacks
 
 
 def build_agents(agent_args):
@@ -111,7 +117,13 @@ def main():
     #    In the simplest scenario, we can do:
     #    env = Environment(people=agents, args=args)
     #    But let's use a GroupChatEnvironment for demonstration:
-    env = GroupChatEnvironment(people=agents, args=args)
+    #    The environment carries the question's message pool; the moderator and the
+    #    voting agents use it while o1think runs. On long runs, spilling its older
+    #    messages to disk keeps memory flat.
+    pool = None
+    if args.spill_dir:
+        pool = MessagePool(log=SpillingMessageLog(directory=args.spill_dir, hot_window=args.hot_window))
+    env = GroupChatEnvironment(people=agents, args=args, message_pool=pool)
 
     # 4. (Optional) load the HotpotQA dataset
     dataset_obj = load_hotpotqa_dataset(args.dataset_path)
@@ -0,0 +1,21 @@
+import pytest
+
+from backend import api
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    monkeypatch.setenv("REAGENT_FAKE_LLM", "1")
+
+
+def test_only_deterministic_requests_are_coalesced_by_default(fake_llm, monkeypatch):
+    coalesced = []
+    monkeypatch.setattr(api._in_flight, "do", lambda key, fn: coalesced.append(key) or fn())
+    messages = [{"role": "user", "content": "hello"}]
+    api.api_call(messages, temperature=1.0)
+    assert coalesced == []
+    api.api_call(messages, temperature=0.0)
+    api.api_call(messages, temperature=1.0, dedupe=True)
+    assert len(coalesced) == 2
+    api.api_call(messages, temperature=0.0, dedupe=False)
+    assert len(coalesced) == 2
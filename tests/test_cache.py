@@ -0,0 +1,50 @@
+import pytest
+
+from backend import cache as cache_module
+from backend.cache import ResponseCache, make_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_keys_ignore_argument_order():
+    assert make_key(model="m", temperature=0) == make_key(temperature=0, model="m")
+    assert make_key(model="m", temperature=0) != make_key(model="m", temperature=1)
+
+
+def test_least_recently_read_entry_is_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=10)
+    cache.put("a", "aaaaa")
+    clock[0] += 1
+    cache.put("b", "bbbbb")
+    clock[0] += 1
+    assert cache.get("a") == "aaaaa"
+    clock[0] += 1
+    cache.put("c", "ccccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaaa"
+    assert cache.get("c") == "ccccc"
+    assert cache.stats()["bytes"] == 10
+
+
+def test_expired_entries_are_misses(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl=60)
+    cache.put("a", "value")
+    clock[0] += 59
+    assert cache.get("a") == "value"
+    clock[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 0, "bytes": 0}
+
+
+def test_sampled_requests_bypass_unless_forced(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    assert cache.should_cache(0)
+    assert not cache.should_cache(0.7)
+    assert cache.should_cache(0.7, force=True)
+    assert not cache.should_cache(0, force=False)
+    assert ResponseCache(str(tmp_path / "sampled.sqlite"), cache_sampled=True).should_cache(0.7)
@@ -0,0 +1,142 @@
+import random
+
+import pytest
+
+from Environment.checkpoint import CheckpointStore
+from Environment.state import LocalState, PList
+
+
+class Agent:
+    def __init__(self, name="agent", **state):
+        self.name = name
+        self.local_state = LocalState(state or {"history": [], "verified_facts": []})
+        self.backtrack_stack = PList()
+
+
+def capture(store, agent):
+    return store.capture(agent), agent.local_state.to_dict()
+
+
+def test_append_then_revert():
+    store, agent = CheckpointStore(), Agent()
+    first, expected = capture(store, agent)
+    agent.local_state["history"].append("a")
+    agent.local_state["history"].extend(["b", "c"])
+    store.capture(agent)
+    store.restore(agent, first)
+    assert agent.local_state.to_dict() == expected
+
+
+def test_pop_then_revert():
+    store, agent = CheckpointStore(), Agent(history=["a", "b", "c"])
+    first, expected = capture(store, agent)
+    agent.local_state["history"].pop()
+    agent.local_state["history"].pop()
+    agent.local_state["history"].append("d")
+    store.capture(agent)
+    store.restore(agent, first)
+    assert agent.local_state.to_dict() == expected
+
+
+def test_rewrite_then_revert():
+    store, agent = CheckpointStore(), Agent(history=["a", "b", "c"], count=0)
+    first, expected = capture(store, agent)
+    agent.local_state["history"].insert(0, "z")
+    agent.local_state["history"].reverse()
+    agent.local_state["count"] = 3
+    agent.local_state["extra"] = [1]
+    store.capture(agent)
+    store.restore(agent, first)
+    assert agent.local_state.to_dict() == expected
+
+
+def test_nested_values_are_frozen_and_reverted():
+    store, agent = CheckpointStore(), Agent(history=[{"x": 0}], facts={"k": 0})
+    first, expected = capture(store, agent)
+    with pytest.raises(TypeError):
+        agent.local_state["facts"]["k"] = 1
+    agent.local_state["history"][0] = {"x": 1}
+    agent.local_state["facts"] = {"k": 1}
+    second, changed = capture(store, agent)
+    agent.local_state["history"][0] = {"x": 2}
+    store.restore(agent, second)
+    assert agent.local_state.to_dict() == changed
+    store.restore(agent, first)
+    assert agent.local_state.to_dict() == expected
+
+
+def test_revert_again_after_revert():
+    store, agent = CheckpointStore(), Agent()
+    checkpoints = []
+    for step in range(5):
+        checkpoints.append(capture(store, agent))
+        agent.local_state["history"].append(step)
+    store.restore(agent, checkpoints[3][0])
+    assert agent.local_state.to_dict() == checkpoints[3][1]
+    agent.local_state["history"].append("branch")
+    store.capture(agent)
+    store.restore(agent, checkpoints[1][0])
+    assert agent.local_state.to_dict() == checkpoints[1][1]
+    store.restore(agent, checkpoints[1][0])
+    assert agent.local_state.to_dict() == checkpoints[1][1]
+
+
+def test_plain_dict_state_is_converted_on_first_capture():
+    store, agent = CheckpointStore(), Agent()
+    agent.local_state = {"history": ["a"], "flag": True}
+    first = store.capture(agent)
+    assert isinstance(agent.local_state, LocalState)
+    agent.local_state["history"].append("b")
+    store.restore(agent, first)
+    assert agent.local_state.to_dict() == {"history": ["a"], "flag": True}
+
+
+def test_backtrack_stack_is_restored_with_the_state():
+    store, agent = CheckpointStore(), Agent()
+    first = store.capture(agent)
+    agent.backtrack_stack = agent.backtrack_stack.push(agent.local_state.snapshot())
+    store.capture(agent)
+    store.restore(agent, first)
+    assert len(agent.backtrack_stack) == 0
+
+
+def test_delta_size_counts_only_new_writes():
+    store, agent = CheckpointStore(), Agent()
+    first = store.capture(agent)
+    agent.local_state["history"].append("x" * 1000)
+    second = store.capture(agent)
+    assert store.delta_size(second, first) >= 1000
+    assert store.delta_size(store.capture(agent), second) == 0
+
+
+def test_random_operations_match_copies():
+    rng = random.Random(7)
+    for _ in range(100):
+        store, agent = CheckpointStore(), Agent(history=[], facts=[], count=0)
+        history = {}
+        for t in range(30):
+            history[t] = capture(store, agent)
+            for _ in range(rng.randint(0, 4)):
+                state = agent.local_state
+                key = rng.choice(["history", "facts"])
+                op = rng.random()
+                if op < 0.35:
+                    state[key].append({"v": rng.random()} if rng.random() < 0.5 else t)
+                elif op < 0.5 and state[key]:
+                    state[key].pop()
+                elif op < 0.6 and state[key]:
+                    del state[key][rng.randrange(len(state[key])):]
+                elif op < 0.7 and state[key]:
+                    state[key][0] = {"v": t}
+                elif op < 0.8 and state[key]:
+                    state[key].insert(0, t)
+                elif op < 0.9:
+                    state["count"] += 1
+                else:
+                    state[key] = [t]
+            if rng.random() < 0.25:
+                target = rng.choice(sorted(history))
+                store.restore(agent, history[target][0])
+                assert agent.local_state.to_dict() == history[target][1]
+                for later in [u for u in history if u > target]:
+                    del history[later]
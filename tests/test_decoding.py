@@ -0,0 +1,36 @@
+import pytest
+
+from backend.decoding import MalformedOutputError, decode_json, repair_json
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('Here you go:\n```json\n{"a": 1}\n```\nDone.', {"a": 1}),
+    ("{'a': 'it\\'s', 'b': True, 'c': None}", {"a": "it's", "b": True, "c": None}),
+    ('{"a": [1, 2,], "b": 3,}', {"a": [1, 2], "b": 3}),
+    ('{"a": "line one\nline two"}', {"a": "line one\nline two"}),
+    ('{"a": [1, {"b": "trunc', {"a": [1, {"b": "trunc"}]}),
+    ('{"a": 1, "b":', {"a": 1, "b": None}),
+    ('{"a": 1, "b', {"a": 1, "b": None}),
+    ('[1, 2] trailing text {"x": 1}', [1, 2]),
+])
+def test_decode_repairs_common_defects(text, expected):
+    assert decode_json(text) == expected
+
+
+def test_repair_keeps_valid_json_unchanged():
+    text = '{"a": [1, 2.5, -3], "b": {"c": "d"}, "e": null}'
+    assert repair_json(text) == text
+
+
+def test_unrecoverable_output_raises():
+    with pytest.raises(MalformedOutputError):
+        decode_json("no json here")
+
+
+def test_required_keys_are_validated():
+    assert decode_json('{"step": 1, "reasoning": "r"}', ["step"]) == {"step": 1, "reasoning": "r"}
+    with pytest.raises(MalformedOutputError, match="next_action"):
+        decode_json('{"step": 1}', ["step", "next_action"])
+    with pytest.raises(MalformedOutputError):
+        decode_json("[1]", ["step"])
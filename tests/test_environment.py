@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+from Environment.environment import Environment
+from Interaction.message import Message
+
+
+class Agent:
+    def __init__(self, name):
+        self.name = name
+        self.local_state = {"history": []}
+        self.received = []
+
+    def receive_message(self, msg):
+        self.received.append((msg["sender"], msg["msg_type"], msg["content"]))
+
+
+def make_env():
+    agents = [Agent("a"), Agent("b"), Agent("c")]
+    return Environment(agents, SimpleNamespace()), agents
+
+
+def test_send_message_reaches_receiver_and_broadcast_others():
+    env, (a, b, c) = make_env()
+    env.send_message("a", "b", "ASSERT", "x")
+    env.send_message("a", "ALL", "INFORM", "y")
+    assert a.received == []
+    assert b.received == [("a", "ASSERT", "x"), ("a", "INFORM", "y")]
+    assert c.received == [("a", "INFORM", "y")]
+
+
+def test_untyped_pool_messages_are_not_delivered():
+    env, agents = make_env()
+    env.message_pool.update_message(Message(content="step 1", send_from="moderator", send_to="ALL"))
+    env.message_pool.update_message(Message(content="note", send_from="moderator", send_to="b"))
+    assert all(agent.received == [] for agent in agents)
+    assert len(env.message_pool.messages) == 2
@@ -0,0 +1,72 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from backend.hedging import BoundedExecutor, HedgePolicy, LatencyTracker, run_hedged, run_hedged_async
+
+
+def fail(error, after=0.0):
+    def branch():
+        time.sleep(after)
+        raise error
+    return branch
+
+
+def test_duplicate_wins_when_primary_is_slow():
+    hedged = []
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        result = run_hedged(lambda: time.sleep(0.5) or "primary", lambda: "duplicate",
+                            0.05, executor, lambda: hedged.append(True))
+    assert result == "duplicate"
+    assert hedged == [True]
+
+
+def test_fast_primary_is_not_hedged():
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        assert run_hedged(lambda: "primary", pytest.fail, 1.0, executor) == "primary"
+
+
+def test_primary_error_is_raised_when_both_fail():
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        with pytest.raises(KeyError):
+            run_hedged(fail(KeyError("primary"), 0.1), fail(ValueError("duplicate"), 0.2), 0.01, executor)
+
+
+def test_saturated_executor_runs_unhedged():
+    executor = BoundedExecutor(1)
+    assert run_hedged(lambda: time.sleep(0.2) or "primary", pytest.fail, 0.01, executor, pytest.fail) == "primary"
+    busy = executor.submit(time.sleep, 0.2)
+    caller = threading.get_ident()
+    assert run_hedged(threading.get_ident, pytest.fail, 0.01, executor) == caller
+
+
+def test_async_primary_error_is_raised_when_both_fail():
+    async def primary():
+        await asyncio.sleep(0.1)
+        raise KeyError("primary")
+
+    async def duplicate():
+        await asyncio.sleep(0.2)
+        raise ValueError("duplicate")
+
+    with pytest.raises(KeyError):
+        asyncio.run(run_hedged_async(primary, duplicate, 0.01))
+
+
+def test_delay_follows_observed_latencies():
+    tracker = LatencyTracker()
+    policy = HedgePolicy(initial_delay=5.0, min_delay=0.1, max_delay=10.0, min_samples=10, tracker=tracker)
+    assert policy.delay("m") == 5.0
+    for latency in range(1, 11):
+        tracker.observe("m", latency / 10)
+    assert policy.delay("m") == 1.0
+    assert policy.delay("m", percentile=0.5) == 0.6
+
+
+def test_callers_are_not_hedged_unless_configured():
+    policy = HedgePolicy.from_config({"callers": {"moderator2": 0.95}})
+    assert policy.for_caller("moderator2") == 0.95
+    assert policy.for_caller("thinker") is False
@@ -0,0 +1,65 @@
+from Interaction.message import Message
+from Interaction.messagelog import SpillingMessageLog
+from Interaction.messagepool import MessagePool
+
+
+def message(i, send_to="ALL"):
+    return Message(content=f"message {i}", send_from=f"agent{i % 3}", send_to=send_to)
+
+
+def test_spilled_messages_round_trip(tmp_path):
+    log = SpillingMessageLog(directory=str(tmp_path), hot_window=4)
+    messages = [message(i) for i in range(10)]
+    messages.append(Message(content={"step": "ü"}, send_from="moderator", send_to=("a", "b"),
+                            msg_type="ASSERT", topic="step"))
+    log.extend(messages)
+    assert log.spilled > 0
+    assert len(log) == len(messages)
+    assert list(log) == messages
+    assert log[-1] == messages[-1]
+    assert log[2:9] == messages[2:9]
+    log.close()
+
+
+def test_truncation_across_the_spill_boundary(tmp_path):
+    log = SpillingMessageLog(directory=str(tmp_path), hot_window=4)
+    messages = [message(i) for i in range(12)]
+    log.extend(messages)
+    del log[9:]
+    assert list(log) == messages[:9]
+    del log[3:]
+    assert list(log) == messages[:3]
+    log.extend(messages[3:12])
+    assert list(log) == messages
+    log.close()
+
+
+def test_pool_reverts_over_a_spilling_log(tmp_path):
+    pool = MessagePool(log=SpillingMessageLog(directory=str(tmp_path), hot_window=4))
+    for i in range(5):
+        pool.update_message(message(i, send_to="agent1"))
+    marker = pool.create_marker()
+    kept = list(pool.messages)
+    for i in range(5, 15):
+        pool.update_message(message(i, send_to="agent1"))
+    pool.revert_to_marker(marker)
+    assert list(pool.messages) == kept
+    assert pool.get_visibile_messages("agent1") == kept
+    assert pool.find_messages_by_id(kept[0].msg_id) == [kept[0]]
+    pool.messages.close()
+
+
+def test_transcript_is_not_cached_once_the_log_spills(tmp_path):
+    log = SpillingMessageLog(directory=str(tmp_path), hot_window=4)
+    pool = MessagePool(log=log)
+    pool.update_message(message(0))
+    pool.transcript("agent1")
+    assert pool._transcripts
+    for i in range(1, 10):
+        pool.update_message(message(i, send_to="agent1" if i % 2 else "agent2"))
+    assert log.spilled
+    transcript = pool.transcript("agent1")
+    assert not pool._transcripts
+    visible = pool.get_visibile_messages("agent1")
+    assert transcript.text == "".join(f"{m.send_from}: {m.content}\n" for m in visible)
+    log.close()
@@ -0,0 +1,78 @@
+import asyncio
+import importlib
+import sys
+import types
+from types import SimpleNamespace
+
+import pytest
+
+from Interaction.messagepool import MessagePool
+
+
+class Agent:
+    def __init__(self, name=None, model=None):
+        self.name = name
+        self.model = model
+
+    def say(self, content):
+        pass
+
+
+@pytest.fixture
+def moderator2(monkeypatch):
+    # Agent.agent cannot be imported on its own, so Moderator2 gets a minimal base class
+    monkeypatch.setitem(sys.modules, "Agent.agent", types.SimpleNamespace(Agent=Agent))
+    monkeypatch.delitem(sys.modules, "Agent.moderator2", raising=False)
+    monkeypatch.setenv("REAGENT_FAKE_LLM", "1")
+    module = importlib.import_module("Agent.moderator2")
+    yield module
+    sys.modules.pop("Agent.moderator2", None)
+
+
+class Voter:
+    def __init__(self, revise):
+        self.revise = revise
+
+    def vote(self, question, knowledges):
+        return self.revise
+
+
+class Group:
+    def __init__(self, revise, summary):
+        self.people = [Voter(revise)]
+        self.message_pool = MessagePool()
+        self.summary = summary
+
+    def start(self, **kwargs):
+        return self.summary, [self.summary]
+
+
+def test_concurrent_questions_keep_their_own_state(moderator2, monkeypatch):
+    sent = []
+    real_call = moderator2.api_call_async
+
+    async def recording_call(messages, *args, **kwargs):
+        sent.append(messages)
+        return await real_call(messages, *args, **kwargs)
+
+    monkeypatch.setattr(moderator2, "api_call_async", recording_call)
+    mod = moderator2.Moderator2()
+    args = SimpleNamespace(temperature=1.0, mas=True, stream=False)
+
+    async def solve():
+        return await asyncio.gather(
+            mod.o1think_async(SimpleNamespace(question="first"), "", Group(True, "revise first"), args),
+            mod.o1think_async(SimpleNamespace(question="second"), "", Group(False, None), args),
+        )
+
+    (first_answer, first_steps), (second_answer, second_steps) = asyncio.run(solve())
+    assert first_answer and second_answer
+    assert first_steps is not second_steps
+    for steps in (first_steps, second_steps):
+        labels = [step[0][0] if isinstance(step[0], tuple) else step[0] for step in steps]
+        assert labels == [f"Step {i}: Simulated step {i}" for i in range(1, len(labels))] + ["Final Answer"]
+    for messages in sent:
+        summaries = [m["content"] for m in messages if "revise first" in m["content"]]
+        if "second" in messages[1]["content"]:
+            assert summaries == []
+    assert any("revise first" in m["content"] for messages in sent for m in messages)
@@ -0,0 +1,53 @@
+import multiprocessing
+import time
+
+from backend.ratelimit import FileBucketState, LocalBucketState, RateLimiter, build_rate_limiter
+
+
+def file_limiter(path, rpm=None, tpm=None):
+    return RateLimiter(rpm=rpm, tpm=tpm, state=FileBucketState(str(path), [float(rpm or 0), float(tpm or 0), time.time()]))
+
+
+def test_file_state_is_created_once_and_shared(tmp_path):
+    path = tmp_path / "deepseek.bucket"
+    first = file_limiter(path, rpm=2)
+    assert first.try_acquire() == 0.0
+    second = file_limiter(path, rpm=2)
+    assert second.try_acquire() == 0.0
+    assert first.try_acquire() > 0.0
+    assert second.try_acquire() > 0.0
+
+
+def _take(path, results):
+    limiter = RateLimiter(rpm=10, state=FileBucketState(path, [10.0, 0.0, time.time()]))
+    results.put(sum(limiter.try_acquire() == 0.0 for _ in range(5)))
+
+
+def test_file_state_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "shared.bucket")
+    FileBucketState(path, [10.0, 0.0, time.time()])
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=_take, args=(path, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    granted = sum(results.get(timeout=10) for _ in workers)
+    for worker in workers:
+        worker.join()
+    assert granted == 10
+
+
+def test_tokens_are_settled_against_usage(tmp_path):
+    limiter = file_limiter(tmp_path / "tpm.bucket", tpm=1000)
+    assert limiter.try_acquire(800) == 0.0
+    assert limiter.try_acquire(800) > 0.0
+    limiter.settle(800, 100)
+    assert limiter.try_acquire(800) == 0.0
+
+
+def test_build_rate_limiter_selects_the_backend(tmp_path):
+    assert build_rate_limiter("p", {}) is None
+    assert isinstance(build_rate_limiter("p", {"rpm": 5}).state, LocalBucketState)
+    limiter = build_rate_limiter("p", {"tpm": 5}, {"backend": "file", "path": str(tmp_path)})
+    assert isinstance(limiter.state, FileBucketState)
+    assert limiter.state.path == str(tmp_path / "p.bucket")
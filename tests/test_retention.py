@@ -0,0 +1,46 @@
+import types
+
+from Environment.environment import Environment
+from Environment.retention import ExponentialThinning, KeepLastN, MemoryBudget, make_retention
+
+
+class Agent:
+    def __init__(self, name):
+        self.name = name
+        self.local_state = {"history": []}
+
+    def receive_message(self, msg):
+        pass
+
+    def run_one_step(self):
+        self.local_state["history"].append("step")
+
+
+def test_policies_keep_the_newest():
+    keys = list(range(100))
+    assert KeepLastN(3).evict(keys) == set(range(97))
+    kept = sorted(set(keys) - ExponentialThinning(4).evict(keys))
+    assert kept == [0, 36, 68, 84, 92, 96, 97, 98, 99]
+    assert MemoryBudget(35).evict(keys[:10], lambda k: 10) == set(range(7))
+    assert MemoryBudget(1).evict(keys[:3], lambda k: 10) == {0, 1}
+
+
+def test_make_retention_specs():
+    assert repr(make_retention(None)) == "KeepAll()"
+    assert repr(make_retention(5)) == "KeepLastN(5)"
+    assert repr(make_retention({"thinning": 4, "max_bytes": 100})) == \
+        "Chain(ExponentialThinning(dense=4), MemoryBudget(100))"
+
+
+def test_resolve_conflict_uses_kept_checkpoints():
+    env = Environment([Agent("a")], types.SimpleNamespace(checkpoint_retention={"thinning": 2}))
+    for _ in range(20):
+        env.run_time_step()
+    times = env.checkpoint_times()
+    assert len(times) < 20 and times[-1] == 20
+    evicted = next(t for t in range(1, 20) if t not in times)
+    assert env.revert_environment(evicted) is False
+    env.raise_conflict("conflict")
+    env.resolve_conflict()
+    assert env.current_time == times[-2]
+    assert len(env.people[0].local_state["history"]) == times[-2] - 1
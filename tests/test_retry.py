@@ -0,0 +1,101 @@
+import pytest
+
+from backend.decoding import MalformedOutputError
+from backend.retry import (CircuitBreaker, EmptyResponseError, RetriesExhaustedError, RetryPolicy,
+                           call_with_failover, call_with_retry)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def target(name, outcomes, calls):
+    def attempt():
+        calls.append(name)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return attempt, CircuitBreaker(name, failure_threshold=100)
+
+
+def policy(max_attempts):
+    return RetryPolicy(max_attempts=max_attempts, base_delay=0, max_delay=0)
+
+
+def test_fails_over_after_first_outage():
+    calls = []
+    targets = [target("a", [StatusError(503)], calls), target("b", ["ok"], calls)]
+    assert call_with_failover(targets, policy(3)) == "ok"
+    assert calls == ["a", "b"]
+
+
+def test_fails_over_after_rate_limit():
+    calls = []
+    targets = [target("a", [StatusError(429)], calls), target("b", ["ok"], calls)]
+    assert call_with_failover(targets, policy(3)) == "ok"
+    assert calls == ["a", "b"]
+
+
+def test_transient_errors_are_retried_on_the_same_target():
+    calls = []
+    targets = [target("a", [MalformedOutputError("bad json"), "ok"], calls), target("b", [], calls)]
+    assert call_with_failover(targets, policy(3)) == "ok"
+    assert calls == ["a", "a"]
+
+
+def test_targets_share_the_attempts():
+    calls = []
+    targets = [target("a", [StatusError(503)] * 5, calls), target("b", [StatusError(503)] * 5, calls)]
+    with pytest.raises(RetriesExhaustedError):
+        call_with_failover(targets, policy(4))
+    assert calls == ["a", "b", "b", "b"]
+
+
+def test_open_circuit_is_skipped_without_an_attempt():
+    calls = []
+    first, second = target("a", [], calls), target("b", ["ok"], calls)
+    first[1].opened_at = float("inf")
+    assert call_with_failover([first, second], policy(1)) == "ok"
+    assert calls == ["b"]
+
+
+def test_call_with_retry_raises_fatal_errors():
+    calls = []
+    fn, breaker = target("a", [StatusError(401)], calls)
+    with pytest.raises(StatusError):
+        call_with_retry(fn, policy(3), breaker)
+    assert calls == ["a"]
+
+
+def test_errors_outside_the_allow_list_are_fatal():
+    calls = []
+    fn, breaker = target("a", [KeyError("services")], calls)
+    with pytest.raises(KeyError):
+        call_with_retry(fn, policy(5), breaker)
+    assert calls == ["a"]
+    assert breaker.failures == 0
+
+
+def test_allow_listed_errors_are_retried():
+    calls = []
+    fn, breaker = target("a", [TimeoutError(), EmptyResponseError(), MalformedOutputError("x"), "ok"], calls)
+    assert call_with_retry(fn, policy(5), breaker) == "ok"
+    assert calls == ["a"] * 4
+
+
+def test_local_errors_do_not_fail_over():
+    calls = []
+    targets = [target("a", [KeyError("services")], calls), target("b", ["ok"], calls)]
+    with pytest.raises(KeyError):
+        call_with_failover(targets, policy(3))
+    assert calls == ["a"]
+
+
+def test_rejected_requests_fail_over():
+    calls = []
+    targets = [target("a", [StatusError(401)], calls), target("b", ["ok"], calls)]
+    assert call_with_failover(targets, policy(3)) == "ok"
+    assert calls == ["a", "b"]
@@ -0,0 +1,40 @@
+import pytest
+
+from backend.routing import Router, Target
+
+ROUTES = [
+    {"match": "deepseek-chat", "provider": "deepseek",
+     "fallbacks": [{"provider": "qwen", "model": "qwen-max"}, {"provider": "openrouter"},
+                   {"provider": "deepseek"}]},
+    {"match": "gpt-*", "provider": "azure", "model": "gpt-4o-prod"},
+]
+
+
+def test_routes_resolve_in_declaration_order():
+    router = Router(ROUTES)
+    assert router.resolve("deepseek-chat") == [
+        Target("deepseek", "deepseek-chat"), Target("qwen", "qwen-max"), Target("openrouter", "deepseek-chat"),
+    ]
+    assert router.resolve("gpt-4o") == [Target("azure", "gpt-4o-prod")]
+    # Unconfigured names fall through to the built-in substring rules
+    assert router.resolve("deepseek-reasoner") == [Target("deepseek", "deepseek-reasoner")]
+    assert router.resolve("my-gpt") == [Target("openai", "my-gpt")]
+    with pytest.raises(ValueError):
+        router.resolve("llama")
+
+
+def test_unhealthy_providers_are_tried_last():
+    router = Router(ROUTES, min_score=0.5, health_options={"alpha": 0.5, "recovery_half_life": 3600})
+    router.record("deepseek", False)
+    router.record("deepseek", False)
+    assert [t.provider for t in router.resolve("deepseek-chat")] == ["qwen", "openrouter", "deepseek"]
+    unavailable = {"qwen"}
+    assert [t.provider for t in router.resolve("deepseek-chat", lambda p: p not in unavailable)] == [
+        "openrouter", "deepseek", "qwen"]
+
+
+def test_slow_provider_is_demoted():
+    router = Router(ROUTES, health_options={"alpha": 1.0, "latency_target": 1.0})
+    router.record("deepseek", True, latency=4.0)
+    assert router.scores() == {"deepseek": pytest.approx(0.25)}
+    assert router.resolve("deepseek-chat")[0].provider == "qwen"
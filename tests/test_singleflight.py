@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    group, release, calls = SingleFlight(), threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        release.wait()
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(group.do("key", fn))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while group.shared < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == ["result"] * 5
+    assert group.in_flight() == 0
+
+
+def test_error_is_shared_and_key_released():
+    group = SingleFlight()
+    with pytest.raises(ValueError):
+        group.do("key", lambda: (_ for _ in ()).throw(ValueError("failed")))
+    assert group.in_flight() == 0
+    assert group.do("key", lambda: "again") == "again"
+
+
+def test_async_cancelled_waiter_does_not_cancel_the_call():
+    group, calls = AsyncSingleFlight(), []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        first = asyncio.ensure_future(group.do("key", fn))
+        second = asyncio.ensure_future(group.do("key", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, await group.do("key", fn)
+
+    assert asyncio.run(main()) == ("result", "result")
+    assert calls == [1, 1]
+    assert group.shared == 1
@@ -0,0 +1,65 @@
+import copy
+import pickle
+
+import pytest
+
+from Environment.state import LocalState, PList
+
+
+def test_snapshot_and_restore():
+    state = LocalState({"history": [], "count": 0})
+    handle = state.snapshot()
+    state["history"].append("a")
+    state["count"] = 1
+    assert state == {"history": ["a"], "count": 1}
+    state.restore(handle)
+    assert state == {"history": [], "count": 0}
+
+
+def test_list_view_operations():
+    state = LocalState({"facts": ["a", "b"]})
+    state["facts"].extend(["c", "d"])
+    assert state["facts"].pop() == "d"
+    del state["facts"][0]
+    state["facts"].insert(0, "z")
+    assert state["facts"] + ["e"] == ["z", "b", "c", "e"]
+    assert state["facts"][-2:] == ["b", "c"]
+
+
+def test_values_cannot_change_checkpoints():
+    state = LocalState({"history": [{"x": 0}], "facts": {"k": 0}})
+    handle = state.snapshot()
+    with pytest.raises(TypeError):
+        state["history"][0]["x"] = 1
+    with pytest.raises(TypeError):
+        state["facts"]["k"] = 1
+    state["facts"] = {"k": 1}
+    state.restore(handle)
+    assert state == {"history": [{"x": 0}], "facts": {"k": 0}}
+
+
+def test_other_objects_are_copied():
+    class Box:
+        def __init__(self):
+            self.items = []
+
+    state = LocalState({"box": Box(), "boxes": [Box()]})
+    handle = state.snapshot()
+    state["box"].items.append(1)
+    state["boxes"][0].items.append(1)
+    state.restore(handle)
+    assert state["box"].items == [] and state["boxes"][0].items == []
+
+
+def test_copies_and_pickles():
+    state = LocalState({"history": ["a", {"b": [1]}], "count": 2})
+    assert copy.deepcopy(state) == state
+    assert pickle.loads(pickle.dumps(state)) == state
+
+
+def test_plist_shares_prefix():
+    base = PList(["a", "b"])
+    left, right = base.push("c"), base.push("d")
+    assert list(left) == ["a", "b", "c"] and list(right) == ["a", "b", "d"]
+    rest, last = left.pop()
+    assert last == "c" and list(rest) == ["a", "b"]
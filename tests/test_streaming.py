@@ -0,0 +1,34 @@
+import json
+
+from backend.streaming import JSONFieldStream
+
+STEP = {"step": 2, "reasoning": "a \"quoted\" {brace}, comma", "next_action": "continue",
+        "facts": [1, {"x": "]"}], "final": None, "done": True}
+
+
+def test_fields_complete_in_order_whatever_the_chunking():
+    text = "```json\n" + json.dumps(STEP) + "\n```"
+    for size in (1, 3, 7, len(text)):
+        stream = JSONFieldStream()
+        completed = []
+        for i in range(0, len(text), size):
+            completed += stream.feed(text[i:i + size])
+        assert completed == list(STEP.items())
+        assert stream.fields == STEP
+        assert stream.closed
+
+
+def test_field_is_reported_before_the_object_ends():
+    stream = JSONFieldStream()
+    assert stream.feed('{"step": 1, "reasoning": "thinking') == [("step", 1)]
+    assert stream.feed(' more", "next') == [("reasoning", "thinking more")]
+    assert not stream.closed
+    assert stream.feed('_action": "stop"}') == [("next_action", "stop")]
+    assert stream.closed
+
+
+def test_text_after_the_object_is_ignored():
+    stream = JSONFieldStream()
+    assert stream.feed('{"a": 1} {"b": 2}') == [("a", 1)]
+    assert stream.feed('{"c": 3}') == []
+    assert stream.fields == {"a": 1}
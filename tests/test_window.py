@@ -0,0 +1,45 @@
+from Interaction.message import Message
+from Interaction.window import WindowPolicy, estimate_tokens
+
+
+def messages(count, size=200):
+    return [Message(content=f"{i} " + "x" * size, send_from=f"agent{i % 3}", send_to="ALL")
+            for i in range(count)]
+
+
+def test_budgets_are_opt_in():
+    assert WindowPolicy.from_config(None, "thinker").budget is None
+    policy = WindowPolicy.from_config({"budgets": {"thinker": 500}}, "thinker")
+    assert policy.budget == 500
+    assert WindowPolicy.from_config({"budgets": {"thinker": 500}}, "moderator2").budget is None
+
+
+def test_unbounded_policy_renders_everything():
+    history = messages(10)
+    previous, current = WindowPolicy().render(history)
+    assert previous.count("\n") == 9 and current.startswith("agent0: 9 ")
+
+
+def test_render_fits_budget():
+    policy = WindowPolicy(budget=600)
+    previous, current = policy.render(messages(50))
+    assert estimate_tokens(previous) + estimate_tokens(current) <= 600
+    assert "earlier messages omitted" in previous
+
+
+def test_history_keeps_a_floor_when_the_prompt_fills_the_budget():
+    policy = WindowPolicy(budget=1000)
+    previous, _ = policy.render(messages(50), reserved=5000)
+    assert "agent" in previous.split("omitted]\n", 1)[-1]
+    assert estimate_tokens(previous) <= 250
+
+
+def test_window_chat_keeps_head_and_alternates_roles():
+    chat = [{"role": "system", "content": "s"}, {"role": "user", "content": "q"}, {"role": "assistant", "content": "a"}]
+    for i in range(40):
+        chat.append({"role": "user", "content": "proceed " + "y" * 300})
+        chat.append({"role": "assistant", "content": f"step {i} " + "z" * 300})
+    windowed = WindowPolicy(budget=800).window_chat(chat)
+    assert windowed[:3] == chat[:3] and windowed[-1] == chat[-1]
+    roles = [m["role"] for m in windowed[3:]]
+    assert all(a != b for a, b in zip(roles, roles[1:]))